@@ -1,12 +1,14 @@
 import logging
 import uuid
 import os
-import time
 
 from online_rl_agent.agent.agent import DevOpsAgent
 from online_rl_agent.user_agent.simulator import get_reward_from_user
 from online_rl_agent.data.trajectory_store import TrajectoryStore
+from online_rl_agent.data.wal import TrajectoryWAL
 from online_rl_agent.environment.k8s_chaos_env import KubernetesChaosEnvironment
+from online_rl_agent.chaos.readiness import FaultInjectionError
+from online_rl_agent.tools.k8s_api_tools import close_api_clients
 
 # Try to import config, but provide guidance if it's missing.
 try:
@@ -35,7 +37,8 @@ def main_loop():
         
     # --- Initialization ---
     agent = DevOpsAgent(api_key=config.DEEPSEEK_API_KEY, model="deepseek-coder")
-    store = TrajectoryStore(save_path='data/trajectories.jsonl')
+    store = TrajectoryStore(save_path='data/trajectories.jsonl', wal=TrajectoryWAL('data/wal'))
+    store.recover_from_wal()  # Finalize or quarantine episodes left by a crashed run.
     
     # The main loop now only interacts with the Environment abstraction
     chaos_template_path = os.path.join(os.path.dirname(__file__), 'online_rl_agent', 'chaos', 'templates', 'pod-failure.yaml')
@@ -46,9 +49,8 @@ def main_loop():
         
         try:
             # 1. Setup environment
-            env.setup()
-            logger.info("Environment setup complete. Waiting for 15 seconds for fault to stabilize...")
-            time.sleep(15)
+            env.setup()  # Waits until the fault has actually taken effect.
+            logger.info(f"Environment setup complete. Fault confirmed after {env.fault_ready_seconds:.1f}s.")
 
             # 2. Get user task from the environment
             user_task = env.get_task()
@@ -56,15 +58,18 @@ def main_loop():
 
             # 3. Start trajectory
             trajectory_id = f"traj_{uuid.uuid4()}"
-            store.start_new_trajectory(trajectory_id)
+            store.start_new_trajectory(trajectory_id, dict(env.get_metadata(), model=agent.model, task=user_task))
 
             # 4. Run agent
             logger.info("Running DevOps Agent to solve the problem...")
             final_answer = agent.run(user_task, trajectory_store=store)
 
             # 5. Get reward
-            reward = get_reward_from_user(final_answer)
-            logger.info(f"Received reward: {reward}")
+            reward = get_reward_from_user(final_answer, allow_defer=True)
+            if reward is None:
+                logger.info("Reward deferred; label it later with `python -m online_rl_agent.user_agent.labeling`.")
+            else:
+                logger.info(f"Received reward: {reward}")
 
             # 6. End and save trajectory
             store.end_trajectory(reward)
@@ -72,6 +77,8 @@ def main_loop():
             
             logger.info(f"Episode finished. Trajectory {trajectory_id} saved.")
 
+        except FaultInjectionError as e:
+            logger.error(f"Fault injection failed, skipping this episode: {e}")
         finally:
             # 7. Cleanup environment, ensuring it runs even if the agent fails
             env.cleanup()
@@ -84,4 +91,7 @@ def main_loop():
             break
 
 if __name__ == "__main__":
-    main_loop()
+    try:
+        main_loop()
+    finally:
+        close_api_clients()  # Readiness checks share pooled API clients.
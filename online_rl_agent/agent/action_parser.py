@@ -0,0 +1,374 @@
+"""
+Tolerant parsing of the model's action JSON.
+
+The model is asked for a bare JSON object, but often wraps it in a ```json
+fence (with or without the closing fence or newline), adds a sentence before
+or after it, leaves a trailing comma, or is cut off by `max_tokens`. Each of
+those used to cost a whole extra LLM call. `parse_action` recovers the action
+whenever it can:
+
+1. ```-fences and surrounding prose are stripped by scanning for the first
+   balanced `{...}` object (string- and escape-aware) that holds an action;
+2. trailing commas are dropped, raw control characters inside strings are
+   accepted, and a truncated object is closed if the cut came after the
+   action (e.g. in a trailing "thought"). A response cut off inside
+   `tool_name`, `tool_args` or `tool_calls` is rejected: closing it would
+   turn a partial value such as `"pod_name": "adserv` into a real argument;
+3. tool arguments are checked against the tool's signature: unknown
+   arguments are dropped, numbers and strings are coerced to the annotated
+   type, and arguments the agent binds itself (e.g. `kubeconfig`) are never
+   taken from the model.
+
+Only when no action can be recovered does `parse_action` raise
+`ActionParseError` and the agent asks the model again. Which repairs were
+needed is returned with the action, so recovery rates can be counted.
+"""
+import inspect
+import json
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ACTION_KEYS = ("tool_name", "tool_calls")
+# Bound by the agent (see `DevOpsAgent.__init__`); the model must not override them.
+RESERVED_ARGS = ("kubeconfig", "cache")
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ActionParseError(ValueError):
+    """The response holds no recoverable action."""
+
+
+class ParsedAction:
+    """
+    An action recovered from a model response.
+
+    Attributes:
+        thought: The model's reasoning, or "".
+        calls: (tool_name, tool_args) per call, with validated arguments.
+        call_errors: Index into `calls` -> why that call cannot be run (e.g. a missing argument).
+        text: The action as canonical JSON, for the conversation history.
+        repairs: What had to be fixed, e.g. ["fence", "trailing_comma"]; empty for a clean response.
+            "unclosed" means a response truncated after its action was closed.
+    """
+
+    def __init__(self, thought: str, calls: List[Tuple[str, Dict[str, Any]]], call_errors: Dict[int, str],
+                 text: str, repairs: List[str]):
+        self.thought = thought
+        self.calls = calls
+        self.call_errors = call_errors
+        self.text = text
+        self.repairs = repairs
+
+
+# --- Extraction ---
+
+def _scan_objects(text: str) -> List[Tuple[int, Optional[int]]]:
+    """
+    Returns the (start, end) spans of the top-level `{...}` objects in `text`,
+    with end None for a final object that is never closed.
+    """
+    spans = []
+    depth = 0
+    start = 0
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"' and depth:
+            in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+    if depth:
+        spans.append((start, None))
+    return spans
+
+
+def _repair(fragment: str) -> Tuple[str, List[str]]:
+    """
+    Drops trailing commas and closes what a truncated object left open.
+
+    Closing is only safe when the cut falls after the action, i.e. directly in the
+    top-level object or inside its "thought" string. A cut anywhere else (inside
+    `tool_args`, `tool_calls` or a `tool_name` string) would turn a partial value
+    into a real argument, so it is reported as "truncated" instead of "unclosed".
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    repairs: List[str] = []
+    in_string = escape = False
+    expect_key = False
+    key_start: Optional[int] = None
+    current_key: Optional[str] = None  # Last key of the top-level object.
+    for ch in fragment:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if key_start is not None:
+                    current_key = "".join(out[key_start:-1])
+                    key_start = None
+            continue
+        if ch in "}]":
+            # Remove a comma that directly precedes the closer.
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+                repairs.append("trailing_comma")
+            if stack:
+                stack.pop()
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            expect_key = len(stack) == 1
+        elif len(stack) == 1 and ch in ",:":
+            expect_key = ch == ","
+        elif ch == '"':
+            in_string = True
+            if len(stack) == 1 and expect_key:
+                key_start = len(out) + 1
+        out.append(ch)
+    if in_string or stack:
+        after_action = len(stack) == 1 and (not in_string or (key_start is None and current_key == "thought"))
+        if escape:
+            out.pop()
+        if in_string:
+            out.append('"')
+        while out and (out[-1].isspace() or out[-1] in ",:"):
+            out.pop()
+        out.extend(reversed(stack))
+        repairs.append("unclosed" if after_action else "truncated")
+    return "".join(out), sorted(set(repairs))
+
+
+def extract_action_json(content: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Finds the action object in a response.
+
+    Returns:
+        The decoded object and the repairs that were needed.
+
+    Raises:
+        ActionParseError: If there is no object with `tool_name` or `tool_calls`.
+    """
+    if not isinstance(content, str) or not content.strip():
+        raise ActionParseError("The response is empty.")
+    try:
+        value = json.loads(content)
+        if isinstance(value, dict):
+            return value, []
+    except ValueError:
+        pass
+
+    stripped = content.strip()
+    base_repairs = ["fence"] if stripped.startswith("```") else []
+    spans = _scan_objects(content)
+    if not spans:
+        raise ActionParseError("The response contains no JSON object.")
+    fallback: Optional[Tuple[Dict[str, Any], List[str]]] = None
+    truncated = False
+    for start, end in spans:
+        fragment = content[start:end] if end is not None else content[start:]
+        repairs = list(base_repairs)
+        if content[:start].strip(" \t\r\n`").lower() not in ("", "json") or \
+                (end is not None and content[end:].strip(" \t\r\n`")):
+            repairs.append("prose")
+        try:
+            value = json.loads(fragment)
+        except ValueError:
+            fixed, fixes = _repair(fragment)
+            if "truncated" in fixes:
+                truncated = True
+                continue
+            try:
+                # strict=False accepts raw newlines and tabs inside strings.
+                value = json.loads(fixed, strict=False)
+            except ValueError:
+                continue
+            repairs.extend(fixes or ["control_chars"])
+        if not isinstance(value, dict):
+            continue
+        if any(key in value for key in ACTION_KEYS):
+            return value, repairs
+        if fallback is None:
+            fallback = (value, repairs)
+    if fallback is not None:
+        return fallback
+    if truncated:
+        raise ActionParseError("The response was cut off before the action was complete.")
+    raise ActionParseError("The JSON object in the response could not be decoded.")
+
+
+# --- Argument validation ---
+
+def _bound_keywords(func: Callable) -> set:
+    bound = set()
+    while isinstance(func, partial):
+        bound.update(func.keywords or {})
+        func = func.func
+    return bound
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    """Coerces JSON scalars to int/float/str; raises ValueError/TypeError if impossible."""
+    if annotation is int and not isinstance(value, bool):
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str):
+            return int(value.strip())
+        raise TypeError(f"expected an integer, got {type(value).__name__}")
+    if annotation is float and not isinstance(value, bool):
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            return float(value.strip())
+        raise TypeError(f"expected a number, got {type(value).__name__}")
+    if annotation is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        raise TypeError(f"expected a string, got {type(value).__name__}")
+    return value
+
+
+def validate_tool_args(func: Callable, tool_args: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Checks a call's arguments against the tool's signature.
+
+    Returns:
+        The arguments to call the tool with and the repairs made
+        ("unknown_args", "reserved_args", "coerced_args").
+
+    Raises:
+        ValueError: If a required argument is missing or cannot be coerced.
+    """
+    repairs: List[str] = []
+    if tool_args is None:
+        tool_args = {}
+    if not isinstance(tool_args, dict):
+        raise ValueError("tool_args must be an object.")
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return dict(tool_args), repairs
+    reserved = _bound_keywords(func).union(RESERVED_ARGS)
+    accepts_any = any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+    args: Dict[str, Any] = {}
+    for name, value in tool_args.items():
+        if name in reserved:
+            repairs.append("reserved_args")
+            continue
+        parameter = parameters.get(name)
+        if parameter is None:
+            if not accepts_any:
+                repairs.append("unknown_args")
+                continue
+            args[name] = value
+            continue
+        annotation = parameter.annotation
+        if isinstance(annotation, str):
+            annotation = {"int": int, "float": float, "str": str}.get(annotation, annotation)
+        if annotation is inspect.Parameter.empty and parameter.default not in (inspect.Parameter.empty, None):
+            annotation = type(parameter.default)
+        try:
+            coerced = _coerce(value, annotation)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Argument '{name}': {e}.")
+        if coerced != value or type(coerced) is not type(value):
+            repairs.append("coerced_args")
+        args[name] = coerced
+
+    missing = [name for name, p in parameters.items()
+               if p.default is inspect.Parameter.empty and name not in args and name not in reserved
+               and p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)]
+    if missing:
+        raise ValueError(f"Missing required argument(s): {', '.join(missing)}.")
+    return args, sorted(set(repairs))
+
+
+# --- Entry point ---
+
+def parse_action(content: str, tools: Dict[str, Callable]) -> ParsedAction:
+    """
+    Recovers the action from a model response.
+
+    Args:
+        content: The assistant message content.
+        tools: The agent's tool table, used to validate arguments.
+
+    Returns:
+        The parsed action. Calls to unknown tools are kept as they are; the agent reports them.
+
+    Raises:
+        ActionParseError: If no action can be recovered.
+    """
+    action_json, repairs = extract_action_json(content)
+    if "tool_calls" in action_json:
+        raw_calls = action_json["tool_calls"]
+        if isinstance(raw_calls, dict):
+            raw_calls = [raw_calls]
+            repairs.append("tool_calls_object")
+        if not isinstance(raw_calls, list) or not raw_calls:
+            raise ActionParseError("tool_calls must be a non-empty list.")
+    elif "tool_name" in action_json:
+        raw_calls = [action_json]
+    else:
+        raise ActionParseError("The response has neither tool_name nor tool_calls.")
+
+    calls: List[Tuple[str, Dict[str, Any]]] = []
+    call_errors: Dict[int, str] = {}
+    for i, raw in enumerate(raw_calls):
+        if not isinstance(raw, dict) or not isinstance(raw.get("tool_name"), str):
+            raise ActionParseError("Every tool call needs a tool_name string.")
+        tool_name = raw["tool_name"].strip()
+        if tool_name != raw["tool_name"]:
+            repairs.append("tool_name")
+        tool_args = raw.get("tool_args")
+        if tool_name == "final_answer":
+            if not isinstance(tool_args, dict) or not isinstance(tool_args.get("answer"), str):
+                if isinstance(tool_args, str):
+                    tool_args = {"answer": tool_args}
+                    repairs.append("coerced_args")
+                else:
+                    raise ActionParseError("final_answer needs an 'answer' string.")
+        elif tool_name in tools:
+            try:
+                tool_args, fixes = validate_tool_args(tools[tool_name], tool_args)
+                repairs.extend(fixes)
+            except ValueError as e:
+                call_errors[i] = f"Error: Invalid arguments for tool '{tool_name}': {e}"
+                tool_args = tool_args if isinstance(tool_args, dict) else {}
+        elif not isinstance(tool_args, dict):
+            tool_args = {}
+        calls.append((tool_name, tool_args))
+
+    thought = action_json.get("thought", "")
+    if not isinstance(thought, str):
+        thought = json.dumps(thought)
+    if len(calls) == 1 and "tool_calls" not in action_json:
+        canonical = {"tool_name": calls[0][0], "tool_args": calls[0][1], "thought": thought}
+    else:
+        canonical = {"tool_calls": [{"tool_name": name, "tool_args": args} for name, args in calls],
+                     "thought": thought}
+    text = content if not repairs else json.dumps(canonical, indent=2)
+    return ParsedAction(thought, calls, call_errors, text, sorted(set(repairs)))
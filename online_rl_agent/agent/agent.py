@@ -1,11 +1,19 @@
 import requests
-import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 
 # Assuming k8s_tools.py and prompts.py are in the same package or accessible through PYTHONPATH
 from online_rl_agent.tools import k8s_tools
 from online_rl_agent.agent.prompts import SYSTEM_PROMPT
+from online_rl_agent.agent.context_manager import ConversationManager, FullHistoryManager
+from online_rl_agent.agent.llm_cache import LLMResponseCache
+from online_rl_agent.agent.llm_client import LLMClient, get_llm_client
+from online_rl_agent.agent.metrics import AgentMetrics
+from online_rl_agent.agent.action_parser import ActionParseError, parse_action, validate_tool_args
+from online_rl_agent.agent.budget import CONTINUE, FINALIZE, FINALIZE_MESSAGE, STOP, EpisodeBudget
+from online_rl_agent.agent.context_manager import estimate_tokens
 from online_rl_agent.data.trajectory_store import TrajectoryStore
 
 # Try to import config, but handle the case where it doesn't exist yet
@@ -19,7 +27,12 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class DevOpsAgent:
-    def __init__(self, api_key: str = None, model: str = "deepseek-chat", kubeconfig: Optional[str] = None):
+    def __init__(self, api_key: str = None, model: str = "deepseek-chat", kubeconfig: Optional[str] = None,
+                 tool_backend: str = "kubectl", use_informer_cache: bool = False,
+                 context_manager: Optional[ConversationManager] = None,
+                 api_url: Optional[str] = None, stream: bool = False, max_parallel_tools: int = 4,
+                 llm_cache: Optional[LLMResponseCache] = None, metrics: Optional[AgentMetrics] = None,
+                 budget: Optional[EpisodeBudget] = None, llm_client: Optional[LLMClient] = None):
         """
         Initializes the DevOpsAgent.
 
@@ -27,6 +40,24 @@ class DevOpsAgent:
             api_key: The DeepSeek API key. If not provided, it will try to get it from config.
             model: The name of the model to use.
             kubeconfig: Optional path to a kubeconfig file to restrict the agent's scope.
+            tool_backend: "kubectl" to shell out per tool call, or "api" to use a pooled
+                Kubernetes API client that returns the same text.
+            use_informer_cache: Answer `get_pods`/`describe_pod` from a watch-backed
+                per-cluster cache. Requires the "api" backend.
+            context_manager: Decides which part of the history is sent on each call.
+                Defaults to resending the full history.
+            api_url: Chat completions endpoint. Defaults to the DeepSeek API.
+            stream: Stream responses over SSE and start the tool as soon as
+                `tool_name` and `tool_args` are complete, before the response ends.
+            max_parallel_tools: Upper bound on tool calls from one turn that run concurrently.
+            llm_cache: Optional on-disk response cache for recording or replaying LLM calls.
+            metrics: Optional registry (can be shared by many agents) that aggregates every
+                step's metrics for Prometheus export.
+            budget: Optional token/cost/time limits, reset at the start of every `run`.
+                When one is nearly spent the model is told to answer now; requests
+                ask for no more completion tokens than are left.
+            llm_client: HTTP client for the API, with rate limiting and retries.
+                Defaults to the process-wide client shared by all agents.
         """
         if api_key:
             self.api_key = api_key
@@ -40,21 +71,44 @@ class DevOpsAgent:
             
         self.model = model
         self.kubeconfig = kubeconfig
-        self.api_url = "https://api.deepseek.com/chat/completions"
+        self.api_url = api_url or "https://api.deepseek.com/chat/completions"
+        self.stream = stream
+        self.llm_cache = llm_cache
+        self.metrics = metrics
+        self.budget = budget
+        self.stop_reason: Optional[str] = None
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
-        self.session = requests.Session()
+        self.llm_client = llm_client or get_llm_client()
         
         # Define available tools and wrap them with partial if kubeconfig is provided
         from functools import partial
         
+        if tool_backend == "kubectl":
+            tools_module = k8s_tools
+        elif tool_backend == "api":
+            from online_rl_agent.tools import k8s_api_tools
+            tools_module = k8s_api_tools
+        else:
+            raise ValueError(f"Unknown tool backend '{tool_backend}'. Expected 'kubectl' or 'api'.")
+        self.tool_backend = tool_backend
+
         base_tools = {
-            "get_pods": k8s_tools.get_pods,
-            "describe_pod": k8s_tools.describe_pod,
-            "get_pod_logs": k8s_tools.get_pod_logs,
+            "get_pods": tools_module.get_pods,
+            "describe_pod": tools_module.describe_pod,
+            "get_pod_logs": tools_module.get_pod_logs,
         }
+
+        self.informer_cache = None
+        if use_informer_cache:
+            if tool_backend != "api":
+                raise ValueError("use_informer_cache requires tool_backend='api'.")
+            from online_rl_agent.tools.informer_cache import get_informer_cache
+            self.informer_cache = get_informer_cache(self.kubeconfig)
+            for name in ("get_pods", "describe_pod"):
+                base_tools[name] = partial(base_tools[name], cache=self.informer_cache)
         
         self.available_tools = {}
         for name, func in base_tools.items():
@@ -63,93 +117,317 @@ class DevOpsAgent:
             else:
                 self.available_tools[name] = func
                 
+        self.context_manager = context_manager or FullHistoryManager()
         self.conversation_history = []
+        # Runs the tool calls of a turn concurrently, including ones dispatched
+        # early from a streaming response.
+        self._tool_executor = ThreadPoolExecutor(max_workers=max(1, max_parallel_tools), thread_name_prefix="agent-tool")
+
+    def close(self) -> None:
+        """Shuts down the agent's tool thread pool. Call once the agent is no longer used."""
+        self._tool_executor.shutdown(wait=True)
 
-    def _call_llm(self, messages: list) -> Dict[str, Any]:
+    def _call_llm(self, messages: list, on_actions=None, max_tokens: int = 4096) -> Dict[str, Any]:
         """
         Calls the language model API.
+
+        Args:
+            messages: The prompt messages.
+            on_actions: Streaming only; called with the list of (tool_name, tool_args)
+                as soon as the action is complete in the streamed text.
+            max_tokens: Completion token limit of the request.
         """
         payload = {
             "model": self.model,
             "messages": messages,
             "temperature": 0.1, # Lower temperature for more deterministic tool use
-            "max_tokens": 4096,
+            "max_tokens": max_tokens,
         }
+        if self.llm_cache is not None and self.llm_cache.mode == "replay":
+            return dict(self.llm_cache.get(payload), cache_hit=True)
         try:
-            response = self.session.post(self.api_url, headers=self.headers, json=payload, timeout=120)
-            response.raise_for_status()
-            return response.json()
+            response_json = self.llm_client.complete(self.api_url, self.headers, payload, stream=self.stream,
+                                                     on_actions=on_actions)
         except requests.exceptions.RequestException as e:
             logging.error(f"API call failed: {e}")
             raise
+        if self.llm_cache is not None:
+            self.llm_cache.put(payload, {k: v for k, v in response_json.items() if k not in ("timing", "client")})
+        return response_json
+
+    def _timed_tool(self, tool_name: str, tool_args: Dict[str, Any], origin: float) -> Dict[str, Any]:
+        """Runs one tool and measures it relative to `origin` (the start of the turn)."""
+        started = time.monotonic()
+        try:
+            output = self.available_tools[tool_name](**tool_args)
+        except Exception as e:
+            # A failing tool must not take the other calls of its turn down with it.
+            logging.error(f"Tool {tool_name}({tool_args}) failed: {e}", exc_info=True)
+            output = f"Error: {e}"
+        finished = time.monotonic()
+        return {"output": output, "tool_started": started - origin, "tool_seconds": finished - started,
+                "output_bytes": len(output.encode("utf-8")) if isinstance(output, str) else 0}
 
-    def run(self, user_problem: str, max_steps: int = 10, trajectory_store: Optional[TrajectoryStore] = None) -> str:
+    def _dispatch_early(self, early: Dict[str, Any], calls: List[Tuple[str, Dict[str, Any]]], origin: float):
+        """
+        Starts the known tools of a partially streamed response (all tools are read-only).
+
+        Called once per attempt: when the LLM client retries a request, the new response
+        may repeat calls dispatched for the failed one. Those are matched to the futures
+        already pending instead of being run a second time.
+        """
+        # Futures of earlier attempts, each of which can stand in for one call of this one.
+        unclaimed = [action for action, _ in early.get("pending", [])]
+        for tool_name, tool_args in calls:
+            if tool_name in self.available_tools:
+                try:
+                    # Validated the same way as the final parse, so the results match up.
+                    tool_args, _ = validate_tool_args(self.available_tools[tool_name], tool_args)
+                except ValueError:
+                    continue
+                if (tool_name, tool_args) in unclaimed:
+                    unclaimed.remove((tool_name, tool_args))
+                    continue
+                early.setdefault("pending", []).append(
+                    ((tool_name, tool_args), self._tool_executor.submit(self._timed_tool, tool_name, tool_args, origin))
+                )
+                logging.info(f"Dispatched {tool_name}({tool_args}) while the response is still streaming.")
+
+    @staticmethod
+    def _take_early_result(early: Dict[str, Any], tool_name: str, tool_args: Dict[str, Any]) -> Optional[Future]:
+        """Pops an early-dispatched future that matches a parsed tool call, if any."""
+        pending = early.get("pending", [])
+        for i, (action, future) in enumerate(pending):
+            if action == (tool_name, tool_args):
+                del pending[i]
+                return future
+        return None
+
+    def _run_tool_calls(self, calls: List[Tuple[str, Dict[str, Any]]], early: Dict[str, Any],
+                        origin: float, errors: Optional[Dict[int, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Runs all tool calls of a turn concurrently on the bounded tool pool.
+
+        Calls listed in `errors` (index -> message, e.g. invalid arguments) are
+        not run; the message is returned as their output.
+
+        Returns:
+            One result per call, in order, with its output and timing.
+        """
+        errors = errors or {}
+        futures = []
+        for i, (tool_name, tool_args) in enumerate(calls):
+            if tool_name not in self.available_tools or i in errors:
+                futures.append(None)
+                continue
+            future = self._take_early_result(early, tool_name, tool_args)
+            if future is not None:
+                futures.append((future, True))
+            else:
+                futures.append((self._tool_executor.submit(self._timed_tool, tool_name, tool_args, origin), False))
+
+        results = []
+        for i, ((tool_name, tool_args), entry) in enumerate(zip(calls, futures)):
+            if entry is None:
+                error_message = errors.get(i) or f"Error: Unknown tool '{tool_name}'."
+                logging.error(error_message)
+                results.append({"tool_name": tool_name, "tool_args": tool_args, "output": error_message, "metrics": {}})
+                continue
+            future, was_early = entry
+            timed = future.result()
+            metrics = {"tool_started": timed["tool_started"], "tool_seconds": timed["tool_seconds"],
+                       "output_bytes": timed["output_bytes"]}
+            if was_early:
+                metrics["early_dispatch"] = True
+            results.append({"tool_name": tool_name, "tool_args": tool_args, "output": timed["output"], "metrics": metrics})
+        return results
+
+    def _observe(self, tool_name: str, metrics: Dict[str, Any]) -> None:
+        if self.metrics is not None:
+            self.metrics.observe_step(self.model, tool_name, metrics)
+
+    def _finish(self, stop_reason: str, trajectory_store: Optional[TrajectoryStore], answer: str) -> str:
+        """Records why the episode ended (and its usage, under a budget) and returns `answer`."""
+        self.stop_reason = stop_reason
+        if trajectory_store:
+            fields = {"stop_reason": stop_reason}
+            if self.budget is not None:
+                fields["usage"] = self.budget.summary()
+            trajectory_store.annotate(**fields)
+        if self.metrics is not None:
+            self.metrics.inc("agent_episodes_total", model=self.model, stop_reason=stop_reason)
+        return answer
+
+    def run(self, user_problem: str, max_steps: int = 10, trajectory_store: Optional[TrajectoryStore] = None,
+            deadline: Optional[float] = None) -> str:
         """
         Runs the agent to solve a user's problem.
+
+        Args:
+            user_problem: The problem reported by the user.
+            max_steps: Maximum number of LLM round trips.
+            trajectory_store: Optional store that records each step.
+            deadline: Optional `time.monotonic()` value after which no new step is started.
+
+        The reason the episode ended is kept in `self.stop_reason` and recorded as
+        the trajectory's "stop_reason": "final_answer", "max_steps", "deadline", or
+        the budget that ran out ("budget_tokens", "budget_cost", "budget_time",
+        "window_tokens", "window_cost"), also when that budget forced the final answer.
         """
         self.conversation_history = [
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_problem}
         ]
+        self.stop_reason = None
+        budget = self.budget
+        if budget is not None:
+            budget.start(self.model)
+        # The budget that made us ask for a final answer, once we have.
+        forced: Optional[str] = None
+        turn_started = time.monotonic()
         
         for step in range(max_steps):
+            if budget is not None and step:
+                budget.note_turn_seconds(time.monotonic() - turn_started)
+            turn_started = time.monotonic()
+            if deadline is not None and time.monotonic() >= deadline:
+                logging.warning(f"Episode deadline reached before step {step + 1}.")
+                return self._finish("deadline", trajectory_store,
+                                    "Agent could not reach a final answer within the time limit.")
+
             logging.info(f"--- Step {step + 1} ---")
             
-            response_json = self._call_llm(self.conversation_history)
+            messages = self.context_manager.build_messages(self.conversation_history)
+            max_tokens = 4096
+            if budget is not None:
+                prompt_estimate = sum(estimate_tokens(m["content"]) for m in messages)
+                action, reason = budget.check(prompt_estimate)
+                if action == CONTINUE and step == max_steps - 1:
+                    action, reason = FINALIZE, "max_steps"
+                if action == STOP:
+                    logging.warning(f"Episode budget spent ({reason}) before step {step + 1}.")
+                    return self._finish(reason, trajectory_store,
+                                        "Agent could not reach a final answer within its budget.")
+                if action == FINALIZE and forced is None:
+                    forced = reason
+                    logging.warning(f"Budget nearly spent ({reason}); asking for a final answer.")
+                    self.conversation_history.append({"role": "user", "content": FINALIZE_MESSAGE})
+                    messages = self.context_manager.build_messages(self.conversation_history)
+                    prompt_estimate += estimate_tokens(FINALIZE_MESSAGE)
+                max_tokens = budget.completion_allowance(prompt_estimate)
+            # Record the exact prompt whenever it differs from the raw history (or
+            # carries the request for a final answer, which no step records),
+            # so training sees what the model actually saw.
+            prompt = messages if messages is not self.conversation_history else None
+            if prompt is None and forced is not None:
+                prompt = list(messages)
+            early: Dict[str, Any] = {}
+            llm_started = time.monotonic()
+            on_actions = (lambda calls: self._dispatch_early(early, calls, llm_started)) if self.stream else None
+            response_json = self._call_llm(messages, on_actions=on_actions, max_tokens=max_tokens)
+            metrics = {"turn": step, "llm_seconds": time.monotonic() - llm_started}
+            usage = response_json.get("usage") or {}
+            if budget is not None:
+                metrics["max_tokens"] = max_tokens
+                if forced is not None:
+                    metrics["forced_final"] = forced
+                if not response_json.get("cache_hit"):
+                    content = (response_json["choices"][0]["message"].get("content") or "")
+                    budget.charge(usage.get("prompt_tokens", prompt_estimate),
+                                  usage.get("completion_tokens", estimate_tokens(content)))
+            if "prompt_tokens" in usage:
+                metrics["prompt_tokens"] = usage["prompt_tokens"]
+            if "completion_tokens" in usage:
+                metrics["completion_tokens"] = usage["completion_tokens"]
+            if response_json.get("cache_hit"):
+                metrics["llm_cache_hit"] = True
+            if "timing" in response_json:
+                metrics["time_to_first_token"] = response_json["timing"]["time_to_first_token"]
+                metrics["time_to_action"] = response_json["timing"]["time_to_action"]
+            if "client" in response_json:
+                metrics["llm_queue_seconds"] = response_json["client"]["queue_seconds"]
+                if response_json["client"]["attempts"] > 1:
+                    metrics["llm_attempts"] = response_json["client"]["attempts"]
             assistant_message = response_json['choices'][0]['message']
             
             # The model should return content in a specific JSON format.
             # We need to parse it to decide the next action.
             try:
-                # The response might contain markdown ```json ... ```, let's strip it.
-                content = assistant_message['content']
-                if content.strip().startswith("```json"):
-                    content = content.strip()[7:-4]
-
-                action_json = json.loads(content)
-                thought = action_json.get("thought", "")
-                tool_name = action_json.get("tool_name", "")
-                tool_args = action_json.get("tool_args", {})
+                # Tolerates fences, prose and truncation; only an unrecoverable
+                # response costs another round trip.
+                parsed = parse_action(assistant_message['content'], self.available_tools)
+                thought = parsed.thought
+                calls = parsed.calls
+                if parsed.repairs:
+                    metrics["parse_repairs"] = parsed.repairs
+                    logging.info(f"Recovered the action from a malformed response ({', '.join(parsed.repairs)}).")
                 
                 logging.info(f"Thought: {thought}")
-                logging.info(f"Action: {tool_name}({tool_args})")
+                for tool_name, tool_args in calls:
+                    logging.info(f"Action: {tool_name}({tool_args})")
 
-                self.conversation_history.append({"role": "assistant", "content": content})
+                self.conversation_history.append({"role": "assistant", "content": parsed.text})
 
-                if tool_name == "final_answer":
-                    final_answer = tool_args.get("answer", "No answer provided.")
+                final_call = next((args for name, args in calls if name == "final_answer"), None)
+                if final_call is not None:
+                    if len(calls) > 1:
+                        logging.warning("final_answer was combined with other tool calls; ignoring the others.")
+                    final_answer = final_call.get("answer", "No answer provided.")
                     logging.info(f"Final Answer: {final_answer}")
                     if trajectory_store:
-                        trajectory_store.add_final_answer(final_answer)
-                    return final_answer
+                        trajectory_store.add_final_answer(final_answer, prompt=prompt, metrics=metrics,
+                                                          response=assistant_message['content'])
+                    self._observe("final_answer", metrics)
+                    # Answering on the last allowed step is still the model's own decision.
+                    stop_reason = forced if forced not in (None, "max_steps") else "final_answer"
+                    return self._finish(stop_reason, trajectory_store, final_answer)
 
-                if tool_name in self.available_tools:
-                    tool_function = self.available_tools[tool_name]
-                    tool_output = tool_function(**tool_args)
-                    
+                if forced is not None:
+                    # Asked for a final answer and got more tool calls: stop without running them.
+                    error_message = "Error: Budget spent; the requested tool calls were not run."
+                    logging.warning(f"Model ignored the request for a final answer ({forced}).")
+                    self._observe("error", metrics)
                     if trajectory_store:
-                        trajectory_store.add_step(thought, tool_name, tool_args, tool_output)
-                        
-                    # Add tool output to history for the next turn
-                    tool_message = f"Tool {tool_name} output:\n{tool_output}"
-                    logging.info(tool_message)
-                    self.conversation_history.append({"role": "user", "content": tool_message})
-                else:
-                    error_message = f"Error: Unknown tool '{tool_name}'."
-                    logging.error(error_message)
+                        trajectory_store.add_step(thought, "error", {}, error_message, prompt=prompt, metrics=metrics,
+                                                  response=assistant_message['content'])
+                    return self._finish(forced, trajectory_store,
+                                        "Agent could not reach a final answer within its budget.")
+
+                results = self._run_tool_calls(calls, early, llm_started, errors=parsed.call_errors)
+                tool_messages = []
+                for i, result in enumerate(results):
+                    # Every sub-call is its own step; the prompt and LLM timings
+                    # belong to the turn and are recorded on its first step only.
+                    step_metrics = dict(metrics, **result["metrics"]) if i == 0 else dict(result["metrics"], turn=step)
+                    if len(results) > 1:
+                        step_metrics.update({"batch_index": i, "batch_size": len(results)})
+                    self._observe(result["tool_name"], step_metrics)
                     if trajectory_store:
-                        trajectory_store.add_step(thought, tool_name, tool_args, error_message)
-                    self.conversation_history.append({"role": "user", "content": error_message})
+                        trajectory_store.add_step(thought, result["tool_name"], result["tool_args"], result["output"],
+                                                  prompt=prompt if i == 0 else None, metrics=step_metrics,
+                                                  response=assistant_message['content'] if i == 0 else None)
+                    if result["tool_name"] in self.available_tools:
+                        tool_messages.append(f"Tool {result['tool_name']} output:\n{result['output']}")
+                    else:
+                        tool_messages.append(result["output"])
+                        
+                # Add all tool outputs to history as a single observation for the next turn
+                tool_message = "\n\n".join(tool_messages)
+                logging.info(tool_message)
+                self.conversation_history.append({"role": "user", "content": tool_message})
 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (ActionParseError, KeyError, TypeError) as e:
                 logging.error(f"Failed to parse model output: {assistant_message.get('content', '')}. Error: {e}")
                 # If parsing fails, we add an error message to the conversation and let the model try to recover.
-                error_message = "Error: Your response was not in the expected JSON format. Please correct your output."
+                error_message = f"Error: Your response was not in the expected JSON format ({e}). Please correct your output."
+                metrics["parse_error"] = True
+                self._observe("error", metrics)
                 if trajectory_store:
-                    trajectory_store.add_step("Error in parsing LLM output", "error", {}, error_message)
+                    trajectory_store.add_step("Error in parsing LLM output", "error", {}, error_message, prompt=prompt,
+                                              metrics=metrics, response=assistant_message.get('content'))
                 self.conversation_history.append({"role": "user", "content": error_message})
         
-        return "Agent could not reach a final answer within the step limit."
+        return self._finish("max_steps", trajectory_store, "Agent could not reach a final answer within the step limit.")
 
 if __name__ == '__main__':
     # This is for manual testing.
@@ -0,0 +1,227 @@
+"""
+Token, cost and wall-clock budgets for agent episodes.
+
+Without a budget an episode only stops at `max_steps`, and every call may
+bill up to 4096 completion tokens however little is left. `EpisodeBudget`
+charges the usage actually reported by the API to the episode (and,
+optionally, to a `SpendWindow` shared by every agent of a run) and tells
+`DevOpsAgent.run` before each call whether to continue, to force a final
+answer because the next turn would not fit, or to stop. It also caps the
+`max_tokens` of each request to what is left.
+"""
+import collections
+import logging
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# USD per million (prompt, completion) tokens. Override with `EpisodeBudget(pricing=...)`.
+DEFAULT_PRICING: Dict[str, Tuple[float, float]] = {
+    "deepseek-chat": (0.27, 1.10),
+    "deepseek-coder": (0.27, 1.10),
+    "deepseek-reasoner": (0.55, 2.19),
+}
+
+CONTINUE = "continue"
+FINALIZE = "finalize"
+STOP = "stop"
+
+FINALIZE_MESSAGE = (
+    "Your budget for this task is almost spent. Do not call any more tools: "
+    "respond now with the final_answer tool, based on what you have found so far."
+)
+
+
+def cost_of(model: str, prompt_tokens: int, completion_tokens: int,
+            pricing: Optional[Dict[str, Tuple[float, float]]] = None) -> float:
+    """Dollar cost of one call; unknown models cost 0."""
+    prompt_price, completion_price = (pricing or DEFAULT_PRICING).get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+class SpendWindow:
+    """
+    Token and dollar limits over a sliding time window, shared by all agents of a run.
+
+    Args:
+        max_tokens: Tokens (prompt + completion) allowed per window.
+        max_cost: Dollars allowed per window.
+        window_seconds: Length of the sliding window.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 window_seconds: float = 3600.0):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._charges: Deque[Tuple[float, int, float]] = collections.deque()
+        self._tokens = 0
+        self._cost = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self._charges and self._charges[0][0] <= now - self.window_seconds:
+            _, tokens, cost = self._charges.popleft()
+            self._tokens -= tokens
+            self._cost -= cost
+
+    def charge(self, tokens: int, cost: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._charges.append((now, tokens, cost))
+            self._tokens += tokens
+            self._cost += cost
+
+    def remaining(self) -> Tuple[Optional[int], Optional[float]]:
+        """Tokens and dollars left in the current window (None when unlimited)."""
+        with self._lock:
+            self._expire(time.monotonic())
+            tokens = None if self.max_tokens is None else max(0, self.max_tokens - self._tokens)
+            cost = None if self.max_cost is None else max(0.0, self.max_cost - self._cost)
+        return tokens, cost
+
+    def seconds_until_available(self) -> float:
+        """0 if the window has room, else how long until its oldest charge expires."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            full = ((self.max_tokens is not None and self._tokens >= self.max_tokens)
+                    or (self.max_cost is not None and self._cost >= self.max_cost))
+            if not full or not self._charges:
+                return 0.0
+            return max(0.0, self._charges[0][0] + self.window_seconds - now)
+
+
+class EpisodeBudget:
+    """
+    Per-episode limits, reused across the episodes of one agent (`start` resets it).
+
+    Args:
+        max_tokens: Prompt + completion tokens per episode.
+        max_cost: Dollars per episode.
+        max_seconds: Wall-clock seconds per episode.
+        window: Optional `SpendWindow` charged as well; its limits are enforced like the episode's.
+        pricing: Model name -> USD per million (prompt, completion) tokens.
+        completion_reserve: Completion tokens set aside for the forced final answer.
+        max_completion_tokens: Upper bound for `max_tokens` of every request.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_cost: Optional[float] = None,
+                 max_seconds: Optional[float] = None, window: Optional[SpendWindow] = None,
+                 pricing: Optional[Dict[str, Tuple[float, float]]] = None, completion_reserve: int = 512,
+                 max_completion_tokens: int = 4096):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.window = window
+        self.pricing = pricing or DEFAULT_PRICING
+        self.completion_reserve = completion_reserve
+        self.max_completion_tokens = max_completion_tokens
+        self.model = ""
+        self.start()
+
+    def start(self, model: str = "") -> None:
+        """Resets the usage for a new episode."""
+        if model:
+            self.model = model
+            if model not in self.pricing and (self.max_cost is not None
+                                              or (self.window and self.window.max_cost is not None)):
+                logging.warning(f"No pricing for model '{model}'; its calls are not counted against cost budgets.")
+        self.started = time.monotonic()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.calls = 0
+        self._turn_seconds = 0.0
+
+    def charge(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Records the usage of one LLM call."""
+        cost = cost_of(self.model, prompt_tokens, completion_tokens, self.pricing)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        self.calls += 1
+        if self.window is not None:
+            self.window.charge(prompt_tokens + completion_tokens, cost)
+
+    def note_turn_seconds(self, seconds: float) -> None:
+        """Records the duration of a full turn (LLM call + tools), used to predict the next one."""
+        self._turn_seconds = max(self._turn_seconds, seconds)
+
+    # --- Remaining budget ---
+
+    def _remaining(self) -> Dict[str, Optional[float]]:
+        used_tokens = self.prompt_tokens + self.completion_tokens
+        remaining = {
+            "budget_tokens": None if self.max_tokens is None else self.max_tokens - used_tokens,
+            "budget_cost": None if self.max_cost is None else self.max_cost - self.cost,
+            "budget_time": None if self.max_seconds is None else self.max_seconds - (time.monotonic() - self.started),
+        }
+        if self.window is not None:
+            remaining["window_tokens"], remaining["window_cost"] = self.window.remaining()
+        return remaining
+
+    def check(self, prompt_tokens: int) -> Tuple[str, Optional[str]]:
+        """
+        Decides what to do before the next LLM call.
+
+        Args:
+            prompt_tokens: Estimated size of the prompt about to be sent.
+
+        Returns:
+            (STOP, reason) if a limit is spent or not even this turn fits,
+            (FINALIZE, reason) if the turn after this one would not fit, else (CONTINUE, None). Reasons are
+            "budget_tokens", "budget_cost", "budget_time", "window_tokens" or "window_cost".
+        """
+        remaining = self._remaining()
+        for reason, left in remaining.items():
+            if left is not None and left <= 0:
+                return STOP, reason
+        needed_turn = prompt_tokens + self.completion_reserve
+        for reason in ("budget_tokens", "window_tokens"):
+            left = remaining.get(reason)
+            if left is not None and left < needed_turn:
+                return STOP, reason
+            # A tool turn now adds at least one more prompt of the same size.
+            if left is not None and left < 2 * needed_turn:
+                return FINALIZE, reason
+        for reason in ("budget_cost", "window_cost"):
+            left = remaining.get(reason)
+            if left is None:
+                continue
+            turn_cost = cost_of(self.model, prompt_tokens, self.completion_reserve, self.pricing)
+            if left < turn_cost:
+                return STOP, reason
+            if left < 2 * turn_cost:
+                return FINALIZE, reason
+        left = remaining["budget_time"]
+        if left is not None and self._turn_seconds and left < 2 * self._turn_seconds:
+            return FINALIZE, "budget_time"
+        return CONTINUE, None
+
+    def completion_allowance(self, prompt_tokens: int) -> int:
+        """`max_tokens` for the next request: what is left after the prompt, capped at `max_completion_tokens`."""
+        remaining = self._remaining()
+        allowance = self.max_completion_tokens
+        for reason in ("budget_tokens", "window_tokens"):
+            if remaining.get(reason) is not None:
+                allowance = min(allowance, remaining[reason] - prompt_tokens)
+        prompt_price, completion_price = self.pricing.get(self.model, (0.0, 0.0))
+        if completion_price:
+            for reason in ("budget_cost", "window_cost"):
+                if remaining.get(reason) is not None:
+                    left = remaining[reason] - prompt_tokens * prompt_price / 1e6
+                    allowance = min(allowance, left * 1e6 / completion_price)
+        return max(1, int(allowance))
+
+    def summary(self) -> Dict[str, Any]:
+        """Usage of the episode so far, for the trajectory."""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": round(self.cost, 6),
+            "seconds": round(time.monotonic() - self.started, 3),
+            "llm_calls": self.calls,
+            "limits": {"max_tokens": self.max_tokens, "max_cost": self.max_cost, "max_seconds": self.max_seconds},
+        }
@@ -0,0 +1,167 @@
+"""
+Strategies for turning the agent's conversation history into the prompt sent to the LLM.
+
+`DevOpsAgent` keeps the full, raw history (system prompt, task, and one
+assistant/observation pair per step). A conversation manager decides what of
+it is actually resent on each call, so prompt size does not grow without
+bound as tool outputs pile up.
+"""
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List
+
+Message = Dict[str, str]
+
+# Boundaries between the outputs of a parallel turn, which share one user message.
+_OUTPUT_BOUNDARY = re.compile(r"\n\n(?=Tool \S+ output:\n)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used when no tokenizer is configured."""
+    return len(text) // 4 + 1
+
+
+class ConversationManager(ABC):
+    """
+    Builds the list of messages for the next LLM call from the raw history.
+    """
+
+    @abstractmethod
+    def build_messages(self, history: List[Message]) -> List[Message]:
+        """
+        Args:
+            history: The agent's full conversation history. Must not be modified.
+
+        Returns:
+            The messages to send. Returning `history` itself signals that nothing was rewritten.
+        """
+        pass
+
+
+class FullHistoryManager(ConversationManager):
+    """Resends the whole history verbatim (the original behaviour)."""
+
+    def build_messages(self, history: List[Message]) -> List[Message]:
+        return history
+
+
+class TokenBudgetManager(ConversationManager):
+    """
+    Keeps the prompt under a token budget.
+
+    The system prompt, the user's task and the most recent turns are always
+    sent in full. Older tool observations are elided to their head and tail
+    first; if that is not enough, the oldest turns are folded into a single
+    extractive summary message (no extra LLM call). As a last resort recent
+    observations are elided too.
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 12000,
+        keep_recent_turns: int = 2,
+        elided_observation_chars: int = 600,
+        token_counter: Callable[[str], int] = estimate_tokens,
+    ):
+        """
+        Args:
+            max_prompt_tokens: Target upper bound on the prompt size.
+            keep_recent_turns: Number of most recent turns kept verbatim.
+            elided_observation_chars: Characters kept from an elided observation (split head/tail).
+            token_counter: Counts tokens in a string; defaults to a character-based estimate.
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.elided_observation_chars = elided_observation_chars
+        self.token_counter = token_counter
+
+    def count_tokens(self, messages: List[Message]) -> int:
+        # A few tokens of per-message overhead for role/formatting.
+        return sum(self.token_counter(m.get("content") or "") + 4 for m in messages)
+
+    @staticmethod
+    def _split_turns(messages: List[Message]) -> List[List[Message]]:
+        """Groups messages into turns, each starting at an assistant message."""
+        turns: List[List[Message]] = []
+        for message in messages:
+            if message["role"] == "assistant" or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return turns
+
+    def _elide(self, message: Message) -> Message:
+        content = message.get("content") or ""
+        if message["role"] != "user" or len(content) <= self.elided_observation_chars:
+            return message
+        head = self.elided_observation_chars // 2
+        tail = self.elided_observation_chars - head
+        omitted = len(content) - head - tail
+        elided = f"{content[:head]}\n[... {omitted} characters elided from this older observation ...]\n{content[-tail:]}"
+        return {**message, "content": elided}
+
+    @staticmethod
+    def _describe_turn(turn: List[Message]) -> str:
+        action = "unparsed response"
+        for message in turn:
+            if message["role"] != "assistant":
+                continue
+            try:
+                parsed = json.loads(message["content"])
+                calls = parsed["tool_calls"] if isinstance(parsed.get("tool_calls"), list) else [parsed]
+                action = ", ".join(f"{call.get('tool_name', '?')}({json.dumps(call.get('tool_args', {}))})"
+                                   for call in calls if isinstance(call, dict)) or action
+            except (ValueError, AttributeError, TypeError):
+                action = (message["content"] or "").strip().splitlines()[0][:120] if message["content"] else action
+        results = []
+        for message in turn:
+            if message["role"] != "user":
+                continue
+            for output in _OUTPUT_BOUNDARY.split(message.get("content") or ""):
+                lines = output.strip().splitlines()
+                # Skip the "Tool X output:" header line if present.
+                body = lines[1:] if lines and lines[0].startswith("Tool ") else lines
+                first = body[0][:120] if body else ""
+                results.append(f"{first} ({len(body)} lines)")
+        return f"{action} -> {'; '.join(results) or 'no output'}"
+
+    def _summary(self, turns: List[List[Message]]) -> Message:
+        lines = [f"{i + 1}. {self._describe_turn(turn)}" for i, turn in enumerate(turns)]
+        content = (
+            "Summary of earlier investigation steps (full outputs omitted to save space):\n"
+            + "\n".join(lines)
+        )
+        return {"role": "user", "content": content}
+
+    def build_messages(self, history: List[Message]) -> List[Message]:
+        if self.count_tokens(history) <= self.max_prompt_tokens:
+            return history
+
+        head = history[:2]
+        turns = self._split_turns(history[2:])
+        split = max(0, len(turns) - self.keep_recent_turns)
+        older = [[self._elide(m) for m in turn] for turn in turns[:split]]
+        recent = turns[split:]
+
+        def assemble(summarized, older_turns, recent_turns):
+            messages = list(head)
+            if summarized:
+                messages.append(self._summary(summarized))
+            for turn in older_turns + recent_turns:
+                messages.extend(turn)
+            return messages
+
+        # Summaries are built from the original turns so they report real output sizes.
+        older_raw = turns[:split]
+        summarized: List[List[Message]] = []
+        messages = assemble(summarized, older, recent)
+        while older and self.count_tokens(messages) > self.max_prompt_tokens:
+            older.pop(0)
+            summarized.append(older_raw.pop(0))
+            messages = assemble(summarized, older, recent)
+
+        if self.count_tokens(messages) > self.max_prompt_tokens:
+            recent = [[self._elide(m) for m in turn] for turn in recent]
+            messages = assemble(summarized, older, recent)
+        return messages
@@ -0,0 +1,160 @@
+"""
+Content-addressed, on-disk cache of chat-completion responses.
+
+Responses are keyed by a hash of the request fields that determine the
+completion (model, messages, temperature, max_tokens). Recording a run and
+then replaying it with `mode="replay"` reproduces an episode's LLM side
+deterministically and offline, at disk speed.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+# Request fields that identify a completion. Transport options (stream, timeouts) are excluded.
+FINGERPRINT_FIELDS = ("model", "messages", "temperature", "max_tokens")
+
+MODES = ("record", "replay", "passthrough")
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class LLMResponseCache:
+    """
+    Stores one JSON file per response under `cache_dir/<key[:2]>/<key>.json`.
+
+    Modes:
+        record: always call the API and store the result; recorded responses are
+            never served back, so sampling during live collection stays independent.
+        replay: serve hits from disk, raise `CacheMissError` on a miss (never calls the API).
+        passthrough: always call the API and store nothing.
+
+    Files are evicted least-recently-used first once the cache exceeds `max_bytes`;
+    a hit refreshes the file's modification time.
+    """
+
+    def __init__(self, cache_dir: str = 'data/llm_cache', mode: str = "record", max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding the cached responses.
+            mode: One of "record", "replay" or "passthrough".
+            max_bytes: Size limit for the cache directory; 0 disables eviction.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of {MODES}.")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = self._scan_size()
+
+    @staticmethod
+    def fingerprint(payload: Dict[str, Any]) -> str:
+        """Returns the cache key for a chat-completions request payload."""
+        key_fields = {field: payload.get(field) for field in FINGERPRINT_FIELDS}
+        canonical = json.dumps(key_fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _scan_size(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    def get(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the recorded response for a request.
+
+        Returns:
+            The response dict, or None outside replay mode.
+
+        Raises:
+            CacheMissError: On a miss in replay mode.
+        """
+        if self.mode != "replay":
+            return None
+        key = self.fingerprint(payload)
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used for LRU eviction.
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            raise CacheMissError(f"No recorded LLM response for request {key}.")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable LLM cache entry {path}: {e}")
+            with self._lock:
+                self._stats["misses"] += 1
+            raise CacheMissError(f"Unreadable LLM cache entry for request {key}.")
+        with self._lock:
+            self._stats["hits"] += 1
+        return entry["response"]
+
+    def put(self, payload: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """Records a response. A no-op outside record mode."""
+        if self.mode != "record":
+            return
+        key = self.fingerprint(payload)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"key": key, "request": {f: payload.get(f) for f in FINGERPRINT_FIELDS}, "response": response}
+        # Write atomically so concurrent agents never read a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats["stores"] += 1
+            self._total_bytes += os.path.getsize(path) - previous
+            over_limit = self.max_bytes and self._total_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Deletes least-recently-used entries until the cache is under 90% of `max_bytes`."""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        path = os.path.join(root, name)
+                        try:
+                            st = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self._stats["evictions"] += 1
+            self._total_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/store/eviction counters and the current cache size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._total_bytes
+        stats["mode"] = self.mode
+        return stats
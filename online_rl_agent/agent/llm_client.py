@@ -0,0 +1,264 @@
+"""
+A process-wide, rate-limited HTTP client for the chat completions API.
+
+Every agent of a concurrent run shares one `LLMClient`, so the provider's
+quota is enforced in one place instead of being discovered through 429s:
+
+- token buckets for requests and tokens per minute (a request reserves its
+  estimated prompt plus `max_tokens` and is refunded what it did not use),
+- a bounded number of requests in flight,
+- retries with exponential backoff and jitter on 429, 5xx and connection
+  errors, honouring `Retry-After`; a 429 pauses every caller, not just the
+  one that got it,
+- one keep-alive connection pool sized to the in-flight limit.
+
+How long each request queued before it was sent is returned with the
+response and, given an `AgentMetrics`, exported as a histogram.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from online_rl_agent.agent.context_manager import estimate_tokens
+from online_rl_agent.agent.metrics import AgentMetrics
+from online_rl_agent.agent.streaming import stream_chat_completion
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `per_minute / 60` per second.
+
+    `reserve` debits immediately (the level may go negative) and returns how
+    long the caller must wait, so concurrent callers queue up in order instead
+    of all waking up at once.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` from the bucket and returns the seconds to wait until it is covered."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Gives back part of a reservation that was not used."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+
+def _retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Parses `Retry-After` (delta-seconds or an HTTP date)."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """
+    Shared chat completions client with rate limiting, retries and connection pooling.
+
+    Args:
+        requests_per_minute: Request quota; None for no limit.
+        tokens_per_minute: Token quota (prompt + completion); None for no limit.
+        max_in_flight: Maximum concurrent requests, also the size of the connection pool.
+        max_retries: Retries per request after the first attempt.
+        backoff_base: First backoff in seconds, doubled on every retry.
+        backoff_max: Upper bound of a single backoff.
+        timeout: Per-attempt request timeout in seconds.
+        metrics: Optional registry for queue-wait and retry metrics.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_in_flight: int = 16, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, timeout: float = 120.0, metrics: Optional[AgentMetrics] = None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "throttled": 0, "failed": 0,
+                       "queue_seconds": 0.0, "in_flight": 0}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # --- Admission ---
+
+    def _pause(self, seconds: float) -> None:
+        """Holds back every caller for `seconds` (after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _admit(self, tokens: int) -> float:
+        """Waits for the quota and a free slot. Returns the seconds spent waiting."""
+        started = time.monotonic()
+        with self._lock:
+            paused = self._paused_until - started
+        if paused > 0:
+            time.sleep(paused)
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        self._slots.acquire()
+        with self._lock:
+            self._stats["in_flight"] += 1
+        return time.monotonic() - started
+
+    def _release(self) -> None:
+        with self._lock:
+            self._stats["in_flight"] -= 1
+        self._slots.release()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def _count(self, **deltas: float) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    # --- Requests ---
+
+    def complete(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], stream: bool = False,
+                 on_actions: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Sends one chat completion, waiting for quota and retrying transient failures.
+
+        Args:
+            url: The chat completions endpoint.
+            headers: Request headers (auth, content type).
+            payload: Request body.
+            stream: Use the server-sent events form (see `stream_chat_completion`).
+            on_actions: Streaming only; passed to `stream_chat_completion` on every attempt,
+                so a retried request may report calls it already reported (see
+                `DevOpsAgent._dispatch_early`, which runs each of them once).
+
+        Returns:
+            The response dict, plus a `client` dict with `queue_seconds` (total
+            time waiting for quota, slots and backoff) and `attempts`.
+
+        Raises:
+            requests.exceptions.RequestException: A non-retryable error, or the
+                last error once the retries are used up.
+        """
+        reserved = sum(estimate_tokens(m.get("content") or "") for m in payload.get("messages", []))
+        reserved += payload.get("max_tokens") or 0
+        queue_seconds = 0.0
+        self._count(requests=1)
+        for attempt in range(self.max_retries + 1):
+            queue_seconds += self._admit(reserved)
+            self._count(attempts=1)
+            response_json = None
+            try:
+                if stream:
+                    response_json = stream_chat_completion(self.session, url, headers, payload,
+                                                           timeout=self.timeout, on_actions=on_actions)
+                else:
+                    response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+                    response.raise_for_status()
+                    response_json = response.json()
+            except (requests.exceptions.HTTPError,) + RETRY_EXCEPTIONS as e:
+                response = getattr(e, "response", None)
+                status = response.status_code if response is not None else None
+                retryable = status in RETRY_STATUSES or isinstance(e, RETRY_EXCEPTIONS)
+                if not retryable or attempt == self.max_retries:
+                    self._count(failed=1)
+                    raise
+                delay = self._backoff(attempt, _retry_after_seconds(response))
+                reason = str(status) if status is not None else type(e).__name__
+                if status == 429:
+                    self._count(throttled=1)
+                    self._pause(delay)
+                self._count(retries=1)
+                if self.metrics is not None:
+                    self.metrics.inc("agent_llm_retries_total", reason=reason)
+                logging.warning(f"LLM request failed ({reason}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+                time.sleep(delay)
+                queue_seconds += delay
+                continue
+            finally:
+                self._release()
+                if response_json is None and self.token_bucket is not None:
+                    # Failed attempts, whatever the error, are not billed.
+                    self.token_bucket.refund(reserved)
+
+            usage = response_json.get("usage") or {}
+            if self.token_bucket is not None and usage:
+                used = usage.get("total_tokens", usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+                self.token_bucket.refund(reserved - used)
+            self._count(queue_seconds=queue_seconds)
+            if self.metrics is not None:
+                self.metrics.observe("agent_llm_queue_wait_seconds", queue_seconds)
+            response_json["client"] = {"queue_seconds": queue_seconds, "attempts": attempt + 1}
+            return response_json
+
+    def stats(self) -> Dict[str, float]:
+        """Counts of requests, attempts, retries, 429s and failures, total queue time and requests in flight."""
+        with self._lock:
+            return dict(self._stats)
+
+
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client(**kwargs: Any) -> LLMClient:
+    """
+    Returns the process-wide client, creating it on first use.
+
+    Args:
+        **kwargs: `LLMClient` arguments, used only when the client is first created.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient(**kwargs)
+            logging.info(f"Created shared LLM client (max_in_flight={_shared_client.max_in_flight})")
+        elif kwargs:
+            logging.warning("The shared LLM client already exists; ignoring the new settings.")
+        return _shared_client
@@ -0,0 +1,242 @@
+"""
+Prometheus-style metrics for the agent loop.
+
+`AgentMetrics` aggregates the per-step metrics that `DevOpsAgent.run` records
+in the trajectory (LLM latency, prompt/completion tokens, tool latency, tool
+output bytes, parse failures and recoveries) into counters and histograms labeled by model
+and tool. `render()` produces the Prometheus text exposition format, which
+can be served over HTTP (`serve`) or written to a file for the node_exporter
+textfile collector (`write`). No client library is needed. The shared
+`LLMClient` adds its queue-wait and retry metrics to the same registry.
+"""
+import bisect
+import logging
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels: Optional[str]) -> Labels:
+    return tuple(sorted((k, "" if v is None else str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class AgentMetrics:
+    """
+    Thread-safe registry of the agent's counters and histograms.
+
+    One instance can be shared by every agent of a concurrent run.
+    """
+
+    # name -> (type, help, buckets)
+    METRICS: Dict[str, Tuple[str, str, Optional[Sequence[float]]]] = {
+        "agent_steps_total": ("counter", "Agent steps, by model and tool.", None),
+        "agent_episodes_total": ("counter", "Finished agent episodes, by model and stop reason.", None),
+        "agent_parse_failures_total": ("counter", "LLM responses that could not be parsed as an action.", None),
+        "agent_parse_recoveries_total": ("counter", "Malformed LLM responses whose action was recovered, "
+                                         "by model and repair.", None),
+        "agent_llm_tokens_total": ("counter", "Tokens billed by the LLM, by model and kind (prompt/completion).", None),
+        "agent_llm_latency_seconds": ("histogram", "Latency of one LLM call.", LATENCY_BUCKETS),
+        "agent_llm_queue_wait_seconds": ("histogram", "Time an LLM request waited for rate limits, "
+                                         "a free slot or retry backoff.", LATENCY_BUCKETS),
+        "agent_llm_retries_total": ("counter", "Retried LLM requests, by reason (status code or error).", None),
+        "agent_llm_prompt_tokens": ("histogram", "Prompt tokens of one LLM call.", TOKEN_BUCKETS),
+        "agent_llm_completion_tokens": ("histogram", "Completion tokens of one LLM call.", TOKEN_BUCKETS),
+        "agent_tool_latency_seconds": ("histogram", "Latency of one tool call.", LATENCY_BUCKETS),
+        "agent_tool_output_bytes": ("histogram", "Size of one tool output.", BYTE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._export_stop: Optional[threading.Event] = None
+
+    # --- Recording ---
+
+    def inc(self, name: str, value: float = 1.0, **labels: Optional[str]) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Optional[str]) -> None:
+        key = _labels(**labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.METRICS[name][2])
+            histogram.observe(value)
+
+    def observe_step(self, model: str, tool_name: str, metrics: Dict[str, Any]) -> None:
+        """
+        Records one trajectory step from its `metrics` dict (see `DevOpsAgent.run`).
+
+        LLM figures are only present on the first step of a turn, so a turn with
+        several tool calls counts its LLM call once.
+        """
+        self.inc("agent_steps_total", model=model, tool=tool_name)
+        if metrics.get("parse_error"):
+            self.inc("agent_parse_failures_total", model=model)
+        for repair in metrics.get("parse_repairs") or ():
+            self.inc("agent_parse_recoveries_total", model=model, repair=repair)
+        if "llm_seconds" in metrics and not metrics.get("llm_cache_hit"):
+            self.observe("agent_llm_latency_seconds", metrics["llm_seconds"], model=model)
+        for kind in ("prompt", "completion"):
+            tokens = metrics.get(f"{kind}_tokens")
+            if tokens is not None and not metrics.get("llm_cache_hit"):
+                self.inc("agent_llm_tokens_total", tokens, model=model, kind=kind)
+                self.observe(f"agent_llm_{kind}_tokens", tokens, model=model)
+        if "tool_seconds" in metrics:
+            self.observe("agent_tool_latency_seconds", metrics["tool_seconds"], tool=tool_name)
+        if "output_bytes" in metrics:
+            self.observe("agent_tool_output_bytes", metrics["output_bytes"], tool=tool_name)
+
+    # --- Export ---
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            for name, (kind, help_text, _) in self.METRICS.items():
+                series = self._counters.get(name) if kind == "counter" else self._histograms.get(name)
+                if not series:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels in sorted(series):
+                    if kind == "counter":
+                        lines.append(f"{name}{_format_labels(labels)} {_format_number(series[labels])}")
+                        continue
+                    histogram = series[labels]
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = ("le", _format_number(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Atomically writes `render()` to `path`, e.g. for the node_exporter textfile collector."""
+        dir_name = os.path.dirname(path) or "."
+        os.makedirs(dir_name, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def export_periodically(self, path: str, interval: float = 15.0) -> None:
+        """Rewrites `path` every `interval` seconds on a background thread until `stop()`."""
+        stop_event = self._export_stop = threading.Event()
+
+        def loop():
+            while not stop_event.wait(interval):
+                try:
+                    self.write(path)
+                except OSError as e:
+                    logging.warning(f"Failed to write metrics to {path}: {e}")
+
+        threading.Thread(target=loop, name="metrics-export", daemon=True).start()
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> int:
+        """
+        Serves `/metrics` on a background thread.
+
+        Returns:
+            The bound port (useful with port 0).
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        bound = self._server.server_address[1]
+        logging.info(f"Serving agent metrics on http://{host}:{bound}/metrics")
+        return bound
+
+    def stop(self) -> None:
+        """Stops the HTTP server and the periodic file export, if running."""
+        if self._export_stop is not None:
+            self._export_stop.set()
+            self._export_stop = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Build Prometheus metrics from saved trajectories.")
+    parser.add_argument("jsonl", help="JSONL trajectory file.")
+    parser.add_argument("--out", help="Write the metrics to this file instead of printing them.")
+    args = parser.parse_args()
+
+    registry = AgentMetrics()
+    with open(args.jsonl) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            trajectory = json.loads(line)
+            for step in trajectory.get("steps") or []:
+                registry.observe_step(trajectory.get("model") or "", (step.get("action") or {}).get("tool_name", ""),
+                                      step.get("metrics") or {})
+    if args.out:
+        registry.write(args.out)
+    else:
+        print(registry.render(), end="")
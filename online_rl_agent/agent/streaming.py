@@ -0,0 +1,217 @@
+"""
+Streaming (server-sent events) support for chat completions.
+
+With `stream=True` the API sends the completion as a sequence of
+`data: {...}` events. `IncrementalActionParser` watches the text as it
+arrives and reports the action as soon as the top-level `tool_name` and
+`tool_args` values of the `{"tool_name", "tool_args", "thought"}` object (or
+its `tool_calls` list) are complete, so the agent can start the tools while
+the rest of the response is still being generated.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+
+class IncrementalActionParser:
+    """
+    Incrementally scans a JSON object for completed top-level values.
+
+    Text before the first `{` (e.g. a ```json fence) is ignored. Only the
+    outermost object is tracked; nested objects are captured as raw text and
+    decoded once they close.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+        self._expect_key = True
+        self.values: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> None:
+        """Consumes the next piece of streamed text."""
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            i = self._pos
+            self._pos += 1
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+            if self._depth == 0:
+                continue  # The object is closed; ignore trailing text.
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._close_top_level_string(i)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._token_start is None:
+                    self._token_start = i
+            elif ch in "{[":
+                if self._depth == 1 and self._token_start is None:
+                    self._token_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._key is not None and self._token_start is not None:
+                    self._store(text[self._token_start:i + 1])
+                elif self._depth == 0:
+                    self._flush_scalar(i)
+            elif self._depth == 1:
+                if ch == ":":
+                    self._expect_key = False
+                elif ch == ",":
+                    self._flush_scalar(i)
+                    self._expect_key = True
+                elif not ch.isspace() and self._token_start is None:
+                    self._token_start = i  # Start of a number/true/false/null.
+
+    def _close_top_level_string(self, end: int) -> None:
+        raw = self.text[self._token_start:end + 1]
+        if self._expect_key:
+            self._key = json.loads(raw)
+            self._token_start = None
+        else:
+            self._store(raw)
+
+    def _flush_scalar(self, end: int) -> None:
+        if self._key is not None and self._token_start is not None:
+            self._store(self.text[self._token_start:end].strip())
+
+    def _store(self, raw: str) -> None:
+        try:
+            self.values[self._key] = json.loads(raw)
+        except ValueError:
+            pass
+        self._key = None
+        self._token_start = None
+
+    def action(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Returns (tool_name, tool_args) once both values are complete, else None."""
+        if "tool_name" in self.values and "tool_args" in self.values:
+            tool_args = self.values["tool_args"]
+            return self.values["tool_name"], tool_args if isinstance(tool_args, dict) else {}
+        return None
+
+    def actions(self) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Returns every complete action, for either response form: a single
+        `tool_name`/`tool_args` pair or a `tool_calls` list. None until complete.
+        """
+        calls = self.values.get("tool_calls")
+        if isinstance(calls, list):
+            return [
+                (c.get("tool_name", ""), c.get("tool_args") if isinstance(c.get("tool_args"), dict) else {})
+                for c in calls if isinstance(c, dict)
+            ]
+        action = self.action()
+        return [action] if action is not None else None
+
+
+def iter_sse_data(response: requests.Response) -> Iterator[Dict[str, Any]]:
+    """Yields the decoded JSON payload of each `data:` event until `[DONE]`."""
+    # Event streams are UTF-8 by spec, but rarely declare a charset; requests would
+    # then decode text/* as ISO-8859-1 and mangle non-ASCII tokens.
+    for raw in response.iter_lines():
+        line = raw.decode("utf-8")
+        if not line or not line.startswith("data:"):
+            continue  # Keep-alive comments and blank separators.
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+def stream_chat_completion(
+    session: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    timeout: float = 120,
+    on_actions: Optional[Callable[[List[Tuple[str, Dict[str, Any]]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Posts a streaming chat completion and reassembles it.
+
+    Args:
+        session: HTTP session to use.
+        url: The chat completions endpoint.
+        headers: Request headers (auth, content type).
+        payload: Request body; `stream` is forced on.
+        timeout: Request timeout in seconds.
+        on_actions: Called once, from this thread, with the list of
+            (tool_name, tool_args) as soon as the action part of the streamed
+            text is complete.
+
+    Returns:
+        A response dict in the non-streaming shape (`choices[0].message.content`,
+        `usage` when the server sends it) plus a `timing` dict with
+        `time_to_first_token` and `time_to_action` in seconds (None if not reached).
+    """
+    payload = dict(payload, stream=True)
+    started = time.monotonic()
+    timing: Dict[str, Optional[float]] = {"time_to_first_token": None, "time_to_action": None, "total": None}
+    parser = IncrementalActionParser()
+    parts = []
+    usage = None
+    finish_reason = None
+    dispatched = False
+
+    with session.post(url, headers=headers, json=payload, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        for event in iter_sse_data(response):
+            if event.get("usage"):
+                usage = event["usage"]
+            for choice in event.get("choices") or []:
+                delta = choice.get("delta") or {}
+                piece = delta.get("content")
+                if choice.get("finish_reason"):
+                    finish_reason = choice["finish_reason"]
+                if not piece:
+                    continue
+                if timing["time_to_first_token"] is None:
+                    timing["time_to_first_token"] = time.monotonic() - started
+                parts.append(piece)
+                parser.feed(piece)
+                if not dispatched:
+                    actions = parser.actions()
+                    if actions is not None:
+                        dispatched = True
+                        timing["time_to_action"] = time.monotonic() - started
+                        if on_actions:
+                            on_actions(actions)
+
+    timing["total"] = time.monotonic() - started
+    result = {
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(parts)},
+            "finish_reason": finish_reason,
+        }],
+        "timing": timing,
+    }
+    if usage is not None:
+        result["usage"] = usage
+    return result
@@ -0,0 +1,72 @@
+from functools import partial
+
+import pytest
+
+from online_rl_agent.agent.action_parser import ActionParseError, parse_action
+
+
+def get_pods(namespace: str = "default", kubeconfig: str = None) -> str:
+    return ""
+
+
+def get_pod_logs(pod_name: str, namespace: str = "default", tail: int = 100, kubeconfig: str = None) -> str:
+    return ""
+
+
+TOOLS = {"get_pods": partial(get_pods, kubeconfig="/tmp/kc"), "get_pod_logs": partial(get_pod_logs, kubeconfig="/tmp/kc")}
+
+
+def test_clean_response_needs_no_repairs():
+    content = '{"tool_name": "get_pods", "tool_args": {"namespace": "shop"}, "thought": "look"}'
+    parsed = parse_action(content, TOOLS)
+    assert parsed.calls == [("get_pods", {"namespace": "shop"})]
+    assert parsed.repairs == [] and parsed.text == content
+
+
+def test_fence_prose_and_trailing_comma():
+    content = '```json\n{"tool_name": "get_pods", "tool_args": {"namespace": "shop",},}\n```\nLet me check.'
+    parsed = parse_action(content, TOOLS)
+    assert parsed.calls == [("get_pods", {"namespace": "shop"})]
+    assert parsed.repairs == ["fence", "prose", "trailing_comma"]
+
+
+def test_arguments_are_validated_and_coerced():
+    content = '{"tool_name": "get_pod_logs", "tool_args": {"pod_name": "adservice-1", "tail": "50", ' \
+              '"kubeconfig": "/etc/evil", "colour": "red"}}'
+    parsed = parse_action(content, TOOLS)
+    assert parsed.calls == [("get_pod_logs", {"pod_name": "adservice-1", "tail": 50})]
+    assert {"coerced_args", "reserved_args", "unknown_args"} <= set(parsed.repairs)
+
+
+def test_missing_argument_becomes_a_call_error():
+    parsed = parse_action('{"tool_name": "get_pod_logs", "tool_args": {}}', TOOLS)
+    assert "pod_name" in parsed.call_errors[0]
+
+
+def test_truncation_in_trailing_thought_is_accepted():
+    content = '{"tool_name": "get_pods", "tool_args": {"namespace": "shop"}, "thought": "The pods look'
+    parsed = parse_action(content, TOOLS)
+    assert parsed.calls == [("get_pods", {"namespace": "shop"})]
+    assert "unclosed" in parsed.repairs
+
+
+def test_truncation_after_closed_action_is_accepted():
+    parsed = parse_action('{"tool_name": "get_pods", "tool_args": {"namespace": "shop"}', TOOLS)
+    assert parsed.calls == [("get_pods", {"namespace": "shop"})]
+
+
+@pytest.mark.parametrize("content", [
+    '{"thought": "check logs", "tool_name": "get_pod_logs", "tool_args": {"pod_name": "adserv',
+    '{"thought": "check logs", "tool_name": "get_pod_logs", "tool_args": {"pod_name": "adservice-1", "tail": 1',
+    '{"thought": "done", "tool_name": "final_answer", "tool_args": {"answer": "The adservice pod was del',
+    '{"thought": "x", "tool_name": "get_po',
+    '{"tool_calls": [{"tool_name": "get_pods", "tool_args": {}}, {"tool_name": "get_pod_logs", "tool_args": {"pod_',
+])
+def test_truncation_inside_the_action_is_rejected(content):
+    with pytest.raises(ActionParseError, match="cut off"):
+        parse_action(content, TOOLS)
+
+
+def test_no_action_raises():
+    with pytest.raises(ActionParseError):
+        parse_action("I think the pod is broken.", TOOLS)
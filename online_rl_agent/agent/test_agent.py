@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from online_rl_agent.agent.agent import DevOpsAgent
+
+
+def _agent():
+    agent = DevOpsAgent(api_key="test", api_url="http://127.0.0.1:9/chat/completions", max_parallel_tools=4)
+
+    def describe_pod(pod_name, namespace="default"):
+        time.sleep(0.2)
+        return f"Name: {pod_name}"
+
+    def get_pod_logs(pod_name, namespace="default", tail=50):
+        raise RuntimeError("connection reset by peer")
+
+    def get_pods(namespace="default"):
+        time.sleep(0.1)
+        return "NAME READY"
+
+    agent.available_tools = {"describe_pod": describe_pod, "get_pod_logs": get_pod_logs, "get_pods": get_pods}
+    return agent
+
+
+def test_parallel_calls_keep_their_order_and_survive_a_failing_tool():
+    agent = _agent()
+    calls = [("describe_pod", {"pod_name": "cart-1"}), ("get_pod_logs", {"pod_name": "cart-1"}),
+             ("get_pods", {"namespace": "shop"}), ("restart_pod", {"pod_name": "cart-1"})]
+    started = time.monotonic()
+    try:
+        results = agent._run_tool_calls(calls, {}, started)
+    finally:
+        agent.close()
+    assert time.monotonic() - started < 0.29  # Ran side by side, not one after another.
+    assert [r["tool_name"] for r in results] == ["describe_pod", "get_pod_logs", "get_pods", "restart_pod"]
+    assert [r["output"] for r in results] == ["Name: cart-1", "Error: connection reset by peer", "NAME READY",
+                                              "Error: Unknown tool 'restart_pod'."]
+    assert results[0]["metrics"]["tool_seconds"] >= 0.2
+
+
+def test_close_shuts_down_the_tool_pool():
+    agent = _agent()
+    agent.close()
+    with pytest.raises(RuntimeError):
+        agent._tool_executor.submit(time.sleep, 0)
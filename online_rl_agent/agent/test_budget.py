@@ -0,0 +1,92 @@
+import time
+
+from online_rl_agent.agent.agent import DevOpsAgent
+from online_rl_agent.agent.budget import (CONTINUE, FINALIZE, FINALIZE_MESSAGE, STOP, EpisodeBudget, SpendWindow,
+                                          cost_of)
+from online_rl_agent.agent.context_manager import estimate_tokens
+from online_rl_agent.agent.prompts import SYSTEM_PROMPT
+from online_rl_agent.bench.stub_llm_server import DEFAULT_SCRIPT, StubLLMServer
+
+TASK = "Checkout is failing."
+
+
+def test_token_budget_finalizes_then_stops():
+    budget = EpisodeBudget(max_tokens=10000, completion_reserve=500)
+    assert budget.check(2000) == (CONTINUE, None)
+    budget.charge(5000, 500)
+    # 4500 left: this turn (2000 + 500 reserved) fits, a further one would not.
+    assert budget.check(2000) == (FINALIZE, "budget_tokens")
+    budget.charge(2000, 500)
+    assert budget.check(2000) == (STOP, "budget_tokens")
+
+
+def test_cost_budget_uses_model_pricing():
+    budget = EpisodeBudget(max_cost=0.01, completion_reserve=1000)
+    budget.start("deepseek-chat")
+    assert budget.check(1000) == (CONTINUE, None)
+    budget.charge(35000, 0)
+    assert budget.cost == cost_of("deepseek-chat", 35000, 0)
+    assert budget.check(1000) == (STOP, "budget_cost")
+
+
+def test_slow_turns_finalize_before_the_deadline():
+    budget = EpisodeBudget(max_seconds=10.0)
+    budget.note_turn_seconds(6.0)
+    assert budget.check(100) == (FINALIZE, "budget_time")
+
+
+def test_completion_allowance_is_capped_by_what_is_left():
+    budget = EpisodeBudget(max_tokens=3000, max_completion_tokens=4096)
+    assert budget.completion_allowance(1000) == 2000
+    budget.charge(2900, 0)
+    assert budget.completion_allowance(1000) == 1
+
+
+def test_spend_window_expires_old_charges():
+    window = SpendWindow(max_tokens=100, window_seconds=0.05)
+    window.charge(100, 0.0)
+    assert window.remaining() == (0, None)
+    assert 0 < window.seconds_until_available() <= 0.05
+    time.sleep(0.06)
+    assert window.remaining() == (100, None) and window.seconds_until_available() == 0.0
+
+
+def test_window_limit_applies_to_each_episode():
+    window = SpendWindow(max_tokens=1000)
+    first, second = EpisodeBudget(window=window), EpisodeBudget(window=window)
+    first.charge(1000, 0)
+    assert second.check(10) == (STOP, "window_tokens")
+
+
+def test_agent_asks_for_a_final_answer_when_the_budget_runs_low():
+    first_prompt = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(TASK)
+    # Room for the first turn and about one more: the second call must ask for the answer.
+    budget = EpisodeBudget(max_tokens=2 * (first_prompt + 512), completion_reserve=512)
+    with StubLLMServer(DEFAULT_SCRIPT) as stub:
+        agent = DevOpsAgent(api_key="test", api_url=stub.url, budget=budget)
+        agent.available_tools = {"get_pods": lambda namespace="default": "NAME READY\ncart-1 0/1"}
+        answer = agent.run(TASK, max_steps=5)
+    assert agent.stop_reason == "budget_tokens"
+    assert answer.startswith("A pod in the default namespace is failing")
+    assert len(stub.requests) == 2
+    assert stub.requests[1]["messages"][-1]["content"] == FINALIZE_MESSAGE
+    assert stub.requests[1]["max_tokens"] <= budget.max_tokens - budget.prompt_tokens
+
+
+def _run_with_script(script, budget, max_steps):
+    with StubLLMServer(script) as stub:
+        agent = DevOpsAgent(api_key="test", api_url=stub.url, budget=budget)
+        agent.available_tools = {"get_pods": lambda namespace="default": "NAME READY\ncart-1 0/1"}
+        agent.run(TASK, max_steps=max_steps)
+    return agent, stub
+
+
+def test_answer_on_the_last_step_keeps_its_stop_reason():
+    agent, stub = _run_with_script(DEFAULT_SCRIPT[1:], EpisodeBudget(), max_steps=1)
+    assert stub.requests[0]["messages"][-1]["content"] == FINALIZE_MESSAGE
+    assert agent.stop_reason == "final_answer"
+
+
+def test_tool_calls_on_the_last_step_stop_at_max_steps():
+    agent, _ = _run_with_script(DEFAULT_SCRIPT[:1], EpisodeBudget(), max_steps=2)
+    assert agent.stop_reason == "max_steps"
@@ -0,0 +1,33 @@
+import json
+
+from online_rl_agent.agent.context_manager import TokenBudgetManager
+
+
+def test_parallel_turn_is_summarized_per_call():
+    content = json.dumps({"tool_calls": [{"tool_name": "describe_pod", "tool_args": {"pod_name": "a"}},
+                                         {"tool_name": "get_pod_logs", "tool_args": {"pod_name": "a"}}],
+                          "thought": "both"})
+    observation = "Tool describe_pod output:\nName: a\nStatus: Running\n\nTool get_pod_logs output:\nstarted"
+    summary = TokenBudgetManager._describe_turn([{"role": "assistant", "content": content},
+                                                 {"role": "user", "content": observation}])
+    assert summary == ('describe_pod({"pod_name": "a"}), get_pod_logs({"pod_name": "a"}) -> '
+                       'Name: a (2 lines); started (1 lines)')
+
+
+def test_single_call_turn():
+    content = json.dumps({"tool_name": "get_pods", "tool_args": {"namespace": "shop"}, "thought": "look"})
+    summary = TokenBudgetManager._describe_turn([{"role": "assistant", "content": content},
+                                                 {"role": "user", "content": "Tool get_pods output:\nNAME READY"}])
+    assert summary == 'get_pods({"namespace": "shop"}) -> NAME READY (1 lines)'
+
+
+def test_old_turns_are_folded_into_a_summary():
+    history = [{"role": "system", "content": "sys"}, {"role": "user", "content": "task"}]
+    for i in range(6):
+        history.append({"role": "assistant", "content": json.dumps({"tool_name": "get_pods", "tool_args": {}})})
+        history.append({"role": "user", "content": "Tool get_pods output:\n" + "x" * 2000})
+    manager = TokenBudgetManager(max_prompt_tokens=1000, keep_recent_turns=1)
+    messages = manager.build_messages(history)
+    assert manager.count_tokens(messages) <= 1000
+    assert messages[2]["content"].startswith("Summary of earlier investigation steps")
+    assert "get_pods({})" in messages[2]["content"]
@@ -0,0 +1,22 @@
+import pytest
+
+from online_rl_agent.agent.llm_cache import CacheMissError, LLMResponseCache
+
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.1, "max_tokens": 64}
+RESPONSE = {"choices": [{"message": {"role": "assistant", "content": "{}"}}]}
+
+
+def test_record_mode_only_writes(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), mode="record")
+    cache.put(PAYLOAD, RESPONSE)
+    # Live collection must sample again rather than reuse an earlier response.
+    assert cache.get(PAYLOAD) is None
+    assert cache.stats()["stores"] == 1 and cache.stats()["hits"] == 0
+
+
+def test_replay_serves_recorded_responses(tmp_path):
+    LLMResponseCache(str(tmp_path), mode="record").put(PAYLOAD, RESPONSE)
+    replay = LLMResponseCache(str(tmp_path), mode="replay")
+    assert replay.get(PAYLOAD) == RESPONSE
+    with pytest.raises(CacheMissError):
+        replay.get(dict(PAYLOAD, temperature=0.7))
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from online_rl_agent.agent.agent import DevOpsAgent
+from online_rl_agent.agent.llm_client import LLMClient, TokenBucket
+
+ACTION = {"tool_name": "get_pods", "tool_args": {"namespace": "shop"}, "thought": "list the pods first"}
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers with the statuses in `server.statuses`, then streams or returns ACTION."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.server.seen += 1
+        if status == "cut":
+            self._stream(cut=True)
+        elif status != 200:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+        elif request.get("stream"):
+            self._stream(cut=False)
+        else:
+            body = json.dumps({"choices": [{"message": {"role": "assistant", "content": json.dumps(ACTION)}}],
+                               "usage": {"total_tokens": 10}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, cut: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        content = json.dumps(ACTION)
+        for i in range(0, len(content), 8):
+            event = {"choices": [{"index": 0, "delta": {"content": content[i:i + 8]}}]}
+            self._chunk(f"data: {json.dumps(event)}\n\n".encode())
+        if cut:
+            # The action has been streamed; drop the connection before the response ends.
+            self.close_connection = True
+            return
+        self._chunk(b'data: {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}\n\n')
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+@pytest.fixture
+def flaky_server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    httpd.daemon_threads = True
+    httpd.statuses, httpd.seen = [], 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd) -> str:
+    return f"http://127.0.0.1:{httpd.server_address[1]}/chat/completions"
+
+
+def test_token_bucket_debits_and_reports_the_wait():
+    bucket = TokenBucket(per_minute=60, burst=2)  # One token per second.
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    bucket.refund(1)
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(per_minute=6000, burst=10)  # 100 per second.
+    bucket.reserve(10)
+    time.sleep(0.05)
+    assert bucket.reserve(4) == 0.0
+
+
+def test_retries_transient_errors(flaky_server):
+    flaky_server.statuses = [429, 503]
+    client = LLMClient(backoff_base=0.01)
+    response = client.complete(_url(flaky_server), {}, {"messages": []})
+    assert response["client"]["attempts"] == 3
+    assert client.stats()["throttled"] == 1 and client.stats()["retries"] == 2
+
+
+def test_does_not_retry_client_errors(flaky_server):
+    flaky_server.statuses = [400]
+    client = LLMClient(backoff_base=0.01)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.complete(_url(flaky_server), {}, {"messages": []})
+    assert flaky_server.seen == 1
+
+
+def test_retry_after_streamed_action_does_not_run_the_tool_twice(flaky_server):
+    flaky_server.statuses = ["cut"]
+    runs = []
+    agent = DevOpsAgent(api_key="test", api_url=_url(flaky_server), stream=True,
+                        llm_client=LLMClient(backoff_base=0.01))
+    agent.available_tools = {"get_pods": lambda namespace="default": runs.append(namespace) or "NAME READY"}
+    early = {}
+    origin = time.monotonic()
+    response = agent._call_llm([{"role": "user", "content": "hi"}],
+                               on_actions=lambda calls: agent._dispatch_early(early, calls, origin))
+    assert response["client"]["attempts"] == 2
+    results = agent._run_tool_calls([("get_pods", {"namespace": "shop"})], early, origin)
+    assert runs == ["shop"]
+    assert results[0]["metrics"]["early_dispatch"]
+
+
+def test_non_retryable_errors_refund_reserved_tokens():
+    client = LLMClient(tokens_per_minute=60, backoff_base=0.01)
+    with pytest.raises(requests.exceptions.RequestException):
+        client.complete("not-a-url", {}, {"messages": [], "max_tokens": 50})
+    assert client.token_bucket.reserve(0) == 0.0
+    assert client.token_bucket._level > 59
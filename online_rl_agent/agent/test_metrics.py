@@ -0,0 +1,48 @@
+import urllib.request
+
+from online_rl_agent.agent.metrics import AgentMetrics
+
+
+def _sample(text, line_prefix):
+    [line] = [line for line in text.splitlines() if line.startswith(line_prefix + " ")]
+    return line.rsplit(" ", 1)[1]
+
+
+def test_step_metrics_become_counters_and_histograms():
+    metrics = AgentMetrics()
+    metrics.observe_step("m", "get_pods", {"llm_seconds": 0.3, "prompt_tokens": 1000, "completion_tokens": 50,
+                                           "tool_seconds": 0.02, "output_bytes": 5000})
+    metrics.observe_step("m", "get_logs", {"tool_seconds": 0.2})  # Second tool of the same turn.
+    metrics.observe_step("m", "error", {"llm_seconds": 0.01, "prompt_tokens": 10, "llm_cache_hit": True,
+                                        "parse_error": True, "parse_repairs": ["fence"]})
+    text = metrics.render()
+    assert _sample(text, 'agent_steps_total{model="m",tool="get_pods"}') == "1"
+    assert _sample(text, 'agent_llm_tokens_total{kind="prompt",model="m"}') == "1000"  # Cache hits are free.
+    assert _sample(text, 'agent_llm_latency_seconds_count{model="m"}') == "1"
+    assert _sample(text, 'agent_llm_latency_seconds_bucket{model="m",le="0.25"}') == "0"
+    assert _sample(text, 'agent_llm_latency_seconds_bucket{model="m",le="0.5"}') == "1"
+    assert _sample(text, 'agent_llm_latency_seconds_bucket{model="m",le="+Inf"}') == "1"
+    assert _sample(text, 'agent_tool_output_bytes_sum{tool="get_pods"}') == "5000"
+    assert _sample(text, 'agent_parse_failures_total{model="m"}') == "1"
+    assert _sample(text, 'agent_parse_recoveries_total{model="m",repair="fence"}') == "1"
+    assert "# TYPE agent_tool_latency_seconds histogram" in text
+    assert "agent_episodes_total" not in text  # Nothing recorded, nothing rendered.
+
+
+def test_label_values_are_escaped():
+    metrics = AgentMetrics()
+    metrics.inc("agent_llm_retries_total", reason='bad "gateway"\n')
+    assert 'agent_llm_retries_total{reason="bad \\"gateway\\"\\n"} 1' in metrics.render()
+
+
+def test_write_and_serve(tmp_path):
+    metrics = AgentMetrics()
+    metrics.inc("agent_episodes_total", model="m", stop_reason="final_answer")
+    metrics.write(str(tmp_path / "agent.prom"))
+    assert (tmp_path / "agent.prom").read_text() == metrics.render()
+    port = metrics.serve(0, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.read().decode() == metrics.render()
+    finally:
+        metrics.stop()
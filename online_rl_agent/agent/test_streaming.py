@@ -0,0 +1,51 @@
+import io
+import json
+
+import requests
+
+from online_rl_agent.agent.streaming import IncrementalActionParser, iter_sse_data, stream_chat_completion
+from online_rl_agent.bench.stub_llm_server import DEFAULT_SCRIPT, StubLLMServer
+
+
+def _feed(text: str, step: int = 3) -> IncrementalActionParser:
+    parser = IncrementalActionParser()
+    for i in range(0, len(text), step):
+        parser.feed(text[i:i + step])
+    return parser
+
+
+def test_action_is_complete_before_the_trailing_thought():
+    content = DEFAULT_SCRIPT[0]
+    prefix = content[:content.index('"thought"')]
+    assert _feed(prefix).actions() == [("get_pods", {"namespace": "default"})]
+
+
+def test_tool_calls_are_reported_together():
+    content = json.dumps({"tool_calls": [{"tool_name": "describe_pod", "tool_args": {"pod_name": "a"}},
+                                         {"tool_name": "get_pod_logs", "tool_args": {"pod_name": "a"}}],
+                          "thought": "both"})
+    prefix = content[:content.index('"thought"')]
+    assert [name for name, _ in _feed(prefix).actions()] == ["describe_pod", "get_pod_logs"]
+
+
+def test_partial_arguments_are_not_reported():
+    assert _feed('{"tool_name": "get_pods", "tool_args": {"namespace": "def').actions() is None
+
+
+def test_stream_dispatches_the_action_before_the_response_ends():
+    seen = []
+    with StubLLMServer(chunk_chars=8, chunk_interval=0.005) as stub:
+        response = stream_chat_completion(requests.Session(), stub.url, {}, {"messages": []},
+                                          on_actions=seen.append)
+    assert seen == [[("get_pods", {"namespace": "default"})]]
+    assert response["choices"][0]["message"]["content"] == DEFAULT_SCRIPT[0]
+    timing = response["timing"]
+    # With the thought after the action, the rest of the response streams while the tool runs.
+    assert timing["time_to_action"] < 0.8 * timing["total"]
+
+
+def test_sse_lines_are_decoded_as_utf8_without_a_charset():
+    response = requests.Response()
+    response.raw = io.BytesIO('data: {"content": "Pod läuft nicht ✗"}\n\ndata: [DONE]\n'.encode("utf-8"))
+    response.encoding = "ISO-8859-1"  # What requests infers for text/event-stream without a charset.
+    assert list(iter_sse_data(response)) == [{"content": "Pod läuft nicht ✗"}]
@@ -0,0 +1,333 @@
+"""
+Offline end-to-end benchmark of the episode loop.
+
+Runs scripted episodes through the real `DevOpsAgent.run` and
+`TrajectoryStore`, against the local `StubLLMServer` and a `StubToolBackend`,
+so no cluster or API key is needed. Reports throughput (episodes/sec), the
+p50/p99 of per-step LLM, tool and store time, and memory per episode, and
+writes everything to a JSON file. With `--baseline` it compares against an
+earlier result file and exits non-zero when a metric regressed beyond the
+tolerance, so it can run in CI.
+
+    python -m online_rl_agent.bench.episode_bench --episodes 200 --concurrency 8 --out bench_results.json
+    python -m online_rl_agent.bench.episode_bench --baseline bench_results.json --tolerance 0.2
+"""
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from online_rl_agent.agent.agent import DevOpsAgent
+from online_rl_agent.bench.stub_llm_server import StubLLMServer
+from online_rl_agent.bench.stub_tools import StubToolBackend
+from online_rl_agent.data.trajectory_store import TrajectoryStore
+
+# A four-turn diagnosis: list pods, describe and read logs in parallel, answer.
+EPISODE_SCRIPT = [
+    json.dumps({
+        "tool_name": "get_pods",
+        "tool_args": {"namespace": "default"},
+        "thought": "The user reports an outage. I will list the pods in the default namespace first.",
+    }),
+    json.dumps({
+        "tool_calls": [
+            {"tool_name": "describe_pod", "tool_args": {"pod_name": "adservice-7d4b9c8f6d-x2k9p", "namespace": "default"}},
+            {"tool_name": "get_pod_logs", "tool_args": {"pod_name": "adservice-7d4b9c8f6d-x2k9p", "namespace": "default"}},
+        ],
+        "thought": "adservice is in CrashLoopBackOff. I will describe it and read its logs.",
+    }),
+    json.dumps({
+        "tool_name": "get_pods",
+        "tool_args": {"namespace": "default"},
+        "thought": "The logs show connection errors. Let me confirm the other pods are healthy.",
+    }),
+    json.dumps({
+        "tool_name": "final_answer",
+        "tool_args": {"answer": "adservice crashes because it cannot reach its backend; fix the backend address."},
+        "thought": "I have enough information to answer.",
+    }),
+]
+
+# Metrics compared against a baseline, and whether larger is better.
+REGRESSION_METRICS = {
+    "episodes_per_sec": True,
+    "latency.llm.p50": False,
+    "latency.llm.p99": False,
+    "latency.tool.p50": False,
+    "latency.tool.p99": False,
+    "latency.store.p50": False,
+    "latency.store.p99": False,
+    "memory.peak_bytes_per_episode": False,
+}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": _percentile(values, 50),
+        "p99": _percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class TimedTrajectoryStore(TrajectoryStore):
+    """A `TrajectoryStore` that records the time spent in each call, plus the agent's step metrics."""
+
+    def __init__(self, *args, samples: Dict[str, List[float]], lock: threading.Lock, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._samples = samples
+        self._samples_lock = lock
+
+    def _add(self, key: str, value: float) -> None:
+        with self._samples_lock:
+            self._samples[key].append(value)
+
+    def add_step(self, thought, tool_name, tool_args, tool_output, prompt=None, metrics=None, response=None):
+        started = time.perf_counter()
+        super().add_step(thought, tool_name, tool_args, tool_output, prompt=prompt, metrics=metrics, response=response)
+        self._add("store", time.perf_counter() - started)
+        if metrics:
+            if "llm_seconds" in metrics:
+                self._add("llm", metrics["llm_seconds"])
+            if "tool_seconds" in metrics:
+                self._add("tool", metrics["tool_seconds"])
+
+    def save_trajectory(self):
+        started = time.perf_counter()
+        super().save_trajectory()
+        self._add("save", time.perf_counter() - started)
+
+
+class EpisodeBenchmark:
+    """
+    Drives scripted episodes through the agent and the trajectory store.
+
+    Args:
+        episodes: Number of episodes in the throughput run.
+        concurrency: Episodes in flight at once (one agent per worker thread).
+        llm_latency: Stub server delay before each response, in seconds.
+        tool_latency: Base delay per tool call, in seconds.
+        tool_jitter: Extra uniformly distributed tool delay, in seconds.
+        observation_bytes: Minimum size of each tool output.
+        stream: Use the agent's streaming path.
+        memory_episodes: Episodes run one by one under `tracemalloc` for the memory figures (0 skips).
+        work_dir: Where trajectories are written; a temporary directory by default.
+    """
+
+    def __init__(self, episodes: int = 50, concurrency: int = 4, llm_latency: float = 0.0,
+                 tool_latency: float = 0.0, tool_jitter: float = 0.0, observation_bytes: int = 0,
+                 stream: bool = False, memory_episodes: int = 5, work_dir: Optional[str] = None):
+        self.episodes = episodes
+        self.concurrency = max(1, concurrency)
+        self.llm_latency = llm_latency
+        self.tool_latency = tool_latency
+        self.tool_jitter = tool_jitter
+        self.observation_bytes = observation_bytes
+        self.stream = stream
+        self.memory_episodes = memory_episodes
+        self.work_dir = work_dir
+
+    def _agent(self, server: StubLLMServer, tools: StubToolBackend) -> DevOpsAgent:
+        agent = DevOpsAgent(api_key="bench", model="bench-model", api_url=server.url, stream=self.stream)
+        agent.available_tools = tools.tools()
+        return agent
+
+    def _episode(self, agent: DevOpsAgent, store: TrajectoryStore, index: int) -> None:
+        store.start_new_trajectory(f"bench_{index}", {"scenario": "bench", "model": agent.model})
+        agent.run("My service is down, please investigate and find the root cause.", trajectory_store=store)
+        store.end_trajectory(1)
+        store.save_trajectory()
+
+    def _throughput(self, server: StubLLMServer, tools: StubToolBackend, save_path: str) -> Dict[str, Any]:
+        samples: Dict[str, List[float]] = {"llm": [], "tool": [], "store": [], "save": [], "episode": []}
+        lock = threading.Lock()
+        counter = iter(range(self.episodes))
+        counter_lock = threading.Lock()
+
+        def worker() -> None:
+            agent = self._agent(server, tools)
+            store = TimedTrajectoryStore(save_path, samples=samples, lock=lock)
+            while True:
+                with counter_lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                started = time.perf_counter()
+                self._episode(agent, store, index)
+                with lock:
+                    samples["episode"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bench-worker") as executor:
+            for future in [executor.submit(worker) for _ in range(self.concurrency)]:
+                future.result()
+        wall = time.perf_counter() - started
+        return {
+            "wall_seconds": wall,
+            "episodes_per_sec": self.episodes / wall if wall > 0 else 0.0,
+            "steps": len(samples["store"]),
+            "latency": {key: _summary(values) for key, values in samples.items()},
+        }
+
+    def _memory(self, server: StubLLMServer, tools: StubToolBackend, save_path: str) -> Dict[str, Any]:
+        samples: Dict[str, List[float]] = {"llm": [], "tool": [], "store": [], "save": []}
+        agent = self._agent(server, tools)
+        store = TimedTrajectoryStore(save_path, samples=samples, lock=threading.Lock())
+        self._episode(agent, store, -1)  # Warm up imports, connections and caches.
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for i in range(self.memory_episodes):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                self._episode(agent, store, -2 - i)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+        return {
+            "peak_bytes_per_episode": max(peaks),
+            "retained_bytes_per_episode": sum(retained) / len(retained),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """Runs the throughput pass, then the memory pass, and returns the report."""
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix="episode-bench-")
+        save_path = os.path.join(work_dir, "trajectories.jsonl")
+        tools = StubToolBackend(latency=self.tool_latency, jitter=self.tool_jitter,
+                                output_bytes=self.observation_bytes, seed=0)
+        server = StubLLMServer(script=EPISODE_SCRIPT, first_token_latency=self.llm_latency, by_turn=True,
+                               record_requests=False)
+        try:
+            with server:
+                report = self._throughput(server, tools, save_path)
+                if self.memory_episodes > 0:
+                    report["memory"] = self._memory(server, tools, os.path.join(work_dir, "memory.jsonl"))
+        finally:
+            if self.work_dir is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        report["config"] = {
+            "episodes": self.episodes,
+            "concurrency": self.concurrency,
+            "llm_latency": self.llm_latency,
+            "tool_latency": self.tool_latency,
+            "tool_jitter": self.tool_jitter,
+            "observation_bytes": self.observation_bytes,
+            "stream": self.stream,
+            "script_turns": len(EPISODE_SCRIPT),
+        }
+        report["environment"] = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git_commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        return report
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lookup(report: Dict[str, Any], dotted: str) -> Optional[float]:
+    value: Any = report
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2,
+            min_seconds: float = 1e-3) -> List[str]:
+    """
+    Lists the metrics that are worse than the baseline by more than `tolerance` (relative).
+
+    Latencies below `min_seconds` in both runs are too noisy to compare and are skipped.
+    """
+    regressions = []
+    for metric, higher_is_better in REGRESSION_METRICS.items():
+        new, old = _lookup(report, metric), _lookup(baseline, metric)
+        if new is None or not old:
+            continue
+        if metric.startswith("latency.") and max(new, old) < min_seconds:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{metric}: {old:.6g} -> {new:.6g} ({change:+.0%})")
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the episode loop offline.")
+    parser.add_argument("--episodes", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM delay per response, seconds.")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Stub tool delay per call, seconds.")
+    parser.add_argument("--tool-jitter", type=float, default=0.0)
+    parser.add_argument("--observation-bytes", type=int, default=0, help="Pad tool outputs to this size.")
+    parser.add_argument("--stream", action="store_true", help="Use the agent's streaming path.")
+    parser.add_argument("--memory-episodes", type=int, default=5)
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON report.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)  # The agent logs every step at INFO.
+    bench = EpisodeBenchmark(
+        episodes=args.episodes, concurrency=args.concurrency, llm_latency=args.llm_latency,
+        tool_latency=args.tool_latency, tool_jitter=args.tool_jitter, observation_bytes=args.observation_bytes,
+        stream=args.stream, memory_episodes=args.memory_episodes,
+    )
+    result = bench.run()
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    latency = result["latency"]
+    print(f"{args.episodes} episodes in {result['wall_seconds']:.2f}s: {result['episodes_per_sec']:.1f} episodes/sec, "
+          f"{result['steps']} steps")
+    for key in ("llm", "tool", "store", "save"):
+        print(f"  {key:6} p50={latency[key]['p50'] * 1000:8.3f}ms  p99={latency[key]['p99'] * 1000:8.3f}ms")
+    if "memory" in result:
+        print(f"  memory peak/episode={result['memory']['peak_bytes_per_episode'] / 1024:.1f}KiB  "
+              f"retained/episode={result['memory']['retained_bytes_per_episode'] / 1024:.1f}KiB")
+    print(f"Report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), tolerance=args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
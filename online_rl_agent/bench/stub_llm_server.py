@@ -0,0 +1,199 @@
+"""
+A local stand-in for the DeepSeek chat-completions endpoint.
+
+Replies come from a script (a list of assistant message contents, replayed in
+order and cycled, or chosen by the turn number of the conversation so that
+concurrent agents each follow the script), with configurable latency. Both the plain JSON response
+and the `stream=True` server-sent-events form are supported, so the agent's
+streaming path can be exercised without network access or an API key.
+
+    python -m online_rl_agent.bench.stub_llm_server --port 8089
+    # then point DevOpsAgent(api_url="http://127.0.0.1:8089/chat/completions", ...)
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DEFAULT_SCRIPT = [
+    json.dumps({
+        "tool_name": "get_pods",
+        "tool_args": {"namespace": "default"},
+        "thought": "The user reports an outage. I will list the pods in the default namespace first.",
+    }),
+    json.dumps({
+        "tool_name": "final_answer",
+        "tool_args": {"answer": "A pod in the default namespace is failing; restart it."},
+        "thought": "I have enough information to answer.",
+    }),
+]
+
+
+class StubLLMServer:
+    """
+    Threaded HTTP server that replays scripted chat completions.
+
+    Args:
+        script: Assistant message contents returned in order (cycled).
+        first_token_latency: Seconds before the first byte of a response.
+        chunk_chars: Characters per streamed delta.
+        chunk_interval: Seconds between streamed deltas.
+        host: Interface to bind.
+        port: Port to bind; 0 picks a free port.
+        by_turn: Reply with the script entry for the request's turn (its number of
+            assistant messages) instead of the next one in a shared sequence.
+        record_requests: Keep every request in `requests` (disable for long benchmarks).
+    """
+
+    def __init__(self, script: Optional[List[str]] = None, first_token_latency: float = 0.0,
+                 chunk_chars: int = 8, chunk_interval: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 by_turn: bool = False, record_requests: bool = True):
+        self.script = list(script or DEFAULT_SCRIPT)
+        self.first_token_latency = first_token_latency
+        self.chunk_chars = max(1, chunk_chars)
+        self.chunk_interval = chunk_interval
+        self.by_turn = by_turn
+        self.record_requests = record_requests
+        self.requests: List[dict] = []
+        self._index = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def next_content(self, request: dict) -> str:
+        with self._lock:
+            if self.record_requests:
+                self.requests.append(request)
+            if self.by_turn:
+                turn = sum(1 for m in request.get("messages", []) if m.get("role") == "assistant")
+                return self.script[turn % len(self.script)]
+            content = self.script[self._index % len(self.script)]
+            self._index += 1
+            return content
+
+    def reset(self):
+        """Restarts the script from the first reply."""
+        with self._lock:
+            self._index = 0
+            self.requests = []
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output clean.
+
+            def setup(self):
+                super().setup()
+                # Headers and body are separate writes; without this, Nagle's algorithm and the
+                # client's delayed ACK add ~40ms to every keep-alive response.
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                content = server.next_content(request)
+                usage = {
+                    "prompt_tokens": sum(len(m.get("content") or "") for m in request.get("messages", [])) // 4,
+                    "completion_tokens": len(content) // 4 + 1,
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                if server.first_token_latency:
+                    time.sleep(server.first_token_latency)
+                if request.get("stream"):
+                    self._stream(request, content, usage)
+                else:
+                    self._respond(request, content, usage)
+
+            def _respond(self, request, content, usage):
+                body = json.dumps({
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, request, content, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+                def send(payload):
+                    self.wfile.write(f"data: {payload}\n\n".encode())
+                    self.wfile.flush()
+
+                for start in range(0, len(content), server.chunk_chars):
+                    send(json.dumps({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": content[start:start + server.chunk_chars]},
+                                     "finish_reason": None}],
+                    }))
+                    if server.chunk_interval:
+                        time.sleep(server.chunk_interval)
+                send(json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "usage": usage,
+                }))
+                send("[DONE]")
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve scripted chat completions locally.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--chunk-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    stub = StubLLMServer(first_token_latency=args.first_token_latency, chunk_interval=args.chunk_interval,
+                         port=args.port).start()
+    print(f"Stub chat-completions server listening on {stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,91 @@
+"""
+An offline tool backend with canned kubectl-style output and configurable latency.
+
+`StubToolBackend.tools()` returns the same tool names and signatures as
+`k8s_tools`/`k8s_api_tools`, so it can replace `DevOpsAgent.available_tools`
+in benchmarks without a cluster. Latency is a fixed base plus uniform jitter
+per call; outputs can be padded to a target size to model large observations.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+GET_PODS_OUTPUT = """NAME                                     READY   STATUS             RESTARTS   AGE
+adservice-7d4b9c8f6d-x2k9p               0/1     CrashLoopBackOff   6          12m
+cartservice-5c8d7b9f4b-q8w2n             1/1     Running            0          3h
+currencyservice-6f7b8c9d5e-m4n7k         1/1     Running            0          3h
+frontend-7b9c8d6f5e-p2r4t                1/1     Running            0          3h
+productcatalogservice-5d6e7f8a9b-k3j5h   1/1     Running            0          3h
+recommendationservice-8c9d0e1f2a-w6x8z   1/1     Running            0          3h"""
+
+DESCRIBE_POD_OUTPUT = """Name:             {pod_name}
+Namespace:        {namespace}
+Priority:         0
+Node:             kind-control-plane/172.18.0.2
+Status:           Running
+Containers:
+  server:
+    Image:          gcr.io/google-samples/microservices-demo/adservice:v0.8.0
+    State:          Waiting
+      Reason:       CrashLoopBackOff
+    Last State:     Terminated
+      Reason:       Error
+      Exit Code:    1
+    Ready:          False
+    Restart Count:  6
+Events:
+  Type     Reason   Age                  From     Message
+  ----     ------   ----                 ----     -------
+  Warning  BackOff  2m (x25 over 12m)    kubelet  Back-off restarting failed container server"""
+
+POD_LOG_LINE = "2024-01-01T00:00:00Z ERROR AdService failed to connect to backend: connection refused"
+
+
+class StubToolBackend:
+    """
+    Canned `get_pods`, `describe_pod` and `get_pod_logs` with simulated latency.
+
+    Args:
+        latency: Base seconds per call.
+        jitter: Extra uniformly distributed seconds per call.
+        output_bytes: Pad every output to at least this many bytes (0 keeps the canned text).
+        seed: Seed for the jitter.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, output_bytes: int = 0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_bytes = output_bytes
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _respond(self, text: str) -> str:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if self.output_bytes > len(text):
+            filler = "\n" + POD_LOG_LINE
+            text += filler * ((self.output_bytes - len(text)) // len(filler) + 1)
+        return text
+
+    def get_pods(self, namespace: str = "default", kubeconfig: str = None) -> str:
+        return self._respond(GET_PODS_OUTPUT)
+
+    def describe_pod(self, pod_name: str, namespace: str = "default", kubeconfig: str = None) -> str:
+        return self._respond(DESCRIBE_POD_OUTPUT.format(pod_name=pod_name, namespace=namespace))
+
+    def get_pod_logs(self, pod_name: str, namespace: str = "default", tail: int = 50, kubeconfig: str = None) -> str:
+        return self._respond("\n".join([POD_LOG_LINE] * tail))
+
+    def tools(self) -> Dict[str, Callable[..., str]]:
+        """The tool table, in the shape of `DevOpsAgent.available_tools`."""
+        return {
+            "get_pods": self.get_pods,
+            "describe_pod": self.describe_pod,
+            "get_pod_logs": self.get_pod_logs,
+        }
@@ -0,0 +1,30 @@
+import json
+
+from online_rl_agent.bench.episode_bench import EPISODE_SCRIPT, EpisodeBenchmark, compare
+from online_rl_agent.bench.stub_tools import StubToolBackend
+
+
+def test_small_run_saves_every_episode(tmp_path):
+    report = EpisodeBenchmark(episodes=4, concurrency=2, memory_episodes=1, work_dir=str(tmp_path)).run()
+    assert report["steps"] == 4 * (len(EPISODE_SCRIPT) + 1)  # The second turn calls two tools at once.
+    assert report["latency"]["episode"]["count"] == 4 and report["episodes_per_sec"] > 0
+    assert report["memory"]["peak_bytes_per_episode"] > 0
+    with open(tmp_path / "trajectories.jsonl") as f:
+        saved = [json.loads(line) for line in f]
+    assert sorted(t["id"] for t in saved) == [f"bench_{i}" for i in range(4)]
+    assert all(t["steps"][-1]["action"]["tool_name"] == "final_answer" for t in saved)
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"episodes_per_sec": 100.0, "latency": {"llm": {"p50": 0.010, "p99": 0.0001}}}
+    report = {"episodes_per_sec": 70.0, "latency": {"llm": {"p50": 0.011, "p99": 0.0009}}}
+    [regression] = compare(report, baseline, tolerance=0.2)
+    assert regression.startswith("episodes_per_sec")  # p50 is within tolerance, p99 below the noise floor.
+    assert compare(dict(report, episodes_per_sec=90.0), baseline) == []
+
+
+def test_stub_tools_pad_outputs_and_count_calls():
+    tools = StubToolBackend(output_bytes=2000)
+    assert len(tools.tools()["get_pods"]()) >= 2000
+    assert "adservice-x" in tools.describe_pod("adservice-x")
+    assert tools.calls == 2
@@ -0,0 +1,174 @@
+"""
+Success-rate curriculum over the chaos scenario catalog.
+
+Replaying one fault (or drawing uniformly) spends most episodes on scenarios
+the agent always solves or never solves, and those produce almost no
+learning signal. `CurriculumScheduler` keeps a sliding window of recent
+outcomes per scenario, seeded from saved trajectories and updated live by the
+runner, and draws the next scenario with probability proportional to the
+variance of its success, p * (1 - p): highest at p = 0.5, low for solved or
+hopeless ones. A floor keeps every scenario in rotation so a rate can recover
+as the agent improves, and per-scenario quotas cap how many episodes each
+scenario may take in a run.
+"""
+import collections
+import logging
+import random
+import threading
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from online_rl_agent.chaos.scenarios import SCENARIOS
+
+
+class CurriculumScheduler:
+    """
+    Thread-safe picker of the next scenario, shared by all workers of a run.
+
+    Call `next_scenario()` when a sandbox is free and `record()` once the
+    episode has its reward.
+    """
+
+    def __init__(
+        self,
+        scenarios: Optional[List[str]] = None,
+        quotas: Optional[Dict[str, int]] = None,
+        window: int = 50,
+        prior_successes: float = 1.0,
+        prior_failures: float = 1.0,
+        min_weight: float = 0.02,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            scenarios: Catalog names to schedule; defaults to the whole catalog.
+            quotas: Maximum episodes per scenario in this run. Scenarios without one are unlimited.
+            window: Number of most recent outcomes per scenario used for its success rate.
+            prior_successes: Beta prior added to the successes, so new scenarios start near 0.5.
+            prior_failures: Beta prior added to the failures.
+            min_weight: Weight floor so solved and hopeless scenarios are still revisited.
+            seed: Seed for the draws.
+        """
+        self.scenarios = list(scenarios or sorted(SCENARIOS))
+        unknown = set(self.scenarios) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"Unknown chaos scenario(s) {sorted(unknown)}. Available: {sorted(SCENARIOS)}.")
+        unknown = set(quotas or {}) - set(self.scenarios)
+        if unknown:
+            raise ValueError(f"Quota for unscheduled scenario(s) {sorted(unknown)}.")
+        self.quotas = dict(quotas or {})
+        self.window = window
+        self.prior_successes = prior_successes
+        self.prior_failures = prior_failures
+        self.min_weight = min_weight
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._outcomes: Dict[str, Deque[int]] = {name: collections.deque(maxlen=window) for name in self.scenarios}
+        self._scheduled: Dict[str, int] = {name: 0 for name in self.scenarios}
+
+    # --- Statistics ---
+
+    def load_history(self, records: Iterable[Dict[str, Any]]) -> int:
+        """
+        Seeds the success rates from saved trajectories or index rows, oldest first.
+
+        Records need "scenario" and "reward"; those without a reward (pending)
+        or for other scenarios are skipped. Returns the number of outcomes loaded.
+        """
+        count = 0
+        with self._lock:
+            for record in records:
+                outcomes = self._outcomes.get(record.get("scenario"))
+                if outcomes is not None and record.get("reward") is not None:
+                    outcomes.append(1 if record["reward"] >= 1 else 0)
+                    count += 1
+        return count
+
+    def _success_rate(self, name: str) -> float:
+        outcomes = self._outcomes[name]
+        return (sum(outcomes) + self.prior_successes) / (len(outcomes) + self.prior_successes + self.prior_failures)
+
+    def _weight(self, name: str) -> float:
+        p = self._success_rate(name)
+        return max(p * (1.0 - p), self.min_weight)
+
+    def _available(self) -> List[str]:
+        return [name for name in self.scenarios
+                if name not in self.quotas or self._scheduled[name] < self.quotas[name]]
+
+    def exhausted(self) -> bool:
+        """True once every scenario has used up its quota."""
+        with self._lock:
+            return not self._available()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-scenario outcomes in the window, success rate, sampling weight and episodes scheduled."""
+        with self._lock:
+            return {
+                name: {
+                    "outcomes": len(self._outcomes[name]),
+                    "successes": sum(self._outcomes[name]),
+                    "success_rate": round(self._success_rate(name), 3),
+                    "weight": round(self._weight(name), 4),
+                    "scheduled": self._scheduled[name],
+                    "quota": self.quotas.get(name),
+                }
+                for name in self.scenarios
+            }
+
+    # --- Scheduling ---
+
+    def next_scenario(self) -> Optional[str]:
+        """
+        Draws the scenario for the next episode and counts it against its quota.
+
+        Returns:
+            A scenario name, or None when every quota is used up.
+        """
+        with self._lock:
+            available = self._available()
+            if not available:
+                return None
+            name = self._rng.choices(available, weights=[self._weight(n) for n in available])[0]
+            self._scheduled[name] += 1
+        logging.debug(f"Curriculum picked scenario '{name}'")
+        return name
+
+    def record(self, scenario: Optional[str], reward: Optional[float], completed: bool = True) -> None:
+        """
+        Reports the end of an episode started with `next_scenario`.
+
+        Args:
+            scenario: The scenario of the episode.
+            reward: Its reward; None (e.g. pending a human label) updates nothing but the quota.
+            completed: False if the episode never ran (e.g. the fault could not be injected);
+                its quota slot is then given back.
+        """
+        with self._lock:
+            if scenario not in self._outcomes:
+                return
+            if not completed:
+                self._scheduled[scenario] = max(0, self._scheduled[scenario] - 1)
+            elif reward is not None:
+                self._outcomes[scenario].append(1 if reward >= 1 else 0)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Show the curriculum's success rates and sampling weights.")
+    parser.add_argument("--index-db", default="data/trajectory_index.sqlite", help="Trajectory index to seed from.")
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--draws", type=int, default=0, help="Also simulate this many draws.")
+    args = parser.parse_args()
+
+    from online_rl_agent.data.trajectory_index import TrajectoryIndex
+
+    scheduler = CurriculumScheduler(window=args.window)
+    index = TrajectoryIndex(args.index_db)
+    rows = index.query()
+    index.close()
+    print(f"Loaded {scheduler.load_history(reversed(rows))} outcomes from {args.index_db}.")
+    print(json.dumps(scheduler.stats(), indent=2))
+    if args.draws:
+        print(json.dumps(collections.Counter(scheduler.next_scenario() for _ in range(args.draws)), indent=2))
@@ -1,15 +1,23 @@
 import subprocess
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from kubernetes import client as k8s_client
+from kubernetes.client.rest import ApiException
+
+from online_rl_agent.tools.k8s_api_tools import REQUEST_TIMEOUT, get_api_client
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def apply_chaos_experiment(yaml_path: str) -> bool:
+def apply_chaos_experiment(yaml_path: str, kubeconfig: Optional[str] = None) -> bool:
     """
     Applies a Chaos Mesh experiment YAML to the cluster.
 
     Args:
         yaml_path: The relative path to the Chaos Mesh experiment YAML file.
+        kubeconfig: Optional path to a kubeconfig file.
 
     Returns:
         True if the command was successful, False otherwise.
@@ -19,6 +27,8 @@ def apply_chaos_experiment(yaml_path: str) -> bool:
         return False
 
     command = ["kubectl", "apply", "-f", yaml_path]
+    if kubeconfig:
+        command.extend(["--kubeconfig", kubeconfig])
     try:
         logging.info(f"Applying chaos experiment: {' '.join(command)}")
         # We use check=True to raise an exception on non-zero exit codes.
@@ -33,12 +43,13 @@ def apply_chaos_experiment(yaml_path: str) -> bool:
         logging.error(f"Stderr: {e.stderr}")
         return False
 
-def delete_chaos_experiment(yaml_path: str) -> bool:
+def delete_chaos_experiment(yaml_path: str, kubeconfig: Optional[str] = None) -> bool:
     """
     Deletes a Chaos Mesh experiment from the cluster using the same YAML file.
 
     Args:
         yaml_path: The relative path to the Chaos Mesh experiment YAML file.
+        kubeconfig: Optional path to a kubeconfig file.
 
     Returns:
         True if the command was successful, False otherwise.
@@ -48,6 +59,8 @@ def delete_chaos_experiment(yaml_path: str) -> bool:
         return False
 
     command = ["kubectl", "delete", "-f", yaml_path]
+    if kubeconfig:
+        command.extend(["--kubeconfig", kubeconfig])
     try:
         logging.info(f"Deleting chaos experiment: {' '.join(command)}")
         # We don't check for errors as aggressively, as deleting a non-existent
@@ -64,6 +77,93 @@ def delete_chaos_experiment(yaml_path: str) -> bool:
         logging.error("`kubectl` command not found. Please ensure it is installed and in your PATH.")
         return False
 
+def _custom_objects(kubeconfig: Optional[str]) -> k8s_client.CustomObjectsApi:
+    return k8s_client.CustomObjectsApi(get_api_client(kubeconfig))
+
+
+def _resource(manifest: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    group, _, version = manifest["apiVersion"].partition("/")
+    return group, version, manifest["metadata"]["namespace"], manifest["kind"].lower()
+
+
+def apply_chaos_manifest(manifest: Dict[str, Any], kubeconfig: Optional[str] = None) -> bool:
+    """
+    Creates a Chaos Mesh experiment from an in-memory manifest through the API.
+
+    Args:
+        manifest: The rendered experiment (see `chaos.scenarios`).
+        kubeconfig: Optional path to a kubeconfig file.
+
+    Returns:
+        True if the experiment was created, False otherwise.
+    """
+    group, version, namespace, plural = _resource(manifest)
+    name = manifest["metadata"]["name"]
+    try:
+        _custom_objects(kubeconfig).create_namespaced_custom_object(
+            group, version, namespace, plural, manifest, _request_timeout=REQUEST_TIMEOUT
+        )
+        logging.info(f"Applied chaos experiment {manifest['kind']}/{name} in {namespace}.")
+        return True
+    except ApiException as e:
+        logging.error(f"Failed to apply chaos experiment {name}: {e.status} {e.reason} {e.body}")
+        return False
+    except Exception as e:
+        logging.error(f"Failed to apply chaos experiment {name}: {e}")
+        return False
+
+
+def delete_chaos_manifest(manifest: Dict[str, Any], kubeconfig: Optional[str] = None) -> bool:
+    """
+    Deletes an experiment created by `apply_chaos_manifest`. A missing experiment is not an error.
+
+    Returns:
+        True unless the API call failed for another reason.
+    """
+    group, version, namespace, plural = _resource(manifest)
+    name = manifest["metadata"]["name"]
+    try:
+        _custom_objects(kubeconfig).delete_namespaced_custom_object(
+            group, version, namespace, plural, name, _request_timeout=REQUEST_TIMEOUT
+        )
+        logging.info(f"Deleted chaos experiment {manifest['kind']}/{name}.")
+        return True
+    except ApiException as e:
+        if e.status == 404:
+            logging.warning(f"Chaos experiment {name} was already gone.")
+            return True
+        logging.error(f"Failed to delete chaos experiment {name}: {e.status} {e.reason}")
+        return False
+    except Exception as e:
+        logging.error(f"Failed to delete chaos experiment {name}: {e}")
+        return False
+
+
+def inject_batch(targets: List[Tuple[Optional[str], Dict[str, Any]]], max_workers: int = 16) -> List[bool]:
+    """
+    Applies many experiments at once, e.g. one per sandbox cluster.
+
+    Args:
+        targets: (kubeconfig, manifest) pairs.
+        max_workers: Maximum number of API calls in flight.
+
+    Returns:
+        One success flag per target, in order.
+    """
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix="chaos-inject") as executor:
+        return list(executor.map(lambda t: apply_chaos_manifest(t[1], kubeconfig=t[0]), targets))
+
+
+def delete_batch(targets: List[Tuple[Optional[str], Dict[str, Any]]], max_workers: int = 16) -> List[bool]:
+    """Deletes the experiments of `inject_batch`. Returns one success flag per target."""
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(targets)), thread_name_prefix="chaos-delete") as executor:
+        return list(executor.map(lambda t: delete_chaos_manifest(t[1], kubeconfig=t[0]), targets))
+
+
 if __name__ == '__main__':
     # This assumes the script is run from the root of the project.
     # For a real run, the main.py script will handle pathing.
@@ -0,0 +1,236 @@
+"""
+Event-driven detection of when an injected fault has taken effect.
+
+Instead of sleeping a fixed time after `kubectl apply`, environments call
+`wait_for_fault`, which watches the Chaos Mesh experiment until its
+`AllInjected` condition is true and then, for pod faults, watches the target
+pods until the fault is visible (pods not ready, a pod replaced, or a
+container restarted). It returns as soon as the fault is confirmed and raises
+`FaultInjectionError` when the experiment selects nothing or the timeout
+expires, so no LLM calls are spent on a cluster where the fault never landed.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from kubernetes import client as k8s_client
+from kubernetes import watch as k8s_watch
+from kubernetes.client.rest import ApiException
+
+from online_rl_agent.tools.k8s_api_tools import CONNECTION_ERRORS, REQUEST_TIMEOUT, get_api_client
+
+# Pod-level confirmation used for each Chaos Mesh action; other actions rely on the experiment status.
+READINESS_BY_ACTION = {
+    "pod-failure": "pods_not_ready",
+    "pod-kill": "pod_replaced",
+    "container-kill": "container_restarted",
+}
+
+# How long the experiment may report `Selected=False` before we treat it as "no target pods".
+SELECTION_GRACE_SECONDS = 5.0
+
+# Upper bound for a single watch request; the loop re-establishes the watch until the deadline.
+WATCH_CHUNK_SECONDS = 30
+
+
+class FaultInjectionError(RuntimeError):
+    """Raised when a fault could not be injected or did not take effect in time."""
+
+
+def _describe_error(error: Exception) -> str:
+    if isinstance(error, ApiException):
+        return f"{error.status} {error.reason}"
+    return f"cannot reach the API server: {error}"
+
+
+def _conditions(obj: Dict[str, Any]) -> Dict[str, str]:
+    status = obj.get("status") or {}
+    return {c.get("type"): c.get("status") for c in status.get("conditions") or []}
+
+
+def _watch_until(stream_fn: Callable, args: tuple, kwargs: Dict[str, Any], check: Callable[[str, Any], bool],
+                 deadline: float, stop_event: Optional[threading.Event], what: str,
+                 on_chunk_end: Optional[Callable[[], bool]] = None,
+                 chunk_seconds: float = WATCH_CHUNK_SECONDS) -> None:
+    """
+    Streams watch events into `check` until it returns True, re-watching until `deadline`.
+
+    `on_chunk_end` runs whenever a watch request ends, so time-based conditions
+    are re-checked even when no new event arrives; returning True ends the wait.
+    """
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FaultInjectionError(f"Timed out waiting for {what}.")
+        if stop_event is not None and stop_event.is_set():
+            raise FaultInjectionError(f"Cancelled while waiting for {what}.")
+        w = k8s_watch.Watch()
+        try:
+            for event in w.stream(stream_fn, *args, timeout_seconds=max(1, int(min(remaining, chunk_seconds))),
+                                  **kwargs):
+                if check(event["type"], event["object"]):
+                    return
+                if time.monotonic() >= deadline or (stop_event is not None and stop_event.is_set()):
+                    break
+        finally:
+            w.stop()
+        if on_chunk_end is not None and on_chunk_end():
+            return
+        # Later watches start from the current state; the old resource version may have expired.
+        kwargs.pop("resource_version", None)
+
+
+def wait_for_experiment(manifest: Dict[str, Any], kubeconfig: Optional[str] = None, timeout: float = 60.0,
+                        stop_event: Optional[threading.Event] = None) -> None:
+    """
+    Waits until the Chaos Mesh experiment reports `AllInjected=True`.
+
+    Raises:
+        FaultInjectionError: If the experiment selects no pods, is deleted, or the timeout expires.
+    """
+    group, _, version = manifest["apiVersion"].partition("/")
+    namespace = manifest["metadata"]["namespace"]
+    name = manifest["metadata"]["name"]
+    api = k8s_client.CustomObjectsApi(get_api_client(kubeconfig))
+    unselected_since = []
+
+    def check_selection() -> bool:
+        # Chaos Mesh sends no further event while nothing is selected, so this also runs between watches.
+        if unselected_since and time.monotonic() - unselected_since[0] >= SELECTION_GRACE_SECONDS:
+            raise FaultInjectionError(f"Chaos experiment {name} selected no target pods.")
+        return False
+
+    def check(event_type: str, obj: Dict[str, Any]) -> bool:
+        if event_type == "DELETED":
+            raise FaultInjectionError(f"Chaos experiment {name} was deleted before it took effect.")
+        conditions = _conditions(obj)
+        if conditions.get("AllInjected") == "True":
+            return True
+        if conditions.get("Selected") == "False":
+            if not unselected_since:
+                unselected_since.append(time.monotonic())
+            return check_selection()
+        unselected_since.clear()
+        return False
+
+    _watch_until(
+        api.list_namespaced_custom_object, (group, version, namespace, manifest["kind"].lower()),
+        {"field_selector": f"metadata.name={name}"},
+        check, time.monotonic() + timeout, stop_event, f"chaos experiment {name} to be injected",
+        on_chunk_end=check_selection, chunk_seconds=SELECTION_GRACE_SECONDS,
+    )
+
+
+def _pod_ready(pod) -> bool:
+    for condition in (pod.status.conditions or []) if pod.status else []:
+        if condition.type == "Ready":
+            return condition.status == "True"
+    return False
+
+
+def _restarts(pod) -> int:
+    statuses = (pod.status.container_statuses or []) if pod.status else []
+    return sum(s.restart_count or 0 for s in statuses)
+
+
+def wait_for_pods(namespace: str, label_selector: str, condition: str, kubeconfig: Optional[str] = None,
+                  timeout: float = 60.0, stop_event: Optional[threading.Event] = None,
+                  baseline: Optional[Dict[str, int]] = None) -> None:
+    """
+    Waits until the selected pods show the effect of a fault.
+
+    Args:
+        namespace: Namespace of the target pods.
+        label_selector: Label selector of the target pods, e.g. "app=adservice".
+        condition: "pods_not_ready", "pod_replaced" or "container_restarted".
+        kubeconfig: Optional path to a kubeconfig file.
+        timeout: Maximum wait in seconds.
+        stop_event: Aborts the wait when set.
+        baseline: Pod uid -> restart count from before the injection. Needed for
+            "pod_replaced" and "container_restarted" to tell old pods from new ones.
+
+    Raises:
+        FaultInjectionError: If the condition is not met before the timeout.
+    """
+    api = k8s_client.CoreV1Api(get_api_client(kubeconfig))
+    pods = api.list_namespaced_pod(namespace, label_selector=label_selector, _request_timeout=REQUEST_TIMEOUT)
+    baseline = baseline if baseline is not None else {p.metadata.uid: _restarts(p) for p in pods.items}
+
+    def check(event_type: str, pod) -> bool:
+        if condition == "pods_not_ready":
+            return event_type != "DELETED" and not _pod_ready(pod)
+        if condition == "pod_replaced":
+            return (event_type == "DELETED" or pod.metadata.deletion_timestamp is not None
+                    or pod.metadata.uid not in baseline)
+        if condition == "container_restarted":
+            return _restarts(pod) > baseline.get(pod.metadata.uid, 0)
+        raise ValueError(f"Unknown readiness condition '{condition}'.")
+
+    if any(check("ADDED", pod) for pod in pods.items):
+        return
+    _watch_until(
+        api.list_namespaced_pod, (namespace,),
+        {"label_selector": label_selector, "resource_version": pods.metadata.resource_version},
+        check, time.monotonic() + timeout, stop_event, f"pods {label_selector} to show condition {condition}",
+    )
+
+
+def pod_baseline(manifest: Dict[str, Any], kubeconfig: Optional[str] = None) -> Dict[str, int]:
+    """
+    Records the target pods' uids and restart counts before a fault is applied.
+
+    Raises:
+        FaultInjectionError: If the pods cannot be listed.
+    """
+    namespace, selector = fault_target(manifest)
+    try:
+        api = k8s_client.CoreV1Api(get_api_client(kubeconfig))
+        pods = api.list_namespaced_pod(namespace, label_selector=selector, _request_timeout=REQUEST_TIMEOUT).items
+    except (ApiException,) + CONNECTION_ERRORS as e:
+        raise FaultInjectionError(f"Could not list the target pods of {manifest['metadata']['name']}: "
+                                  f"{_describe_error(e)}") from e
+    return {p.metadata.uid: _restarts(p) for p in pods}
+
+
+def fault_target(manifest: Dict[str, Any]) -> Tuple[str, str]:
+    """Returns (namespace, label selector) of the pods an experiment targets."""
+    selector = manifest["spec"].get("selector") or {}
+    namespaces = selector.get("namespaces") or [manifest["metadata"]["namespace"]]
+    labels = selector.get("labelSelectors") or {}
+    return namespaces[0], ",".join(f"{k}={v}" for k, v in labels.items())
+
+
+def wait_for_fault(manifest: Dict[str, Any], kubeconfig: Optional[str] = None, timeout: float = 60.0,
+                   stop_event: Optional[threading.Event] = None,
+                   baseline: Optional[Dict[str, int]] = None) -> float:
+    """
+    Waits until an applied experiment has taken effect.
+
+    Args:
+        manifest: The experiment that was applied.
+        kubeconfig: Optional path to a kubeconfig file.
+        timeout: Overall budget in seconds.
+        stop_event: Aborts the wait when set.
+        baseline: Output of `pod_baseline` taken before the experiment was applied.
+
+    Returns:
+        Seconds it took for the fault to be confirmed.
+
+    Raises:
+        FaultInjectionError: If the fault did not take effect within `timeout`.
+    """
+    started = time.monotonic()
+    try:
+        wait_for_experiment(manifest, kubeconfig=kubeconfig, timeout=timeout, stop_event=stop_event)
+        condition = READINESS_BY_ACTION.get(manifest["spec"].get("action"))
+        if condition:
+            namespace, selector = fault_target(manifest)
+            remaining = timeout - (time.monotonic() - started)
+            wait_for_pods(namespace, selector, condition, kubeconfig=kubeconfig, timeout=remaining,
+                          stop_event=stop_event, baseline=baseline)
+    except (ApiException,) + CONNECTION_ERRORS as e:
+        raise FaultInjectionError(f"Could not check fault {manifest['metadata']['name']}: {_describe_error(e)}") from e
+    elapsed = time.monotonic() - started
+    logging.info(f"Fault {manifest['metadata']['name']} confirmed after {elapsed:.1f}s.")
+    return elapsed
@@ -0,0 +1,233 @@
+"""
+Catalog of parameterized Chaos Mesh scenarios.
+
+A scenario is a fault kind (PodChaos, NetworkChaos, StressChaos) plus a
+parameter space: target label, mode, duration and kind-specific knobs such
+as latency or CPU workers. `render` builds the experiment manifest in
+memory with a unique name, so many episodes (and clusters) can run the same
+scenario at once, and `sample_params` draws a random point of the space to
+generate diverse episodes.
+"""
+import copy
+import random
+import uuid
+from typing import Any, Dict, List, Optional
+
+CHAOS_GROUP = "chaos-mesh.org"
+CHAOS_VERSION = "v1alpha1"
+
+# Parameters every scenario accepts, with their default value and the choices used when sampling.
+COMMON_PARAMS: Dict[str, Dict[str, Any]] = {
+    "namespace": {"default": "default", "choices": ["default"]},
+    "target_label": {"default": "app=adservice",
+                     "choices": ["app=adservice", "app=cartservice", "app=currencyservice",
+                                 "app=productcatalogservice", "app=recommendationservice"]},
+    "mode": {"default": "one", "choices": ["one", "all"]},
+    "duration": {"default": "100s", "choices": ["60s", "100s", "180s"]},
+}
+
+
+class ChaosScenario:
+    """
+    One fault template of the catalog.
+
+    Attributes:
+        name: Catalog key, e.g. "network-delay".
+        kind: Chaos Mesh kind, e.g. "NetworkChaos".
+        action: The experiment's `spec.action`, if the kind has one.
+        task: What the user reports to the agent while this fault is active.
+        params: Kind-specific parameters, same shape as `COMMON_PARAMS`.
+    """
+
+    def __init__(self, name: str, kind: str, task: str, action: Optional[str] = None,
+                 params: Optional[Dict[str, Dict[str, Any]]] = None, spec: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            name: Catalog key.
+            kind: Chaos Mesh kind.
+            task: Problem statement given to the agent.
+            action: `spec.action` value, if any.
+            params: Kind-specific parameters with "default" and "choices".
+            spec: Extra spec fields; string values may use `{param}` placeholders.
+        """
+        self.name = name
+        self.kind = kind
+        self.task = task
+        self.action = action
+        self.params = dict(COMMON_PARAMS, **(params or {}))
+        self.spec = spec or {}
+
+    @property
+    def plural(self) -> str:
+        """Resource plural used by the custom objects API (e.g. "podchaos")."""
+        return self.kind.lower()
+
+    def defaults(self) -> Dict[str, Any]:
+        return {key: p["default"] for key, p in self.params.items()}
+
+    def resolve_params(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Merges `overrides` into the defaults.
+
+        Raises:
+            ValueError: If an override names a parameter the scenario does not have.
+        """
+        unknown = set(overrides or {}) - set(self.params)
+        if unknown:
+            raise ValueError(f"Scenario '{self.name}' has no parameter(s) {sorted(unknown)}. "
+                             f"Known: {sorted(self.params)}.")
+        return dict(self.defaults(), **(overrides or {}))
+
+    def sample_params(self, rng: Optional[random.Random] = None,
+                      fixed: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Draws every parameter not in `fixed` uniformly from its choices."""
+        rng = rng or random
+        params = {key: rng.choice(p["choices"]) if p.get("choices") else p["default"]
+                  for key, p in self.params.items()}
+        if fixed:
+            self.resolve_params(fixed)  # Validates the names.
+            params.update(fixed)
+        return params
+
+    def render(self, params: Optional[Dict[str, Any]] = None, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Builds the experiment manifest.
+
+        Args:
+            params: Parameter overrides (see `resolve_params`).
+            name: Experiment name; a unique one is generated when omitted.
+
+        Returns:
+            The manifest as a dict, ready for the custom objects API.
+        """
+        params = self.resolve_params(params)
+        label_key, _, label_value = str(params["target_label"]).partition("=")
+        spec: Dict[str, Any] = {
+            "mode": params["mode"],
+            "duration": params["duration"],
+            "selector": {
+                "namespaces": [params["namespace"]],
+                "labelSelectors": {label_key: label_value},
+            },
+        }
+        if self.action:
+            spec["action"] = self.action
+        spec.update(_fill(copy.deepcopy(self.spec), params))
+        return {
+            "apiVersion": f"{CHAOS_GROUP}/{CHAOS_VERSION}",
+            "kind": self.kind,
+            "metadata": {
+                "name": name or f"{self.name}-{uuid.uuid4().hex[:8]}",
+                "namespace": params["namespace"],
+                "labels": {"online-rl-agent/scenario": self.name},
+            },
+            "spec": spec,
+        }
+
+
+def _fill(value: Any, params: Dict[str, Any]) -> Any:
+    """Substitutes `{param}` placeholders in the string leaves of a spec fragment."""
+    if isinstance(value, dict):
+        return {k: _fill(v, params) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, params) for v in value]
+    if isinstance(value, str) and "{" in value:
+        key = value[1:-1]
+        if value.startswith("{") and value.endswith("}") and key in params:
+            return params[key]  # A bare placeholder keeps the parameter's type (e.g. int workers).
+        return value.format(**params)
+    return value
+
+
+SCENARIOS: Dict[str, ChaosScenario] = {s.name: s for s in [
+    ChaosScenario(
+        "pod-failure", "PodChaos", action="pod-failure",
+        task="My service is down, please investigate and find the root cause.",
+        spec={"gracePeriod": 0},
+    ),
+    ChaosScenario(
+        "pod-kill", "PodChaos", action="pod-kill",
+        task="My service keeps restarting and some requests fail. Please find out why.",
+        spec={"gracePeriod": 0},
+    ),
+    ChaosScenario(
+        "container-kill", "PodChaos", action="container-kill",
+        task="One of my services keeps restarting. Please investigate and find the root cause.",
+        params={"container": {"default": "server", "choices": ["server"]}},
+        spec={"containerNames": ["{container}"]},
+    ),
+    ChaosScenario(
+        "network-delay", "NetworkChaos", action="delay",
+        task="My service has become very slow. Please investigate and find the root cause.",
+        params={"latency": {"default": "2s", "choices": ["500ms", "2s", "5s"]},
+                "jitter": {"default": "100ms", "choices": ["0ms", "100ms"]}},
+        spec={"delay": {"latency": "{latency}", "jitter": "{jitter}", "correlation": "0"}},
+    ),
+    ChaosScenario(
+        "network-loss", "NetworkChaos", action="loss",
+        task="Requests to my service fail intermittently. Please investigate and find the root cause.",
+        params={"loss": {"default": "50", "choices": ["25", "50", "90"]}},
+        spec={"loss": {"loss": "{loss}", "correlation": "0"}},
+    ),
+    ChaosScenario(
+        "cpu-stress", "StressChaos",
+        task="My service is responding slowly and its CPU usage looks high. Please find the root cause.",
+        params={"workers": {"default": 2, "choices": [1, 2, 4]},
+                "load": {"default": 100, "choices": [50, 100]}},
+        spec={"stressors": {"cpu": {"workers": "{workers}", "load": "{load}"}}},
+    ),
+    ChaosScenario(
+        "memory-stress", "StressChaos",
+        task="My service is slow and keeps getting restarted. Please investigate and find the root cause.",
+        params={"workers": {"default": 1, "choices": [1, 2]},
+                "size": {"default": "256MB", "choices": ["128MB", "256MB", "512MB"]}},
+        spec={"stressors": {"memory": {"workers": "{workers}", "size": "{size}"}}},
+    ),
+]}
+
+
+def get_scenario(name: str) -> ChaosScenario:
+    """
+    Looks up a scenario by name.
+
+    Raises:
+        KeyError: If the catalog has no such scenario.
+    """
+    try:
+        return SCENARIOS[name]
+    except KeyError:
+        raise KeyError(f"Unknown chaos scenario '{name}'. Available: {sorted(SCENARIOS)}.")
+
+
+def list_scenarios() -> List[str]:
+    return sorted(SCENARIOS)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="List, render or batch-apply chaos scenarios.")
+    parser.add_argument("scenario", nargs="?", help="Scenario name; omit to list the catalog.")
+    parser.add_argument("--param", action="append", default=[], help="Parameter override, e.g. latency=5s.")
+    parser.add_argument("--random", action="store_true", help="Sample parameters not given with --param.")
+    parser.add_argument("--apply", action="append", default=[], metavar="KUBECONFIG",
+                        help="Apply to the cluster of this kubeconfig; repeat for a batch.")
+    args = parser.parse_args()
+
+    if not args.scenario:
+        for scenario_name in list_scenarios():
+            s = SCENARIOS[scenario_name]
+            print(f"{scenario_name:16} {s.kind:13} params: {', '.join(sorted(s.params))}")
+        raise SystemExit(0)
+
+    scenario = get_scenario(args.scenario)
+    overrides = dict(p.split("=", 1) for p in args.param)
+    params = scenario.sample_params(fixed=overrides) if args.random else scenario.resolve_params(overrides)
+    if not args.apply:
+        print(json.dumps(scenario.render(params), indent=2))
+    else:
+        from online_rl_agent.chaos.injector import inject_batch
+        targets = [(kubeconfig, scenario.render(params)) for kubeconfig in args.apply]
+        for (kubeconfig, manifest), ok in zip(targets, inject_batch(targets)):
+            print(f"{kubeconfig}: {manifest['metadata']['name']} {'applied' if ok else 'FAILED'}")
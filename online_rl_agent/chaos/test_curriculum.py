@@ -0,0 +1,55 @@
+import collections
+
+import pytest
+
+from online_rl_agent.chaos.curriculum import CurriculumScheduler
+
+
+def test_weight_follows_success_variance():
+    scheduler = CurriculumScheduler(scenarios=["pod-kill", "cpu-stress", "network-delay"], window=10,
+                                    min_weight=0.02)
+    for _ in range(10):
+        scheduler.record("pod-kill", 1)
+        scheduler.record("cpu-stress", 0)
+    for reward in [1, 0] * 5:
+        scheduler.record("network-delay", reward)
+    stats = scheduler.stats()
+    assert stats["network-delay"]["success_rate"] == 0.5 and stats["network-delay"]["weight"] == 0.25
+    assert stats["pod-kill"]["success_rate"] == round(11 / 12, 3)  # Beta(1, 1) prior.
+    assert stats["pod-kill"]["weight"] == round(11 / 12 * 1 / 12, 4)
+    assert stats["pod-kill"]["weight"] == stats["cpu-stress"]["weight"]
+
+
+def test_window_forgets_old_outcomes_and_floor_applies():
+    scheduler = CurriculumScheduler(scenarios=["pod-kill"], window=3, prior_successes=0, prior_failures=0.001,
+                                    min_weight=0.05)
+    for reward in [0, 0, 0, 1, 1, 1]:
+        scheduler.record("pod-kill", reward)
+    stats = scheduler.stats()["pod-kill"]
+    assert stats["outcomes"] == 3 and stats["successes"] == 3
+    assert stats["weight"] == 0.05
+
+
+def test_draws_favour_the_uncertain_scenario():
+    scheduler = CurriculumScheduler(scenarios=["pod-kill", "network-delay"], seed=7)
+    scheduler.load_history([{"scenario": "pod-kill", "reward": 1}] * 50
+                           + [{"scenario": "network-delay", "reward": r} for r in [1, 0] * 25]
+                           + [{"scenario": "network-delay", "reward": None}, {"scenario": "other", "reward": 1}])
+    draws = collections.Counter(scheduler.next_scenario() for _ in range(1000))
+    assert draws["network-delay"] > 5 * draws["pod-kill"] > 0
+
+
+def test_quotas_stop_scheduling_and_failed_injections_give_back_the_slot():
+    scheduler = CurriculumScheduler(scenarios=["pod-kill", "cpu-stress"], quotas={"pod-kill": 1, "cpu-stress": 1})
+    first = scheduler.next_scenario()
+    scheduler.record(first, None, completed=False)
+    picked = sorted([scheduler.next_scenario(), scheduler.next_scenario()])
+    assert picked == ["cpu-stress", "pod-kill"]
+    assert scheduler.exhausted() and scheduler.next_scenario() is None
+
+
+def test_unknown_scenarios_are_rejected():
+    with pytest.raises(ValueError):
+        CurriculumScheduler(scenarios=["disk-fill"])
+    with pytest.raises(ValueError):
+        CurriculumScheduler(scenarios=["pod-kill"], quotas={"cpu-stress": 1})
@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import urllib3
+
+from online_rl_agent.chaos import readiness
+
+MANIFEST = {"apiVersion": "chaos-mesh.org/v1alpha1", "kind": "PodChaos",
+            "metadata": {"namespace": "shop", "name": "kill-cart"}}
+UNSELECTED = {"status": {"conditions": [{"type": "Selected", "status": "False"}]}}
+
+
+class QuietWatch:
+    """Reports the experiment once, then every later watch request ends without events."""
+    calls = 0
+
+    def stream(self, fn, *args, timeout_seconds=None, **kwargs):
+        QuietWatch.calls += 1
+        if QuietWatch.calls == 1:
+            yield {"type": "ADDED", "object": UNSELECTED}
+        time.sleep(0.02)
+
+    def stop(self):
+        pass
+
+
+def test_unselected_experiment_fails_without_further_events(monkeypatch):
+    QuietWatch.calls = 0
+    monkeypatch.setattr(readiness.k8s_watch, "Watch", QuietWatch)
+    monkeypatch.setattr(readiness, "get_api_client", lambda kubeconfig: None)
+    monkeypatch.setattr(readiness, "SELECTION_GRACE_SECONDS", 0.05)
+    started = time.monotonic()
+    with pytest.raises(readiness.FaultInjectionError, match="selected no target pods"):
+        readiness.wait_for_experiment(MANIFEST, timeout=10.0)
+    assert time.monotonic() - started < 2.0
+
+
+POD_KILL = {"apiVersion": "chaos-mesh.org/v1alpha1", "kind": "PodChaos",
+            "metadata": {"namespace": "chaos", "name": "kill-cart"},
+            "spec": {"action": "pod-kill", "selector": {"namespaces": ["shop"], "labelSelectors": {"app": "cart"}}}}
+
+
+class RecordingCoreV1:
+    def __init__(self, api_client=None):
+        pass
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        RecordingCoreV1.last = (namespace, kwargs)
+        return SimpleNamespace(items=[], metadata=SimpleNamespace(resource_version="1"))
+
+
+def test_pod_listing_has_a_request_timeout(monkeypatch):
+    monkeypatch.setattr(readiness, "get_api_client", lambda kubeconfig: None)
+    monkeypatch.setattr(readiness.k8s_client, "CoreV1Api", RecordingCoreV1)
+    assert readiness.pod_baseline(POD_KILL) == {}
+    assert RecordingCoreV1.last == ("shop", {"label_selector": "app=cart",
+                                             "_request_timeout": readiness.REQUEST_TIMEOUT})
+
+
+def test_unreachable_api_server_is_an_injection_failure(monkeypatch):
+    def refused(*args, **kwargs):
+        raise urllib3.exceptions.MaxRetryError(None, "/apis", "Connection refused")
+
+    monkeypatch.setattr(readiness, "get_api_client", lambda kubeconfig: None)
+    monkeypatch.setattr(readiness.k8s_client, "CoreV1Api",
+                        lambda api_client: SimpleNamespace(list_namespaced_pod=refused))
+    monkeypatch.setattr(readiness.k8s_client, "CustomObjectsApi",
+                        lambda api_client: SimpleNamespace(list_namespaced_custom_object=refused))
+    with pytest.raises(readiness.FaultInjectionError, match="cannot reach the API server"):
+        readiness.pod_baseline(POD_KILL)
+    with pytest.raises(readiness.FaultInjectionError, match="cannot reach the API server"):
+        readiness.wait_for_fault(POD_KILL, timeout=5.0)
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from online_rl_agent.chaos.scenarios import SCENARIOS, _fill, get_scenario
+
+
+def test_bare_placeholders_keep_the_parameter_type():
+    params = {"workers": 4, "latency": "2s", "jitter": "0ms"}
+    assert _fill({"workers": "{workers}", "names": ["{latency}"]}, params) == {"workers": 4, "names": ["2s"]}
+    assert _fill("{latency}+{jitter}", params) == "2s+0ms"
+
+
+def test_render_fills_the_spec_and_selector():
+    manifest = get_scenario("cpu-stress").render({"workers": 4, "target_label": "app=cartservice"}, name="x")
+    assert manifest["kind"] == "StressChaos" and manifest["metadata"]["name"] == "x"
+    assert manifest["spec"]["stressors"] == {"cpu": {"workers": 4, "load": 100}}
+    assert manifest["spec"]["selector"] == {"namespaces": ["default"], "labelSelectors": {"app": "cartservice"}}
+    delay = get_scenario("network-delay").render({"latency": "5s"})
+    assert delay["spec"]["action"] == "delay" and delay["spec"]["delay"]["latency"] == "5s"
+    assert delay["metadata"]["name"].startswith("network-delay-")
+    assert SCENARIOS["network-delay"].spec["delay"]["latency"] == "{latency}"  # The template is untouched.
+
+
+def test_rendered_names_are_unique():
+    scenario = get_scenario("pod-kill")
+    assert scenario.render()["metadata"]["name"] != scenario.render()["metadata"]["name"]
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ValueError, match="latency"):
+        get_scenario("pod-kill").resolve_params({"latency": "2s"})
+    with pytest.raises(KeyError):
+        get_scenario("disk-fill")
+
+
+def test_sample_params_draws_from_choices_and_keeps_fixed():
+    scenario = get_scenario("memory-stress")
+    for seed in range(20):
+        params = scenario.sample_params(random.Random(seed), fixed={"size": "1GB"})
+        assert params["size"] == "1GB"
+        assert all(params[key] in p["choices"] for key, p in scenario.params.items() if key != "size")
@@ -0,0 +1,218 @@
+"""
+Content-addressed store for tool observations.
+
+Agents see the same `get_pods` / `describe_pod` output over and over, within
+an episode and across episodes. Instead of writing it inline in every step,
+`TrajectoryStore` can put each observation here once, keyed by its SHA-256,
+and keep only `"observation_ref": "<key>"` in the step. `rehydrate` restores
+the inline form for readers, and `gc` deletes blobs no trajectory refers to.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Set
+
+REF_FIELD = "observation_ref"
+
+
+class ObservationBlobStore:
+    """
+    Stores one zlib-compressed file per distinct observation under
+    `directory/<key[:2]>/<key>`. Writes are atomic and idempotent, so any
+    number of stores and threads can share a directory.
+    """
+
+    def __init__(self, directory: str = 'data/blobs', min_bytes: int = 256):
+        """
+        Args:
+            directory: Where blobs live.
+            min_bytes: Observations shorter than this stay inline in the step.
+        """
+        self.directory = directory
+        self.min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "new_blobs": 0, "bytes_in": 0, "bytes_written": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def put(self, text: str) -> str:
+        """
+        Stores an observation (if not already present) and returns its key.
+
+        An existing blob has its mtime refreshed, so `gc`'s grace period protects
+        every blob that an in-flight episode has referenced recently, not just the
+        ones it created.
+        """
+        key = self.key_for(text)
+        with self._lock:
+            self._stats["puts"] += 1
+            self._stats["bytes_in"] += len(text)
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return key
+        except FileNotFoundError:
+            pass  # New, or deleted by a gc since it was last written.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(text.encode("utf-8"), 6)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._stats["new_blobs"] += 1
+            self._stats["bytes_written"] += len(data)
+        return key
+
+    def get(self, key: str) -> str:
+        """
+        Returns the observation stored under `key`.
+
+        Raises:
+            KeyError: If the blob does not exist.
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(f"Observation blob {key} not found in {self.directory}.")
+
+    def dehydrate_step(self, step: Dict[str, Any]) -> Dict[str, Any]:
+        """Moves a step's observation into the store (in place) if it is large enough."""
+        observation = step.get("observation")
+        if isinstance(observation, str) and len(observation) >= self.min_bytes:
+            step[REF_FIELD] = self.put(observation)
+            del step["observation"]
+        return step
+
+    def rehydrate(self, trajectory: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns a copy of the trajectory with every referenced observation inlined again."""
+        steps = []
+        for step in trajectory.get("steps") or []:
+            if REF_FIELD in step:
+                step = dict(step)
+                step["observation"] = self.get(step.pop(REF_FIELD))
+            steps.append(step)
+        return dict(trajectory, steps=steps)
+
+    def iter_rehydrated(self, trajectories: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for trajectory in trajectories:
+            yield self.rehydrate(trajectory)
+
+    def iter_keys(self) -> Iterator[str]:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    yield name
+
+    def gc(self, trajectories: Iterable[Dict[str, Any]], grace_seconds: float = 3600.0,
+           dry_run: bool = False) -> Dict[str, int]:
+        """
+        Deletes blobs not referenced by any of `trajectories`.
+
+        Pass every live trajectory (saved files, segment logs, WALs, quarantine).
+        Blobs written or reused (see `put`) within `grace_seconds` are kept, since
+        an in-flight episode may reference them before its step reached any log.
+
+        Returns:
+            Counts of referenced, deleted and kept blobs and the bytes freed.
+        """
+        referenced: Set[str] = set()
+        for trajectory in trajectories:
+            for step in trajectory.get("steps") or []:
+                if REF_FIELD in step:
+                    referenced.add(step[REF_FIELD])
+
+        now = time.time()
+        stats = {"referenced": len(referenced), "deleted": 0, "kept_recent": 0, "bytes_freed": 0}
+        for key in list(self.iter_keys()):
+            if key in referenced:
+                continue
+            path = self._path(key)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if now - st.st_mtime < grace_seconds:
+                stats["kept_recent"] += 1
+                continue
+            if not dry_run:
+                os.remove(path)
+            stats["deleted"] += 1
+            stats["bytes_freed"] += st.st_size
+        logging.info(f"Blob GC{' (dry run)' if dry_run else ''}: {stats}")
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns put/write counters; `dedup_ratio` is observation bytes in per byte written."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["dedup_ratio"] = stats["bytes_in"] / stats["bytes_written"] if stats["bytes_written"] else 0.0
+        return stats
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Deduplicate trajectory observations or garbage-collect blobs.")
+    parser.add_argument("--blob-dir", default="data/blobs")
+    parser.add_argument("--dedup-jsonl", nargs=2, metavar=("IN", "OUT"),
+                        help="Rewrite a JSONL trajectory file with observations moved to the blob store.")
+    parser.add_argument("--gc", action="store_true", help="Delete blobs not referenced by the given sources.")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSONL trajectory file that references blobs.")
+    parser.add_argument("--segments", action="append", default=[], help="Segment log directory that references blobs.")
+    parser.add_argument("--wal-dir", action="append", default=[], help="WAL directory (in-flight and quarantined).")
+    parser.add_argument("--grace-seconds", type=float, default=3600.0)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    blobs = ObservationBlobStore(args.blob_dir)
+
+    if args.dedup_jsonl:
+        src, dst = args.dedup_jsonl
+        with open(src) as fin, open(dst, "w") as fout:
+            for line in fin:
+                if line.strip():
+                    trajectory = json.loads(line)
+                    for step in trajectory.get("steps") or []:
+                        blobs.dehydrate_step(step)
+                    fout.write(json.dumps(trajectory) + "\n")
+        blob_bytes = sum(os.path.getsize(os.path.join(r, n)) for r, _, ns in os.walk(args.blob_dir) for n in ns)
+        print(f"{src}: {os.path.getsize(src)} bytes -> {dst}: {os.path.getsize(dst)} bytes "
+              f"+ {blob_bytes} bytes of blobs. {blobs.stats()}")
+
+    if args.gc:
+        def iter_sources() -> Iterator[Dict[str, Any]]:
+            for path in args.jsonl:
+                with open(path) as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+            for directory in args.segments:
+                from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+                yield from SegmentedTrajectoryLog(directory).iter_trajectories()
+            for directory in args.wal_dir:
+                from online_rl_agent.data.wal import TrajectoryWAL
+                wal = TrajectoryWAL(directory)
+                for path in wal.pending():
+                    trajectory = TrajectoryWAL.replay(path)["trajectory"]
+                    if trajectory:
+                        yield trajectory
+                if os.path.isdir(wal.quarantine_dir):
+                    for name in os.listdir(wal.quarantine_dir):
+                        if name.endswith(".json"):
+                            with open(os.path.join(wal.quarantine_dir, name)) as f:
+                                yield json.load(f)
+
+        print(blobs.gc(iter_sources(), grace_seconds=args.grace_seconds, dry_run=args.dry_run))
@@ -0,0 +1,118 @@
+"""
+Append-only store of rewards given after an episode was saved.
+
+Episodes whose success only a human can judge are saved with
+`reward: null` and `reward_status: "pending"`, so collection never waits on
+a person. Labels are appended here later (e.g. by
+`python -m online_rl_agent.user_agent.labeling`) instead of rewriting the
+trajectory files, which stay append-only. A reward is upgradable: the latest
+label for an id wins, and every reader (`TrajectoryStore.iter_saved`, the
+index, the token export) overlays the labels on the saved records.
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+REWARD_PENDING = "pending"
+REWARD_LABELED = "labeled"
+
+VALID_REWARDS = (1, 0, -1)
+
+
+class RewardLabelStore:
+    """
+    JSONL file of `{"id", "reward", "labeler", "labeled_at", "note"}` entries.
+
+    Safe to share between threads; the file is re-read when another process
+    has appended to it.
+    """
+
+    def __init__(self, path: str = 'data/reward_labels.jsonl'):
+        """
+        Args:
+            path: Label file; created on the first label.
+        """
+        self.path = path
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self._lock = threading.Lock()
+        self._labels: Dict[str, Dict[str, Any]] = {}
+        self._read_offset = 0
+
+    def _refresh(self) -> None:
+        """Loads labels appended since the last read."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._read_offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Partially written; read it next time.
+                self._read_offset += len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    logging.warning(f"Skipping unparsable reward label in {self.path}")
+                    continue
+                self._labels[entry["id"]] = entry
+
+    def set(self, trajectory_id: str, reward: int, labeler: Optional[str] = None,
+            note: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Records (or replaces) the reward of a saved trajectory.
+
+        Raises:
+            ValueError: If `reward` is not 1, 0 or -1.
+        """
+        if reward not in VALID_REWARDS:
+            raise ValueError(f"Invalid reward {reward!r}; expected one of {VALID_REWARDS}.")
+        entry = {
+            "id": trajectory_id,
+            "reward": reward,
+            "labeler": labeler,
+            "labeled_at": datetime.datetime.utcnow().isoformat(),
+        }
+        if note:
+            entry["note"] = note
+        with self._lock:
+            self._refresh()
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._refresh()
+        return entry
+
+    def get(self, trajectory_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the latest label of a trajectory, or None."""
+        with self._lock:
+            self._refresh()
+            return self._labels.get(trajectory_id)
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the latest label of every labeled trajectory, by id."""
+        with self._lock:
+            self._refresh()
+            return dict(self._labels)
+
+    def apply(self, trajectory: Dict[str, Any]) -> Dict[str, Any]:
+        """Overlays the latest label, if any, on a trajectory record (in place) and returns it."""
+        label = self.get(trajectory.get("id"))
+        if label is not None:
+            trajectory["reward"] = label["reward"]
+            trajectory["reward_status"] = REWARD_LABELED
+            trajectory["reward_label"] = {k: v for k, v in label.items() if k not in ("id", "reward")}
+        return trajectory
+
+    def iter_applied(self, trajectories: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for trajectory in trajectories:
+            yield self.apply(trajectory)
+
+
+def is_pending(trajectory: Dict[str, Any]) -> bool:
+    """True for a saved trajectory that still waits for its reward."""
+    return trajectory.get("reward") is None and trajectory.get("reward_status") == REWARD_PENDING
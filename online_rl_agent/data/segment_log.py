@@ -0,0 +1,435 @@
+"""
+Segmented, compressed, append-only log of finished trajectories.
+
+Trajectories are buffered in memory and written in batches. Each batch is
+compressed into one self-contained gzip member (or zstd frame) appended to
+the active segment file; concatenated members are still a valid gzip/zstd
+stream, so a segment is readable while it is being written and a crash loses
+at most the unflushed batch. Segments roll over by size and by age, and a
+`manifest.json` lists every segment with its record count, sizes and the
+time range of the trajectories it contains.
+"""
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available.
+    zstandard = None
+
+MANIFEST_NAME = "manifest.json"
+FSYNC_POLICIES = ("never", "batch", "segment")
+
+# (segment name, byte offset of the batch's compressed block, line index within the batch)
+RecordLocation = Tuple[str, int, int]
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def read_block(path: str, offset: int, compression: str) -> bytes:
+    """Decompresses the single batch (gzip member / zstd frame) starting at `offset`."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        if compression == "zstd":
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=False)
+            return reader.read()
+        decompressor = zlib.decompressobj(wbits=31)  # 31: expect a gzip header
+        out = []
+        while not decompressor.eof:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                break
+            out.append(decompressor.decompress(chunk))
+        return b"".join(out)
+
+
+def iter_blocks(path: str, compression: str, chunk_size: int = 1024 * 1024) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yields (byte offset, decompressed payload) for every batch of a segment file.
+
+    The file is streamed in `chunk_size` reads; only the tail of a chunk that
+    belongs to the next batch is carried over, so memory and copying stay
+    proportional to one batch rather than to the whole segment.
+    """
+    with open(path, "rb") as f:
+        pos = 0
+        data = f.read(chunk_size)
+        while data:
+            if compression == "zstd":
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+            else:
+                decompressor = zlib.decompressobj(wbits=31)
+            start, out = pos, []
+            while True:
+                out.append(decompressor.decompress(data))
+                if getattr(decompressor, "eof", True):
+                    leftover = decompressor.unused_data
+                    pos += len(data) - len(leftover)
+                    data = leftover or f.read(chunk_size)
+                    break
+                pos += len(data)
+                data = f.read(chunk_size)
+                if not data:
+                    logging.warning(f"Truncated batch at offset {start} in {path}; ignoring the rest of the segment.")
+                    return
+            yield start, b"".join(out)
+
+
+class SegmentedTrajectoryLog:
+    """
+    Thread-safe writer/reader for a directory of compressed trajectory segments.
+
+    One instance should be shared by every `TrajectoryStore` writing to the
+    same directory (e.g. all workers of a concurrent runner).
+    """
+
+    def __init__(
+        self,
+        directory: str = 'data/trajectories',
+        compression: str = "gzip",
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_seconds: float = 3600.0,
+        batch_records: int = 32,
+        flush_interval: float = 5.0,
+        fsync: str = "segment",
+    ):
+        """
+        Args:
+            directory: Where segments and the manifest live.
+            compression: "gzip" or "zstd" (requires the `zstandard` package).
+            max_segment_bytes: Roll to a new segment after this many uncompressed bytes.
+            max_segment_seconds: Roll to a new segment after it has been open this long.
+            batch_records: Flush once this many trajectories are buffered.
+            flush_interval: Flush buffered trajectories once they are this many seconds old, on the
+                next append or from a background timer if no append comes.
+            fsync: "never", "batch" (after every flush) or "segment" (when a segment is sealed).
+                Durable listeners are told about a record once it is fsynced under this policy
+                (right after the write for "never").
+        """
+        if compression not in ("gzip", "zstd"):
+            raise ValueError(f"Unknown compression '{compression}'. Expected 'gzip' or 'zstd'.")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package.")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}'. Expected one of {FSYNC_POLICIES}.")
+        self.directory = directory
+        self.compression = compression
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.batch_records = batch_records
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._buffer: List[Tuple[Dict[str, Any], str]] = []
+        self._buffer_since: Optional[float] = None
+        self._active: Optional[Dict[str, Any]] = None
+        self._active_opened: float = 0.0
+        self._listeners: List[Callable[[List[Tuple[Dict[str, Any], RecordLocation]]], None]] = []
+        self._durable_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        # Records written to the active segment but not fsynced yet (fsync="segment").
+        self._undurable: List[Dict[str, Any]] = []
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+        # A segment left unsealed by a previous process is sealed; we never append to it.
+        for segment in self.manifest["segments"]:
+            segment["sealed"] = True
+
+    # --- Manifest ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 1, "segments": []}
+
+    def _write_manifest(self, durable: bool = False) -> None:
+        """
+        Replaces the manifest. It is fsynced only if `durable`, which callers pass once
+        the segment bytes it describes are fsynced, so a crash never leaves a durable
+        manifest pointing at data that was not written.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+            if durable and self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    # --- Writing ---
+
+    def add_listener(self, listener: Callable[[List[Tuple[Dict[str, Any], RecordLocation]]], None]) -> None:
+        """Registers a callback invoked after each flush with (record, location) pairs, e.g. for indexing."""
+        self._listeners.append(listener)
+
+    def add_durable_listener(self, listener: Callable[[List[Dict[str, Any]]], None]) -> None:
+        """
+        Registers a callback invoked with the records that have become durable, i.e. were
+        written and fsynced according to the fsync policy (e.g. to delete their WAL files).
+        """
+        self._durable_listeners.append(listener)
+
+    def _notify_durable(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        for listener in self._durable_listeners:
+            try:
+                listener(records)
+            except Exception as e:
+                logging.error(f"Trajectory log durable listener failed: {e}", exc_info=True)
+
+    def append(self, trajectory: Dict[str, Any], serialized: Optional[str] = None) -> None:
+        """
+        Buffers one finished trajectory; flushes when the batch is full or old enough.
+
+        Args:
+            trajectory: The trajectory record.
+            serialized: Its JSON text, if the caller already has it (saves a second `json.dumps`).
+        """
+        line = serialized if serialized is not None else json.dumps(trajectory)
+        with self._lock:
+            self._buffer.append((trajectory, line))
+            if self._buffer_since is None:
+                self._buffer_since = time.monotonic()
+            if (len(self._buffer) >= self.batch_records
+                    or time.monotonic() - self._buffer_since >= self.flush_interval):
+                self.flush()
+            if self._flusher is None and self.flush_interval > 0 and not self._closed.is_set():
+                self._flusher = threading.Thread(target=self._flush_periodically, name="segment-log-flusher",
+                                                 daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        """Flushes a partial batch once it is `flush_interval` old, so a quiet writer still persists it."""
+        while not self._closed.is_set():
+            with self._lock:
+                since = self._buffer_since
+                wait = self.flush_interval if since is None else since + self.flush_interval - time.monotonic()
+            if wait > 0:
+                self._closed.wait(wait)
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Periodic trajectory log flush failed: {e}", exc_info=True)
+                self._closed.wait(self.flush_interval)
+
+    def _open_segment(self) -> Dict[str, Any]:
+        seq = self.manifest["segments"][-1]["seq"] + 1 if self.manifest["segments"] else 0
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        suffix = "zst" if self.compression == "zstd" else "gz"
+        segment = {
+            "name": f"segment-{seq:06d}-{stamp}.jsonl.{suffix}",
+            "seq": seq,
+            "compression": self.compression,
+            "records": 0,
+            "bytes_uncompressed": 0,
+            "bytes_compressed": 0,
+            "start_time": None,
+            "end_time": None,
+            "sealed": False,
+        }
+        self.manifest["segments"].append(segment)
+        self._active = segment
+        self._active_opened = time.monotonic()
+        return segment
+
+    def _seal_active(self) -> None:
+        if self._active is None:
+            return
+        if self.fsync == "segment":
+            path = os.path.join(self.directory, self._active["name"])
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+        self._active["sealed"] = True
+        self._write_manifest(durable=True)
+        undurable, self._undurable = self._undurable, []
+        self._notify_durable(undurable)
+        logging.info(f"Sealed trajectory segment {self._active['name']} ({self._active['records']} records).")
+        self._active = None
+
+    def _needs_roll(self) -> bool:
+        return self._active is None or (
+            self._active["bytes_uncompressed"] >= self.max_segment_bytes
+            or time.monotonic() - self._active_opened >= self.max_segment_seconds
+        )
+
+    def flush(self) -> None:
+        """Compresses and appends the buffered trajectories as one batch."""
+        with self._lock:
+            if not self._buffer:
+                return
+            buffered, self._buffer, self._buffer_since = self._buffer, [], None
+            records = [record for record, _ in buffered]
+            if self._needs_roll():
+                self._seal_active()
+                self._open_segment()
+            segment = self._active
+            path = os.path.join(self.directory, segment["name"])
+
+            payload = "".join(line + "\n" for _, line in buffered).encode("utf-8")
+            block = _compress(payload, self.compression)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(block)
+                if self.fsync == "batch":
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            segment["records"] += len(records)
+            segment["bytes_uncompressed"] += len(payload)
+            segment["bytes_compressed"] += len(block)
+            starts = [r.get("start_time") for r in records if r.get("start_time")]
+            ends = [r.get("end_time") or r.get("start_time") for r in records if r.get("end_time") or r.get("start_time")]
+            if starts:
+                segment["start_time"] = min([segment["start_time"]] + starts if segment["start_time"] else starts)
+            if ends:
+                segment["end_time"] = max([segment["end_time"]] + ends if segment["end_time"] else ends)
+            self._write_manifest(durable=self.fsync == "batch")
+            if self.fsync == "segment":
+                self._undurable.extend(records)
+            else:
+                self._notify_durable(records)
+
+            located = [(r, (segment["name"], offset, i)) for i, r in enumerate(records)]
+        for listener in self._listeners:
+            try:
+                listener(located)
+            except Exception as e:
+                logging.error(f"Trajectory log listener failed: {e}", exc_info=True)
+
+    def sync(self) -> None:
+        """Flushes pending trajectories and fsyncs the active segment, whatever the fsync policy."""
+        with self._lock:
+            self.flush()
+            if self._active is not None and self._undurable:
+                with open(os.path.join(self.directory, self._active["name"]), "rb") as f:
+                    os.fsync(f.fileno())
+                self._write_manifest(durable=True)
+            undurable, self._undurable = self._undurable, []
+            self._notify_durable(undurable)
+
+    def close(self) -> None:
+        """Flushes pending trajectories, stops the flush timer and seals the active segment."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self.flush()
+            self._seal_active()
+            self._write_manifest(durable=True)
+
+    def __enter__(self) -> "SegmentedTrajectoryLog":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Reading ---
+
+    def segments(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns manifest entries whose time range overlaps [start, end] (ISO timestamps)."""
+        with self._lock:
+            segments = [dict(s) for s in self.manifest["segments"]]
+        selected = []
+        for s in segments:
+            if start and s["end_time"] and s["end_time"] < start:
+                continue
+            if end and s["start_time"] and s["start_time"] > end:
+                continue
+            selected.append(s)
+        return selected
+
+    def iter_trajectories(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams trajectories in write order, skipping segments outside [start, end].
+        Trajectories still buffered in memory are not included; call `flush()` first.
+        """
+        for segment in self.segments(start, end):
+            path = os.path.join(self.directory, segment["name"])
+            if not os.path.exists(path):
+                logging.warning(f"Segment listed in manifest is missing: {path}")
+                continue
+            # Batch by batch: a partial last batch left by a crash is skipped as a whole
+            # (its trajectories are still in their WAL files), not raised.
+            for _, payload in iter_blocks(path, segment["compression"]):
+                for line in payload.decode("utf-8").splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if start and (record.get("end_time") or record.get("start_time") or "") < start:
+                        continue
+                    if end and (record.get("start_time") or "") > end:
+                        continue
+                    yield record
+
+    def iter_located(
+        self, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Tuple[Dict[str, Any], RecordLocation]]:
+        """Like `iter_trajectories`, but yields (record, location) pairs, e.g. to rebuild an index."""
+        for segment in self.segments(start, end):
+            path = os.path.join(self.directory, segment["name"])
+            if not os.path.exists(path):
+                logging.warning(f"Segment listed in manifest is missing: {path}")
+                continue
+            for offset, payload in iter_blocks(path, segment["compression"]):
+                for index, line in enumerate(payload.decode("utf-8").splitlines()):
+                    yield json.loads(line), (segment["name"], offset, index)
+
+    def read_record(self, location: RecordLocation) -> Dict[str, Any]:
+        """Reads back one trajectory by the location reported to listeners."""
+        name, offset, index = location
+        compression = "zstd" if name.endswith(".zst") else "gzip"
+        lines = read_block(os.path.join(self.directory, name), offset, compression).decode("utf-8").splitlines()
+        return json.loads(lines[index])
+
+    def import_jsonl(self, jsonl_path: str) -> int:
+        """Appends every trajectory of a legacy JSONL file. Returns the number imported."""
+        count = 0
+        with open(jsonl_path) as f:
+            for line in f:
+                if line.strip():
+                    self.append(json.loads(line))
+                    count += 1
+        self.flush()
+        return count
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or populate a segmented trajectory log.")
+    parser.add_argument("directory", help="Segment directory, e.g. data/trajectories")
+    parser.add_argument("--import-jsonl", help="Append the trajectories of a legacy JSONL file.")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default="gzip")
+    args = parser.parse_args()
+
+    log = SegmentedTrajectoryLog(args.directory, compression=args.compression)
+    if args.import_jsonl:
+        print(f"Imported {log.import_jsonl(args.import_jsonl)} trajectories from {args.import_jsonl}.")
+    log.close()
+    for seg in log.segments():
+        ratio = seg["bytes_uncompressed"] / seg["bytes_compressed"] if seg["bytes_compressed"] else 0
+        print(f"{seg['name']}  records={seg['records']}  {seg['start_time']} .. {seg['end_time']}  "
+              f"compressed={seg['bytes_compressed']}B ({ratio:.1f}x)")
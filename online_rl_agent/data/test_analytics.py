@@ -0,0 +1,79 @@
+import json
+
+from online_rl_agent.data.analytics import TrajectoryAnalytics, analyze, failure_mode, iter_jsonl_range
+
+
+def _step(tool_name, observation="ok", **metrics):
+    return {"action": {"tool_name": tool_name}, "observation": observation, "metrics": metrics}
+
+
+def _trajectory(i, reward, scenario="pod-kill", model="m", steps=None, **extra):
+    steps = steps if steps is not None else [_step("get_pods", llm_seconds=0.5, tool_seconds=0.1),
+                                             _step("final_answer", llm_seconds=1.0)]
+    return dict({"id": f"traj-{i}", "reward": reward, "scenario": scenario, "model": model,
+                 "start_time": f"2026-10-1{6 + i % 2}T10:00:00", "end_time": f"2026-10-1{6 + i % 2}T10:01:00",
+                 "steps": steps}, **extra)
+
+
+TRAJECTORIES = [
+    _trajectory(0, 1),
+    _trajectory(1, 0, scenario="cpu-stress"),
+    _trajectory(2, -1, model="other"),
+    _trajectory(3, None),
+    _trajectory(4, 0, steps=[_step("get_pods"), _step("get_logs", "Error: pod not found")], stop_reason="max_steps"),
+    _trajectory(5, 0, steps=[_step("error", parse_error=True), _step("get_pods", parse_repairs=["fence"])]),
+]
+
+
+def test_failure_modes():
+    assert [failure_mode(t) for t in TRAJECTORIES] == [
+        "success", "wrong_answer", "harmful_answer", "pending", "max_steps", "no_final_answer"]
+    assert failure_mode({"reward": 0, "steps": []}) == "no_steps"
+
+
+def test_report_aggregates():
+    report = TrajectoryAnalytics(window="day").add_all(iter(TRAJECTORIES)).report()
+    assert report["trajectories"] == 6
+    pod_kill = report["rewards"]["by_scenario"]["pod-kill"]
+    assert pod_kill == {"episodes": 5, "labeled": 4, "mean_reward": 0.0, "success_rate": 0.25, "zero": 2,
+                        "negative": 1}
+    assert report["rewards"]["by_model"]["other"]["mean_reward"] == -1.0
+    assert {k: v["episodes"] for k, v in report["rewards"]["by_day"].items()} == {
+        "2026-10-16T00:00:00": 3, "2026-10-17T00:00:00": 3}
+    assert report["steps"]["count"] == 6 and report["steps"]["max"] == 2
+    assert abs(report["duration_seconds"]["p50"] - 60) / 60 < 0.03  # Log-spaced bins are ~3% wide.
+    assert report["llm_seconds"]["count"] == 8
+    assert report["tool_calls_by_scenario"]["cpu-stress"] == {"final_answer": 1, "get_pods": 1}
+    assert report["tool_transitions"]["get_pods"] == {"final_answer": 4, "get_logs": 1}
+    assert "get_pods" not in report["tool_transitions"].get("final_answer", {})  # Not across episodes.
+    assert report["failure_modes"]["wrong_answer"] == 1 and report["failure_modes_by_scenario"]["cpu-stress"] == {
+        "wrong_answer": 1}
+    assert report["step_errors"] == {"steps": 12, "parse_failures": 1, "parse_recoveries": 1, "tool_errors": 1}
+
+
+def test_chunked_and_merged_reports_match_one_pass():
+    whole = TrajectoryAnalytics().add_all(iter(TRAJECTORIES)).report()
+    assert TrajectoryAnalytics(chunk_size=2).add_all(iter(TRAJECTORIES)).report() == whole
+    merged = TrajectoryAnalytics().add_all(iter(TRAJECTORIES[:4]))
+    merged.merge(TrajectoryAnalytics().add_all(iter(TRAJECTORIES[4:])))
+    assert merged.report() == whole
+
+
+def test_byte_ranges_cover_every_line_once(tmp_path):
+    path = tmp_path / "trajectories.jsonl"
+    path.write_text("".join(json.dumps(t) + "\n" for t in TRAJECTORIES))
+    size = path.stat().st_size
+    for parts in (2, 3, 7):
+        bounds = [size * i // parts for i in range(parts + 1)]
+        ids = [r["id"] for i in range(parts) for r in iter_jsonl_range(str(path), bounds[i], bounds[i + 1])]
+        assert ids == [t["id"] for t in TRAJECTORIES]
+
+
+def test_analyze_applies_labels_and_time_filter(tmp_path):
+    path = tmp_path / "trajectories.jsonl"
+    path.write_text("".join(json.dumps(t) + "\n" for t in TRAJECTORIES))
+    labels = tmp_path / "labels.jsonl"
+    labels.write_text(json.dumps({"id": "traj-3", "reward": 1}) + "\n")
+    report = analyze(jsonl=str(path), labels_path=str(labels), since="2026-10-17")
+    assert report["trajectories"] == 3
+    assert "pending" not in report["failure_modes"] and report["failure_modes"]["success"] == 1
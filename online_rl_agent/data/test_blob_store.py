@@ -0,0 +1,43 @@
+import os
+import time
+
+from online_rl_agent.data.blob_store import ObservationBlobStore
+
+OUTPUT = "NAME                         READY   STATUS             RESTARTS   AGE\n" * 10
+
+
+def _age(blobs, key, seconds):
+    past = time.time() - seconds
+    os.utime(blobs._path(key), (past, past))
+
+
+def test_reused_blob_survives_gc(tmp_path):
+    blobs = ObservationBlobStore(str(tmp_path))
+    key = blobs.put(OUTPUT)
+    _age(blobs, key, 7200)
+    # An in-flight episode sees the same output again; its step is not in any log yet.
+    assert blobs.put(OUTPUT) == key
+    stats = blobs.gc([], grace_seconds=3600)
+    assert stats["deleted"] == 0 and stats["kept_recent"] == 1
+    assert blobs.get(key) == OUTPUT
+
+
+def test_put_rewrites_a_blob_deleted_by_another_gc(tmp_path):
+    writer = ObservationBlobStore(str(tmp_path))
+    key = writer.put(OUTPUT)
+    _age(writer, key, 7200)
+    ObservationBlobStore(str(tmp_path)).gc([], grace_seconds=3600)
+    assert not os.path.exists(writer._path(key))
+    writer.put(OUTPUT)
+    assert writer.get(key) == OUTPUT
+
+
+def test_gc_keeps_referenced_blobs(tmp_path):
+    blobs = ObservationBlobStore(str(tmp_path), min_bytes=16)
+    step = blobs.dehydrate_step({"observation": OUTPUT})
+    orphan = blobs.put("x" * 64)
+    for key in (step["observation_ref"], orphan):
+        _age(blobs, key, 7200)
+    stats = blobs.gc([{"steps": [step]}], grace_seconds=3600)
+    assert stats["deleted"] == 1
+    assert blobs.rehydrate({"steps": [step]})["steps"][0]["observation"] == OUTPUT
@@ -0,0 +1,30 @@
+import pytest
+
+from online_rl_agent.data.reward_labels import REWARD_LABELED, REWARD_PENDING, RewardLabelStore, is_pending
+
+
+def test_latest_label_wins_and_is_overlaid(tmp_path):
+    labels = RewardLabelStore(str(tmp_path / "labels.jsonl"))
+    labels.set("traj-1", 0, labeler="ana")
+    labels.set("traj-1", 1, labeler="bo", note="fixed after all")
+    trajectory = labels.apply({"id": "traj-1", "reward": None, "reward_status": REWARD_PENDING})
+    assert trajectory["reward"] == 1 and trajectory["reward_status"] == REWARD_LABELED
+    assert trajectory["reward_label"]["labeler"] == "bo" and trajectory["reward_label"]["note"] == "fixed after all"
+    assert not is_pending(trajectory)
+    assert labels.apply({"id": "traj-2", "reward": None}) == {"id": "traj-2", "reward": None}
+
+
+def test_invalid_reward_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RewardLabelStore(str(tmp_path / "labels.jsonl")).set("traj-1", 2)
+
+
+def test_labels_appended_by_another_store_are_picked_up(tmp_path):
+    path = str(tmp_path / "labels.jsonl")
+    reader, writer = RewardLabelStore(path), RewardLabelStore(path)
+    assert reader.get("traj-1") is None
+    writer.set("traj-1", -1)
+    with open(path, "a") as f:
+        f.write('{"id": "traj-2", "rew')  # Still being written.
+    assert reader.get("traj-1")["reward"] == -1
+    assert set(reader.all()) == {"traj-1"}
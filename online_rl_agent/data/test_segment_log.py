@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+from online_rl_agent.data.segment_log import SegmentedTrajectoryLog, iter_blocks
+
+
+def _trajectory(i):
+    return {"id": f"traj-{i}", "start_time": "2026-10-17T10:00:00", "steps": [{"observation": "x" * (i % 50)}]}
+
+
+def test_partial_batch_is_flushed_by_the_timer(tmp_path):
+    log = SegmentedTrajectoryLog(str(tmp_path), batch_records=100, flush_interval=0.05)
+    try:
+        log.append(_trajectory(0))
+        deadline = time.monotonic() + 2.0
+        while not log.segments() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [t["id"] for t in log.iter_trajectories()] == ["traj-0"]
+    finally:
+        log.close()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 1024 * 1024])
+def test_iter_blocks_finds_every_batch(tmp_path, chunk_size):
+    with SegmentedTrajectoryLog(str(tmp_path), batch_records=3) as log:
+        for i in range(10):
+            log.append(_trajectory(i))
+    [segment] = log.segments()
+    blocks = list(iter_blocks(str(tmp_path / segment["name"]), "gzip", chunk_size=chunk_size))
+    assert len(blocks) == 4
+    located = list(log.iter_located())
+    assert [record["id"] for record, _ in located] == [f"traj-{i}" for i in range(10)]
+    assert all(log.read_record(location) == record for record, location in located)
+
+
+def test_truncated_batch_is_ignored(tmp_path):
+    with SegmentedTrajectoryLog(str(tmp_path), batch_records=2) as log:
+        for i in range(4):
+            log.append(_trajectory(i))
+    path = tmp_path / log.segments()[0]["name"]
+    path.write_bytes(path.read_bytes()[:-5])
+    assert len(list(iter_blocks(str(path), "gzip", chunk_size=16))) == 1
+
+
+def test_iter_trajectories_stops_at_a_truncated_last_batch(tmp_path):
+    with SegmentedTrajectoryLog(str(tmp_path), batch_records=2) as log:
+        for i in range(4):
+            log.append(_trajectory(i))
+    path = tmp_path / log.segments()[0]["name"]
+    path.write_bytes(path.read_bytes()[:-5])
+    assert [t["id"] for t in log.iter_trajectories()] == ["traj-0", "traj-1"]
+
+
+def test_segment_is_fsynced_before_the_manifest(tmp_path, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        synced.append(os.path.basename(os.readlink(f"/proc/self/fd/{fd}")))
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    log = SegmentedTrajectoryLog(str(tmp_path), batch_records=1, fsync="segment")
+    log.append(_trajectory(0))
+    assert synced == []  # Neither the batch nor a manifest describing it is durable yet.
+    log.sync()
+    assert synced[0].startswith("segment-") and synced[1].endswith(".tmp")
+    log.close()
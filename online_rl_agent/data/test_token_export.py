@@ -0,0 +1,82 @@
+import json
+
+from online_rl_agent.data.token_export import (ByteTokenizer, TokenShardDataset, TokenShardWriter,
+                                               tokenize_messages, trajectory_to_samples)
+
+GET_PODS = '{"tool_name": "get_pods", "tool_args": {"namespace": "shop"}, "thought": "look around"}'
+ANSWER = '```json\n{"tool_name": "final_answer", "tool_args": {"answer": "bad image"}, "thought": "done"}\n```'
+
+
+def _step(tool_name, tool_args, observation, response=None, prompt=None, **metrics):
+    step = {"thought": "t", "action": {"tool_name": tool_name, "tool_args": tool_args},
+            "observation": observation, "metrics": metrics}
+    if response is not None:
+        step["response"] = response
+    if prompt is not None:
+        step["prompt"] = prompt
+    return step
+
+
+def _trajectory(steps, trajectory_id="traj-1"):
+    return {"id": trajectory_id, "task": "Why is checkout failing?", "reward": 1.0,
+            "end_time": "2026-10-17T10:00:00Z", "steps": steps}
+
+
+def _trainable(sample):
+    return [m["content"] for m in sample if m["role"] == "assistant" and m.get("train", True)]
+
+
+def test_raw_responses_are_the_targets():
+    steps = [_step("get_pods", {"namespace": "shop"}, "NAME READY", response=GET_PODS),
+             _step("final_answer", {"answer": "bad image"}, "", response=ANSWER, parse_repairs=["fence"])]
+    [sample] = trajectory_to_samples(_trajectory(steps), system_prompt="sys")
+    assert [m["role"] for m in sample] == ["system", "user", "assistant", "user", "assistant"]
+    assert _trainable(sample) == [GET_PODS, ANSWER]
+    assert sample[3]["content"] == "Tool get_pods output:\nNAME READY"
+
+
+def test_truncated_prompt_starts_a_new_sample():
+    truncated = [{"role": "system", "content": "sys"}, {"role": "user", "content": "[earlier turns omitted]"}]
+    steps = [_step("get_pods", {"namespace": "shop"}, "NAME READY", response=GET_PODS),
+             _step("final_answer", {"answer": "x"}, "", response=ANSWER, prompt=truncated)]
+    first, second = trajectory_to_samples(_trajectory(steps), system_prompt="sys")
+    assert _trainable(first) == [GET_PODS]
+    assert _trainable(second) == [ANSWER]
+    assert [m["content"] for m in second[:2]] == ["sys", "[earlier turns omitted]"]
+
+
+def test_parse_errors_are_context_only():
+    steps = [_step("error", {}, "Error: Your response was not in the expected JSON format.",
+                   response="I think the pods are fine", parse_error=True),
+             _step("final_answer", {"answer": "x"}, "", response=ANSWER)]
+    [sample] = trajectory_to_samples(_trajectory(steps), system_prompt="sys")
+    assert _trainable(sample) == [ANSWER]
+    assert sample[2] == {"role": "user", "content": "Error: Your response was not in the expected JSON format.",
+                         "train": False}
+
+
+def test_unknown_tool_output_is_not_prefixed():
+    steps = [_step("get_pod", {}, "Error: Unknown tool 'get_pod'.", response=GET_PODS),
+             _step("final_answer", {"answer": "x"}, "", response=ANSWER)]
+    [sample] = trajectory_to_samples(_trajectory(steps), system_prompt="sys")
+    assert sample[3]["content"] == "Error: Unknown tool 'get_pod'."
+
+
+def test_loss_mask_skips_context_messages():
+    tokenizer = ByteTokenizer()
+    messages = [{"role": "assistant", "content": "ab", "train": False}, {"role": "assistant", "content": "cd"}]
+    tokens, mask = tokenize_messages(messages, tokenizer)
+    assert len(tokens) == len(mask)
+    assert mask.sum() == 3  # "cd" and its end token.
+
+
+def test_reexport_skips_trajectories_already_written(tmp_path):
+    trajectory = _trajectory([_step("final_answer", {"answer": "x"}, "", response=ANSWER)])
+    assert TokenShardWriter(str(tmp_path)).export([trajectory]) == 1
+    writer = TokenShardWriter(str(tmp_path))
+    assert writer.export([trajectory, _trajectory(trajectory["steps"], "traj-2")]) == 1
+    assert writer.skipped == 1
+    dataset = TokenShardDataset(str(tmp_path))
+    assert sorted(sample["id"] for sample in dataset.window()) == ["traj-1", "traj-2"]
+    with open(tmp_path / "manifest.json") as f:
+        assert len(json.load(f)["shards"]) == 2
@@ -0,0 +1,86 @@
+import json
+
+from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+from online_rl_agent.data.trajectory_index import TrajectoryIndex
+
+
+def _trajectory(i, reward=1.0, scenario="pod-kill", tools=("get_pods",)):
+    steps = [{"action": {"tool_name": tool, "tool_args": {}}, "observation": "ok"} for tool in tools]
+    return {"id": f"traj-{i}", "start_time": f"2026-10-17T{10 + i:02d}:00:00",
+            "end_time": f"2026-10-17T{10 + i:02d}:30:00", "reward": reward, "scenario": scenario,
+            "model": "m", "steps": steps}
+
+
+def _write_jsonl(path, trajectories, tail=""):
+    with open(path, "w") as f:
+        for trajectory in trajectories:
+            f.write(json.dumps(trajectory) + "\n")
+        f.write(tail)
+
+
+def test_queries_combine_filters_newest_first(tmp_path):
+    path = tmp_path / "trajectories.jsonl"
+    _write_jsonl(path, [
+        _trajectory(0),
+        _trajectory(1, reward=0.0),
+        _trajectory(2, scenario="network-delay", tools=("get_pods", "get_logs")),
+        _trajectory(3, reward=None, tools=("get_logs", "get_logs", "describe_pod")),
+    ])
+    index = TrajectoryIndex(str(tmp_path / "index.sqlite"))
+    assert index.sync_jsonl(str(path)) == 4
+
+    def ids(**filters):
+        return [row["id"] for row in index.query(**filters)]
+
+    assert ids() == ["traj-3", "traj-2", "traj-1", "traj-0"]
+    assert ids(reward=1.0) == ["traj-2", "traj-0"]
+    assert ids(reward=1.0, scenario="pod-kill") == ["traj-0"]
+    assert ids(tool="get_logs") == ["traj-3", "traj-2"]
+    assert ids(since="2026-10-17T12:00:00") == ["traj-3", "traj-2"]
+    assert ids(until="2026-10-17T11:00:00") == ["traj-1", "traj-0"]
+    assert ids(min_steps=2) == ["traj-3", "traj-2"]
+    assert ids(pending=True) == ["traj-3"]
+    assert ids(limit=1) == ["traj-3"]
+    [row] = index.query(pending=True)
+    assert row["tools"] == "get_logs,describe_pod" and row["num_steps"] == 3
+    assert index.read(row)["id"] == "traj-3"
+    index.close()
+
+
+def test_sync_jsonl_resumes_after_a_partial_line(tmp_path):
+    path = tmp_path / "trajectories.jsonl"
+    partial = json.dumps(_trajectory(1))
+    _write_jsonl(path, [_trajectory(0)], tail=partial[:10])
+    index = TrajectoryIndex(str(tmp_path / "index.sqlite"))
+    assert index.sync_jsonl(str(path)) == 1
+    with open(path, "a") as f:
+        f.write(partial[10:] + "\n")
+    assert index.sync_jsonl(str(path)) == 1
+    assert index.sync_jsonl(str(path)) == 0
+    assert [index.read(row)["id"] for row in index.query()] == ["traj-1", "traj-0"]
+    index.close()
+
+
+def test_attached_segment_log_is_indexed_and_read_back(tmp_path):
+    index = TrajectoryIndex(str(tmp_path / "index.sqlite"))
+    with SegmentedTrajectoryLog(str(tmp_path / "segments"), batch_records=2) as log:
+        index.attach_log(log)
+        for i in range(5):
+            log.append(_trajectory(i))
+    rows = index.query(scenario="pod-kill")
+    assert [row["source"] for row in rows] == ["segment"] * 5
+    assert [record["id"] for record in index.iter_records(rows)] == [f"traj-{i}" for i in range(4, -1, -1)]
+    assert index.read(rows[0]) == _trajectory(4)
+    index.close()
+
+
+def test_set_reward_labels_a_pending_trajectory(tmp_path):
+    path = tmp_path / "trajectories.jsonl"
+    _write_jsonl(path, [_trajectory(0, reward=None)])
+    index = TrajectoryIndex(str(tmp_path / "index.sqlite"))
+    index.sync_jsonl(str(path))
+    assert index.set_reward("traj-0", 1.0)
+    assert not index.set_reward("traj-missing", 1.0)
+    assert index.query(pending=True) == []
+    assert [row["id"] for row in index.query(reward=1.0)] == ["traj-0"]
+    index.close()
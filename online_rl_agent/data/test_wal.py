@@ -0,0 +1,101 @@
+import gc
+import os
+
+from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+from online_rl_agent.data.trajectory_store import TrajectoryStore
+from online_rl_agent.data.wal import TrajectoryWAL
+
+
+def _run_episode(store, trajectory_id, reward=1):
+    store.start_new_trajectory(trajectory_id, {"scenario": "pod-kill"})
+    store.add_step("look", "get_pods", {"namespace": "default"}, "NAME READY")
+    store.add_final_answer("the pod was killed")
+    store.end_trajectory(reward)
+
+
+def test_recover_finalizes_ended_and_quarantines_unfinished(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    crashed = TrajectoryStore(save_path=str(tmp_path / "t.jsonl"), wal=wal)
+    _run_episode(crashed, "ended")
+    wal.abandon("ended")
+    crashed.start_new_trajectory("unfinished")
+    crashed.add_step("look", "get_pods", {}, "NAME READY")
+    wal.abandon("unfinished")
+
+    store = TrajectoryStore(save_path=str(tmp_path / "t.jsonl"), wal=TrajectoryWAL(str(tmp_path / "wal")))
+    assert store.recover_from_wal() == {"finalized": 1, "quarantined": 1}
+    saved = list(store.iter_saved())
+    assert [t["id"] for t in saved] == ["ended"]
+    assert saved[0]["reward"] == 1 and len(saved[0]["steps"]) == 2
+    assert wal.pending() == []
+    assert os.path.exists(tmp_path / "wal" / "quarantine" / "unfinished.json")
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    store = TrajectoryStore(save_path=str(tmp_path / "t.jsonl"), wal=wal)
+    _run_episode(store, "torn")
+    wal.abandon("torn")
+    with open(tmp_path / "wal" / "torn.wal", "a") as f:
+        f.write('{"type": "step", "st')
+    replayed = TrajectoryWAL.replay(str(tmp_path / "wal" / "torn.wal"))
+    assert replayed["torn"] and replayed["ended"]
+    assert len(replayed["trajectory"]["steps"]) == 2
+
+
+def test_wal_outlives_buffered_segment_append(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    log = SegmentedTrajectoryLog(str(tmp_path / "segments"), batch_records=32, fsync="segment")
+    store = TrajectoryStore(save_path=str(tmp_path / "unused.jsonl"), log=log, wal=wal)
+    _run_episode(store, "buffered")
+    store.save_trajectory()
+    # Only buffered: a crash now must still be recoverable from the WAL.
+    assert [os.path.basename(p) for p in wal.pending()] == ["buffered.wal"]
+
+    log.flush()
+    # Written but not fsynced under the "segment" policy.
+    assert len(wal.pending()) == 1
+
+    log.sync()
+    assert wal.pending() == []
+    assert [t["id"] for t in log.iter_trajectories()] == ["buffered"]
+
+
+def test_recover_into_segment_log_deletes_wal_once_durable(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    crashed = TrajectoryStore(save_path=str(tmp_path / "t.jsonl"), wal=wal)
+    _run_episode(crashed, "crashed")
+    wal.abandon("crashed")
+
+    log = SegmentedTrajectoryLog(str(tmp_path / "segments"), batch_records=32)
+    store = TrajectoryStore(save_path=str(tmp_path / "unused.jsonl"), log=log, wal=wal)
+    assert store.recover_from_wal()["finalized"] == 1
+    assert wal.pending() == []
+    assert [t["id"] for t in log.iter_trajectories()] == ["crashed"]
+
+
+def test_one_durable_listener_per_log(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    log = SegmentedTrajectoryLog(str(tmp_path / "segments"))
+    for _ in range(3):
+        TrajectoryStore(save_path=str(tmp_path / "unused.jsonl"), log=log, wal=wal)
+    assert len(log._durable_listeners) == 1
+
+
+class _ListenerLog:
+    def __init__(self):
+        self.listeners = []
+
+    def add_durable_listener(self, listener):
+        self.listeners.append(listener)
+
+
+def test_collected_log_does_not_block_a_new_one(tmp_path):
+    wal = TrajectoryWAL(str(tmp_path / "wal"))
+    wal.commit_when_durable(_ListenerLog())  # Dropped right away, so its id may be handed out again.
+    gc.collect()
+    log = _ListenerLog()
+    wal.commit_when_durable(log)
+    wal.commit_when_durable(log)
+    assert len(log.listeners) == 1
+    assert list(wal._bound_logs) == [log]
@@ -0,0 +1,428 @@
+"""
+Export of stored trajectories as tokenized, memory-mapped training shards.
+
+Each trajectory becomes one or more chat-format samples (what the model was
+sent, using the prompts recorded per step, and its raw responses) and then a
+flat array of token ids with a loss mask that is 1 on the responses. Samples
+are packed into shards:
+
+    <out_dir>/manifest.json
+    <out_dir>/shard-00000/tokens.npy      uint16/uint32, all samples back to back
+    <out_dir>/shard-00000/loss_mask.npy   uint8, same length as tokens
+    <out_dir>/shard-00000/offsets.npy     int64, n_samples + 1 token offsets
+    <out_dir>/shard-00000/rewards.npy     float32 (NaN when unlabeled)
+    <out_dir>/shard-00000/end_times.npy   float64 epoch seconds, sorted
+    <out_dir>/shard-00000/ids.json        trajectory id of each sample
+
+`TokenShardDataset` opens shards with `np.load(mmap_mode="r")`, so reading a
+time window only touches the pages of the samples it returns.
+"""
+import datetime
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from online_rl_agent.agent.prompts import SYSTEM_PROMPT
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:  # Only needed for --tokenizer <huggingface name>.
+    AutoTokenizer = None
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ByteTokenizer:
+    """Dependency-free UTF-8 byte tokenizer with a few special tokens for the chat layout."""
+
+    SPECIAL_TOKENS = ("<|system|>", "<|user|>", "<|assistant|>", "<|end|>")
+
+    def __init__(self):
+        self.name = "bytes"
+        self.special_ids = {token: 256 + i for i, token in enumerate(self.SPECIAL_TOKENS)}
+        self.vocab_size = 256 + len(self.SPECIAL_TOKENS)
+
+    def encode(self, text: str) -> np.ndarray:
+        return np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.int64)
+
+    def special(self, token: str) -> np.ndarray:
+        return np.array([self.special_ids[token]], dtype=np.int64)
+
+
+class HFTokenizer:
+    """Wraps a Hugging Face tokenizer; role markers are encoded as plain text."""
+
+    def __init__(self, name: str):
+        if AutoTokenizer is None:
+            raise ImportError("Hugging Face tokenizers require the 'transformers' package.")
+        self.name = name
+        self._tokenizer = AutoTokenizer.from_pretrained(name)
+        self.vocab_size = len(self._tokenizer)
+
+    def encode(self, text: str) -> np.ndarray:
+        return np.asarray(self._tokenizer.encode(text, add_special_tokens=False), dtype=np.int64)
+
+    def special(self, token: str) -> np.ndarray:
+        return self.encode(token)
+
+
+def get_tokenizer(name: str = "bytes"):
+    """Returns the byte tokenizer for "bytes", otherwise the named Hugging Face tokenizer."""
+    return ByteTokenizer() if name == "bytes" else HFTokenizer(name)
+
+
+def _epoch(timestamp: Optional[str]) -> float:
+    if not timestamp:
+        return float("nan")
+    return datetime.datetime.fromisoformat(timestamp).replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _observation_message(turn: List[Dict[str, Any]]) -> Dict[str, str]:
+    """The user message the agent built from a turn's tool outputs (see `DevOpsAgent.run`)."""
+    parts = []
+    for step in turn:
+        name, output = step["action"]["tool_name"], step.get("observation", "")
+        # Outputs of unknown tools are the agent's error text, sent without the "Tool ... output" header.
+        parts.append(output if output.startswith(f"Error: Unknown tool '{name}'") else f"Tool {name} output:\n{output}")
+    return {"role": "user", "content": "\n\n".join(parts)}
+
+
+def _assistant_texts(turn: List[Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    Returns (the model's response, the text the agent put in its history) for a turn.
+
+    Both are the recorded raw response, unless the parser had to repair it; the
+    history then held the canonical JSON. Trajectories recorded before raw
+    responses were stored get the canonical JSON for both.
+    """
+    thought = turn[0].get("thought", "")
+    actions = [step["action"] for step in turn]
+    if len(actions) == 1:
+        canonical = {"tool_name": actions[0]["tool_name"], "tool_args": actions[0]["tool_args"], "thought": thought}
+    else:
+        canonical = {"tool_calls": actions, "thought": thought}
+    response = turn[0].get("response")
+    if response is None:
+        return json.dumps(canonical), json.dumps(canonical)
+    if (turn[0].get("metrics") or {}).get("parse_repairs"):
+        return response, json.dumps(canonical, indent=2)
+    return response, response
+
+
+def _same_messages(a: List[Dict[str, Any]], b: List[Dict[str, Any]]) -> bool:
+    return len(a) == len(b) and all(x["role"] == y["role"] and x["content"] == y["content"] for x, y in zip(a, b))
+
+
+def trajectory_to_samples(trajectory: Dict[str, Any],
+                          system_prompt: str = SYSTEM_PROMPT) -> List[List[Dict[str, Any]]]:
+    """
+    Rebuilds what the model saw and answered in a trajectory, as chat-format samples.
+
+    Each turn's context is the prompt recorded with it (e.g. after the context
+    manager truncated the history or asked for a final answer) or, when none was
+    recorded, the conversation so far. Its target is the model's raw response.
+    Turns are kept in one sample while each context extends the previous one;
+    otherwise a new sample starts whose earlier messages are context only
+    (`"train": False`), so no response is trained on twice.
+
+    Sub-calls of one parallel turn (steps with `batch_index`) form one turn.
+    Unparsable responses are not trained on; the error message the agent sent
+    back is kept as context.
+    """
+    history: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}]
+    if trajectory.get("task"):
+        history.append({"role": "user", "content": trajectory["task"]})
+
+    turns: List[List[Dict[str, Any]]] = []
+    for step in trajectory.get("steps") or []:
+        if (step.get("metrics") or {}).get("batch_index", 0) > 0 and turns:
+            turns[-1].append(step)
+        else:
+            turns.append([step])
+
+    samples: List[List[Dict[str, Any]]] = []
+    sample: List[Dict[str, Any]] = []
+    sample_is_history = False  # Whether `sample` (without train flags) equals the context so far.
+    for turn in turns:
+        first = turn[0]
+        context = first.get("prompt") or history
+        if first["action"]["tool_name"] == "error":
+            if not (first.get("metrics") or {}).get("parse_error"):
+                break  # Tool calls refused after a forced final answer: the episode ended here.
+            history = list(context) + [{"role": "user", "content": first.get("observation", "")}]
+            continue
+
+        response, history_text = _assistant_texts(turn)
+        if sample_is_history and _same_messages(sample, context[:len(sample)]):
+            sample.extend(dict(m, train=False) for m in context[len(sample):])
+        else:
+            if any(m.get("train", True) and m["role"] == "assistant" for m in sample):
+                samples.append(sample)
+            sample = [dict(m, train=False) for m in context]
+        sample.append({"role": "assistant", "content": response})
+        sample_is_history = response == history_text
+
+        history = list(context) + [{"role": "assistant", "content": history_text}]
+        if first["action"]["tool_name"] == "final_answer":
+            break
+        history.append(_observation_message(turn))
+    if any(m.get("train", True) and m["role"] == "assistant" for m in sample):
+        samples.append(sample)
+    return samples
+
+
+def tokenize_messages(messages: List[Dict[str, Any]], tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lays out `<|role|>content<|end|>` for each message and tokenizes it.
+
+    Returns:
+        (token ids, loss mask); the mask is 1 on the content and end token of
+        assistant messages, unless they are marked `"train": False`.
+    """
+    end = tokenizer.special("<|end|>")
+    token_parts, mask_parts = [], []
+    for message in messages:
+        header = tokenizer.special(f"<|{message['role']}|>")
+        body = np.concatenate([tokenizer.encode(message["content"]), end])
+        token_parts += [header, body]
+        trainable = 1 if message["role"] == "assistant" and message.get("train", True) else 0
+        mask_parts += [np.zeros(len(header), dtype=np.uint8), np.full(len(body), trainable, dtype=np.uint8)]
+    return np.concatenate(token_parts), np.concatenate(mask_parts)
+
+
+class TokenShardWriter:
+    """
+    Packs tokenized trajectories into memory-mappable shards under `out_dir`.
+
+    Trajectories already present in the directory's shards (by id) are skipped,
+    so repeated exports, e.g. every hour with `--last-hours`, only add new ones.
+    """
+
+    def __init__(self, out_dir: str, tokenizer=None, shard_tokens: int = 64 * 1024 * 1024):
+        """
+        Args:
+            out_dir: Output directory; appended to if it already holds shards.
+            tokenizer: `ByteTokenizer` (default) or `HFTokenizer`.
+            shard_tokens: Start a new shard once this many tokens are buffered.
+        """
+        self.out_dir = out_dir
+        self.tokenizer = tokenizer or ByteTokenizer()
+        self.shard_tokens = shard_tokens
+        self.token_dtype = np.uint16 if self.tokenizer.vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+        os.makedirs(out_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+        if self.manifest["shards"] and self.manifest["tokenizer"] != self.tokenizer.name:
+            raise ValueError(f"{out_dir} holds shards tokenized with '{self.manifest['tokenizer']}', "
+                             f"not '{self.tokenizer.name}'.")
+        self.manifest["tokenizer"] = self.tokenizer.name
+        self.manifest["token_dtype"] = np.dtype(self.token_dtype).name
+        self._pending: List[Tuple[float, str, float, np.ndarray, np.ndarray]] = []
+        self._pending_tokens = 0
+        self.exported_ids = self._load_exported_ids()
+        self.skipped = 0
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.out_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 1, "tokenizer": None, "token_dtype": None, "shards": []}
+
+    def _load_exported_ids(self) -> set:
+        ids = set()
+        for shard in self.manifest["shards"]:
+            with open(os.path.join(self.out_dir, shard["name"], "ids.json")) as f:
+                ids.update(json.load(f))
+        return ids
+
+    def add(self, trajectory: Dict[str, Any]) -> bool:
+        """
+        Tokenizes one trajectory and buffers its samples; writes a shard when the buffer is full.
+
+        Returns:
+            False if the trajectory was already exported (or has nothing to train on).
+        """
+        trajectory_id = trajectory.get("id") or ""
+        if trajectory_id and trajectory_id in self.exported_ids:
+            self.skipped += 1
+            return False
+        samples = trajectory_to_samples(trajectory)
+        if not samples:
+            return False
+        end_time = _epoch(trajectory.get("end_time") or trajectory.get("start_time"))
+        reward = trajectory.get("reward")
+        for messages in samples:
+            tokens, mask = tokenize_messages(messages, self.tokenizer)
+            self._pending.append((
+                end_time,
+                trajectory_id,
+                float("nan") if reward is None else float(reward),
+                tokens.astype(self.token_dtype),
+                mask,
+            ))
+            self._pending_tokens += len(tokens)
+        if trajectory_id:
+            self.exported_ids.add(trajectory_id)
+        if self._pending_tokens >= self.shard_tokens:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Writes the buffered samples as one shard, sorted by end time."""
+        if not self._pending:
+            return
+        samples = sorted(self._pending, key=lambda s: (np.isnan(s[0]), s[0]))
+        self._pending, self._pending_tokens = [], 0
+
+        name = f"shard-{len(self.manifest['shards']):05d}"
+        final_dir = os.path.join(self.out_dir, name)
+        tmp_dir = final_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        lengths = np.array([len(s[3]) for s in samples], dtype=np.int64)
+        offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        end_times = np.array([s[0] for s in samples], dtype=np.float64)
+        np.save(os.path.join(tmp_dir, "tokens.npy"), np.concatenate([s[3] for s in samples]))
+        np.save(os.path.join(tmp_dir, "loss_mask.npy"), np.concatenate([s[4] for s in samples]))
+        np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_dir, "rewards.npy"), np.array([s[2] for s in samples], dtype=np.float32))
+        np.save(os.path.join(tmp_dir, "end_times.npy"), end_times)
+        with open(os.path.join(tmp_dir, "ids.json"), "w") as f:
+            json.dump([s[1] for s in samples], f)
+        os.replace(tmp_dir, final_dir)
+
+        valid = end_times[~np.isnan(end_times)]
+        self.manifest["shards"].append({
+            "name": name,
+            "samples": len(samples),
+            "tokens": int(offsets[-1]),
+            "start_time": float(valid.min()) if len(valid) else None,
+            "end_time": float(valid.max()) if len(valid) else None,
+        })
+        manifest_path = os.path.join(self.out_dir, MANIFEST_NAME)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        logging.info(f"Wrote token shard {name}: {len(samples)} samples, {int(offsets[-1])} tokens.")
+
+    def export(self, trajectories: Iterable[Dict[str, Any]]) -> int:
+        """Tokenizes and writes every new trajectory, then flushes. Returns the number exported."""
+        count = 0
+        for trajectory in trajectories:
+            count += int(self.add(trajectory))
+        self.flush()
+        return count
+
+
+class TokenShardDataset:
+    """
+    Read-only, memory-mapped view over the shards of an export directory.
+
+    Samples are returned as dicts of NumPy views (`tokens`, `loss_mask`) plus
+    `reward`, `end_time` and `id`; nothing is copied until the caller does.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        self._shards: Dict[str, Dict[str, Any]] = {}
+
+    def _shard(self, name: str) -> Dict[str, Any]:
+        shard = self._shards.get(name)
+        if shard is None:
+            path = os.path.join(self.directory, name)
+            shard = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r")
+                     for key in ("tokens", "loss_mask", "offsets", "rewards", "end_times")}
+            with open(os.path.join(path, "ids.json")) as f:
+                shard["ids"] = json.load(f)
+            self._shards[name] = shard
+        return shard
+
+    def __len__(self) -> int:
+        return sum(s["samples"] for s in self.manifest["shards"])
+
+    def _sample(self, shard: Dict[str, Any], i: int) -> Dict[str, Any]:
+        start, end = int(shard["offsets"][i]), int(shard["offsets"][i + 1])
+        return {
+            "id": shard["ids"][i],
+            "tokens": shard["tokens"][start:end],
+            "loss_mask": shard["loss_mask"][start:end],
+            "reward": float(shard["rewards"][i]),
+            "end_time": float(shard["end_times"][i]),
+        }
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None,
+               reward: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams the samples whose end time falls in [start, end] (epoch seconds),
+        optionally only those with the given reward. Shards outside the window are never opened.
+        """
+        for meta in self.manifest["shards"]:
+            if start is not None and meta["end_time"] is not None and meta["end_time"] < start:
+                continue
+            if end is not None and meta["start_time"] is not None and meta["start_time"] > end:
+                continue
+            shard = self._shard(meta["name"])
+            times = shard["end_times"]
+            lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            hi = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+            selected = np.arange(lo, hi)
+            if reward is not None:
+                selected = selected[np.asarray(shard["rewards"][lo:hi]) == reward]
+            for i in selected:
+                yield self._sample(shard, int(i))
+
+    def last_hours(self, hours: float, reward: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Streams the samples of the last `hours` hours."""
+        now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+        return self.window(start=now - hours * 3600, reward=reward)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export trajectories as tokenized, memory-mapped shards.")
+    parser.add_argument("out_dir", help="Output directory for the shards.")
+    parser.add_argument("--jsonl", help="Read trajectories from a JSONL file.")
+    parser.add_argument("--segments", help="Read trajectories from a segment log directory.")
+    parser.add_argument("--last-hours", type=float, help="Only export trajectories that ended in the last N hours.")
+    parser.add_argument("--tokenizer", default="bytes", help="'bytes' or a Hugging Face tokenizer name.")
+    parser.add_argument("--shard-tokens", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--blob-dir", help="Observation blob store to rehydrate deduplicated trajectories from.")
+    parser.add_argument("--labels", help="Reward label file whose labels replace pending rewards.")
+    args = parser.parse_args()
+
+    since = None
+    if args.last_hours is not None:
+        since = (datetime.datetime.utcnow() - datetime.timedelta(hours=args.last_hours)).isoformat()
+
+    def read_source() -> Iterator[Dict[str, Any]]:
+        if args.segments:
+            from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+            yield from SegmentedTrajectoryLog(args.segments).iter_trajectories(start=since)
+        if args.jsonl:
+            with open(args.jsonl) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if since is None or (record.get("end_time") or record.get("start_time") or "") >= since:
+                            yield record
+
+    writer = TokenShardWriter(args.out_dir, get_tokenizer(args.tokenizer), shard_tokens=args.shard_tokens)
+    source = read_source()
+    if args.blob_dir:
+        from online_rl_agent.data.blob_store import ObservationBlobStore
+        source = ObservationBlobStore(args.blob_dir).iter_rehydrated(source)
+    if args.labels:
+        from online_rl_agent.data.reward_labels import RewardLabelStore
+        source = RewardLabelStore(args.labels).iter_applied(source)
+    exported = writer.export(source)
+    dataset = TokenShardDataset(args.out_dir)
+    print(f"Exported {exported} trajectories ({writer.skipped} already exported); {args.out_dir} now holds {len(dataset)} samples "
+          f"in {len(dataset.manifest['shards'])} shard(s).")
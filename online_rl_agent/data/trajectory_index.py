@@ -0,0 +1,356 @@
+"""
+SQLite index over saved trajectories, for selecting training sets.
+
+Each row holds a trajectory's id, time range, reward, step count, tools used,
+fault scenario and model, plus where the full record lives: a byte offset in
+a JSONL file or a (segment, block offset, line) location in a
+`SegmentedTrajectoryLog`. Queries like "reward=1 episodes of scenario X from
+the last 6 hours" then touch the index only, and the matching records are read
+back with one seek each. Rewards labeled after saving (see `reward_labels`)
+are written to the index with `set_reward`, and re-applied on rescans when a
+`RewardLabelStore` is given.
+"""
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from online_rl_agent.data.segment_log import read_block
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trajectories (
+    id TEXT PRIMARY KEY,
+    start_time TEXT,
+    end_time TEXT,
+    reward REAL,
+    num_steps INTEGER,
+    tools TEXT,
+    scenario TEXT,
+    model TEXT,
+    source TEXT NOT NULL,      -- "jsonl" or "segment"
+    path TEXT NOT NULL,        -- JSONL file, or segment log directory
+    segment TEXT,              -- segment file name (segment source only)
+    offset INTEGER NOT NULL,   -- byte offset of the line / compressed block
+    line_index INTEGER         -- line within the block (segment source only)
+);
+CREATE INDEX IF NOT EXISTS idx_traj_scenario_reward_end ON trajectories (scenario, reward, end_time);
+CREATE INDEX IF NOT EXISTS idx_traj_end ON trajectories (end_time);
+CREATE TABLE IF NOT EXISTS trajectory_tools (
+    trajectory_id TEXT NOT NULL,
+    tool_name TEXT NOT NULL,
+    PRIMARY KEY (trajectory_id, tool_name)
+);
+CREATE INDEX IF NOT EXISTS idx_tools_name ON trajectory_tools (tool_name);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL    -- JSONL bytes already indexed
+);
+"""
+
+
+def _summarize(trajectory: Dict[str, Any]) -> Dict[str, Any]:
+    steps = trajectory.get("steps") or []
+    tools = []
+    for step in steps:
+        name = (step.get("action") or {}).get("tool_name")
+        if name and name not in tools:
+            tools.append(name)
+    return {
+        "id": trajectory.get("id"),
+        "start_time": trajectory.get("start_time"),
+        "end_time": trajectory.get("end_time"),
+        "reward": trajectory.get("reward"),
+        "num_steps": len(steps),
+        "tools": tools,
+        "scenario": trajectory.get("scenario"),
+        "model": trajectory.get("model"),
+    }
+
+
+class TrajectoryIndex:
+    """
+    Thread-safe SQLite index of trajectory metadata and record locations.
+
+    Feed it from a `TrajectoryStore` (`index=`), from a segment log
+    (`attach_log`), or by (re)scanning existing files (`sync_jsonl`, `index_log`).
+    """
+
+    def __init__(self, db_path: str = 'data/trajectory_index.sqlite', blobs=None, labels=None):
+        """
+        Args:
+            db_path: SQLite database file; created if missing.
+            blobs: Optional `ObservationBlobStore` used to rehydrate records on read.
+            labels: Optional `RewardLabelStore` applied to records as they are indexed and read.
+        """
+        self.db_path = db_path
+        self.blobs = blobs
+        self.labels = labels
+        dir_name = os.path.dirname(db_path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Writing ---
+
+    def _insert(self, trajectory: Dict[str, Any], source: str, path: str, offset: int,
+                segment: Optional[str] = None, line_index: Optional[int] = None) -> None:
+        if self.labels is not None:
+            trajectory = self.labels.apply(trajectory)
+        summary = _summarize(trajectory)
+        if not summary["id"]:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO trajectories "
+            "(id, start_time, end_time, reward, num_steps, tools, scenario, model, source, path, segment, offset, line_index) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (summary["id"], summary["start_time"], summary["end_time"], summary["reward"], summary["num_steps"],
+             ",".join(summary["tools"]), summary["scenario"], summary["model"],
+             source, path, segment, offset, line_index),
+        )
+        self._conn.execute("DELETE FROM trajectory_tools WHERE trajectory_id = ?", (summary["id"],))
+        self._conn.executemany(
+            "INSERT INTO trajectory_tools (trajectory_id, tool_name) VALUES (?, ?)",
+            [(summary["id"], tool) for tool in summary["tools"]],
+        )
+
+    def add_jsonl(self, trajectory: Dict[str, Any], path: str, offset: int, end_offset: Optional[int] = None) -> None:
+        """
+        Indexes a trajectory written as one line of a JSONL file at byte `offset`.
+
+        Args:
+            end_offset: Where the line ends. When given and the file was indexed up to
+                `offset`, the file's sync position is advanced so `sync_jsonl` skips it.
+        """
+        path = os.path.abspath(path)
+        with self._lock, self._conn:
+            self._insert(trajectory, "jsonl", path, offset)
+            if end_offset is not None:
+                self._conn.execute(
+                    "UPDATE indexed_files SET offset = ? WHERE path = ? AND offset = ?", (end_offset, path, offset)
+                )
+
+    def add_segment_records(self, directory: str, located: List[Tuple[Dict[str, Any], Tuple[str, int, int]]]) -> None:
+        """Indexes (record, location) pairs reported by a `SegmentedTrajectoryLog` flush."""
+        directory = os.path.abspath(directory)
+        with self._lock, self._conn:
+            for record, (segment, offset, line_index) in located:
+                self._insert(record, "segment", directory, offset, segment=segment, line_index=line_index)
+
+    def attach_log(self, log) -> None:
+        """Keeps the index up to date with every batch flushed by a `SegmentedTrajectoryLog`."""
+        log.add_listener(lambda located: self.add_segment_records(log.directory, located))
+
+    def sync_jsonl(self, path: str) -> int:
+        """
+        Indexes the lines of a JSONL file appended since the last sync (the whole file
+        the first time). Returns the number of trajectories indexed.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._conn.execute("SELECT offset FROM indexed_files WHERE path = ?", (path,)).fetchone()
+        start = row["offset"] if row else 0
+        count = 0
+        position = start
+        with open(path, "rb") as f:
+            f.seek(start)
+            with self._lock, self._conn:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # A line still being written; pick it up next time.
+                    offset, position = position, position + len(raw)
+                    if not raw.strip():
+                        continue
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        logging.warning(f"Skipping unparsable trajectory line at byte {offset} of {path}")
+                        continue
+                    self._insert(record, "jsonl", path, offset)
+                    count += 1
+                self._conn.execute("INSERT OR REPLACE INTO indexed_files (path, offset) VALUES (?, ?)", (path, position))
+        return count
+
+    def index_log(self, log) -> int:
+        """Indexes every trajectory already in a `SegmentedTrajectoryLog`. Returns the number indexed."""
+        count = 0
+        batch = []
+        for record, location in log.iter_located():
+            batch.append((record, location))
+            if len(batch) >= 500:
+                self.add_segment_records(log.directory, batch)
+                count += len(batch)
+                batch = []
+        self.add_segment_records(log.directory, batch)
+        return count + len(batch)
+
+    def set_reward(self, trajectory_id: str, reward: Optional[float]) -> bool:
+        """Updates the reward of an indexed trajectory. Returns False if it is not indexed."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("UPDATE trajectories SET reward = ? WHERE id = ?", (reward, trajectory_id))
+        return cursor.rowcount > 0
+
+    def apply_labels(self, labels) -> int:
+        """Copies every label of a `RewardLabelStore` into the index. Returns the number of rows updated."""
+        with self._lock, self._conn:
+            return sum(
+                self._conn.execute("UPDATE trajectories SET reward = ? WHERE id = ?",
+                                   (label["reward"], trajectory_id)).rowcount
+                for trajectory_id, label in labels.all().items()
+            )
+
+    # --- Querying ---
+
+    def query(
+        self,
+        reward: Optional[float] = None,
+        scenario: Optional[str] = None,
+        model: Optional[str] = None,
+        tool: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        min_steps: Optional[int] = None,
+        max_steps: Optional[int] = None,
+        limit: Optional[int] = None,
+        pending: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Finds trajectories by metadata. All filters are optional and combined with AND.
+
+        Args:
+            reward: Exact reward.
+            scenario: Fault scenario name.
+            model: Model that produced the trajectory.
+            tool: Only trajectories that called this tool.
+            since: ISO timestamp; trajectories that ended at or after it.
+            until: ISO timestamp; trajectories that started at or before it.
+            min_steps: Minimum number of steps.
+            max_steps: Maximum number of steps.
+            limit: Maximum number of rows, newest first.
+            pending: Only trajectories without a reward yet.
+
+        Returns:
+            Index rows as dicts, newest first. Pass them to `read` for the full records.
+        """
+        clauses, params = [], []
+        for column, value in (("reward", reward), ("scenario", scenario), ("model", model)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if pending:
+            clauses.append("reward IS NULL")
+        if tool is not None:
+            clauses.append("id IN (SELECT trajectory_id FROM trajectory_tools WHERE tool_name = ?)")
+            params.append(tool)
+        if since is not None:
+            clauses.append("end_time >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("start_time <= ?")
+            params.append(until)
+        if min_steps is not None:
+            clauses.append("num_steps >= ?")
+            params.append(min_steps)
+        if max_steps is not None:
+            clauses.append("num_steps <= ?")
+            params.append(max_steps)
+        sql = "SELECT * FROM trajectories"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY end_time DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM trajectories").fetchone()[0]
+
+    # --- Reading records back ---
+
+    def _rehydrate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if self.labels is not None:
+            record = self.labels.apply(record)
+        return self.blobs.rehydrate(record) if self.blobs is not None else record
+
+    def read(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Reads the full trajectory for an index row with a single seek."""
+        if row["source"] == "jsonl":
+            with open(row["path"], "rb") as f:
+                f.seek(row["offset"])
+                return self._rehydrate(json.loads(f.readline()))
+        compression = "zstd" if row["segment"].endswith(".zst") else "gzip"
+        block = read_block(os.path.join(row["path"], row["segment"]), row["offset"], compression)
+        return self._rehydrate(json.loads(block.decode("utf-8").splitlines()[row["line_index"]]))
+
+    def iter_records(self, rows: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Reads the records of several rows, decompressing each segment block once."""
+        blocks: Dict[Tuple[str, str, int], List[str]] = {}
+        for row in rows:
+            if row["source"] != "segment":
+                yield self.read(row)
+                continue
+            key = (row["path"], row["segment"], row["offset"])
+            if key not in blocks:
+                compression = "zstd" if row["segment"].endswith(".zst") else "gzip"
+                blocks[key] = read_block(os.path.join(row["path"], row["segment"]), row["offset"],
+                                         compression).decode("utf-8").splitlines()
+            yield self._rehydrate(json.loads(blocks[key][row["line_index"]]))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the trajectory index.")
+    parser.add_argument("--db", default="data/trajectory_index.sqlite", help="Index database file.")
+    parser.add_argument("--sync-jsonl", action="append", default=[], help="Index new lines of a JSONL trajectory file.")
+    parser.add_argument("--index-segments", action="append", default=[], help="Index a segment log directory.")
+    parser.add_argument("--reward", type=float)
+    parser.add_argument("--pending", action="store_true", help="Only trajectories still waiting for a reward.")
+    parser.add_argument("--labels", help="Reward label file to apply to the index first.")
+    parser.add_argument("--scenario")
+    parser.add_argument("--model")
+    parser.add_argument("--tool")
+    parser.add_argument("--last-hours", type=float, help="Only trajectories that ended in the last N hours.")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    labels = None
+    if args.labels:
+        from online_rl_agent.data.reward_labels import RewardLabelStore
+        labels = RewardLabelStore(args.labels)
+    index = TrajectoryIndex(args.db, labels=labels)
+    for jsonl_path in args.sync_jsonl:
+        print(f"Indexed {index.sync_jsonl(jsonl_path)} new trajectories from {jsonl_path}.")
+    if args.index_segments:
+        from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+        for directory in args.index_segments:
+            print(f"Indexed {index.index_log(SegmentedTrajectoryLog(directory))} trajectories from {directory}.")
+
+    if labels is not None:
+        print(f"Applied {index.apply_labels(labels)} reward labels.")
+
+    since = None
+    if args.last_hours is not None:
+        since = (datetime.datetime.utcnow() - datetime.timedelta(hours=args.last_hours)).isoformat()
+    rows = index.query(reward=args.reward, scenario=args.scenario, model=args.model, tool=args.tool,
+                       since=since, limit=args.limit, pending=args.pending)
+    print(f"{len(rows)} of {index.count()} indexed trajectories match.")
+    for row in rows:
+        print(f"{row['id']}  reward={row['reward']}  steps={row['num_steps']}  scenario={row['scenario']}  "
+              f"end={row['end_time']}  tools={row['tools']}")
+    index.close()
@@ -2,19 +2,47 @@ import json
 import logging
 import os
 import datetime
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Iterator, Optional
+
+from online_rl_agent.data.reward_labels import REWARD_LABELED, REWARD_PENDING
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class TrajectoryStore:
-    def __init__(self, save_path: str = 'data/trajectories.json'):
+    # Serializes appends when several stores (one per concurrent episode) share a file.
+    _save_lock = threading.Lock()
+
+    def __init__(self, save_path: str = 'data/trajectories.json', log=None, wal=None, index=None, blobs=None, labels=None):
         """
         Initializes the TrajectoryStore.
 
         Args:
             save_path: The file path where trajectories will be saved.
+            log: Optional shared `SegmentedTrajectoryLog`. When given, finished
+                trajectories go to its compressed segments instead of `save_path`.
+            wal: Optional `TrajectoryWAL`. When given, every step is appended to it
+                as it happens, so a crash mid-episode loses nothing. With a segment
+                log, a WAL is only deleted once the log has fsynced its trajectory.
+            index: Optional `TrajectoryIndex` updated with each trajectory saved to
+                `save_path`. (For a segment log, use `index.attach_log(log)` instead.)
+            blobs: Optional `ObservationBlobStore`. Large observations are stored there
+                once and steps keep only a reference; `iter_saved` rehydrates them.
+            labels: Optional `RewardLabelStore` whose rewards `iter_saved` overlays on
+                trajectories saved as pending.
         """
         self.save_path = save_path
+        self.log = log
+        self.wal = wal
+        self.index = index
+        self.blobs = blobs
+        self.labels = labels
+        if log is not None and wal is not None:
+            wal.commit_when_durable(log)
+        # Steps serialized once in add_step; reused by the WAL and the final save.
+        self._step_json: List[str] = []
+        # Top-level fields set with `annotate`; the WAL records them on `end_trajectory`.
+        self._annotations: Dict[str, Any] = {}
         self.current_trajectory = {
             "id": None,
             "start_time": None,
@@ -31,9 +59,13 @@ class TrajectoryStore:
             os.makedirs(dir_name)
             logging.info(f"Created data directory: {dir_name}")
 
-    def start_new_trajectory(self, trajectory_id: str):
+    def start_new_trajectory(self, trajectory_id: str, metadata: Optional[Dict[str, Any]] = None):
         """
         Resets and starts a new trajectory.
+
+        Args:
+            trajectory_id: Unique id of the trajectory.
+            metadata: Extra top-level fields to record, e.g. the fault scenario and model.
         """
         self.current_trajectory = {
             "id": trajectory_id,
@@ -42,12 +74,27 @@ class TrajectoryStore:
             "steps": [],
             "reward": None
         }
+        if metadata:
+            self.current_trajectory.update(metadata)
+        self._step_json = []
+        self._annotations = {}
+        if self.wal is not None:
+            header = {k: v for k, v in self.current_trajectory.items() if k != "steps"}
+            self.wal.begin(trajectory_id, header)
         logging.info(f"Started new trajectory with ID: {trajectory_id}")
 
-    def add_step(self, thought: str, tool_name: str, tool_args: Dict, tool_output: str):
+    def add_step(self, thought: str, tool_name: str, tool_args: Dict, tool_output: str,
+                 prompt: Optional[List[Dict[str, str]]] = None, metrics: Optional[Dict[str, Any]] = None,
+                 response: Optional[str] = None):
         """
 
         Adds a single step of interaction to the current trajectory.
+
+        Args:
+            prompt: The messages actually sent to the LLM for this step, when they
+                differ from the raw conversation history (e.g. after truncation).
+            metrics: Optional per-step measurements (e.g. LLM latency, time to first token).
+            response: The model's raw response text for this step, before any parsing repairs.
         """
         if not self.current_trajectory["id"]:
             logging.warning("Cannot add step: No trajectory has been started.")
@@ -62,9 +109,22 @@ class TrajectoryStore:
             },
             "observation": tool_output
         }
+        if prompt is not None:
+            step_data["prompt"] = prompt
+        if response is not None:
+            step_data["response"] = response
+        if metrics:
+            step_data["metrics"] = metrics
+        if self.blobs is not None:
+            self.blobs.dehydrate_step(step_data)
         self.current_trajectory["steps"].append(step_data)
-        
-    def add_final_answer(self, final_answer: str):
+        step_json = json.dumps(step_data)
+        self._step_json.append(step_json)
+        if self.wal is not None:
+            self.wal.append_step(self.current_trajectory["id"], step_json)
+
+    def add_final_answer(self, final_answer: str, prompt: Optional[List[Dict[str, str]]] = None,
+                         metrics: Optional[Dict[str, Any]] = None, response: Optional[str] = None):
         """
         Adds the agent's final answer as the last step.
         """
@@ -72,37 +132,146 @@ class TrajectoryStore:
             thought="This is the final step, providing the answer.",
             tool_name="final_answer",
             tool_args={"answer": final_answer},
-            tool_output="" # No observation for the final answer
+            tool_output="", # No observation for the final answer
+            prompt=prompt,
+            metrics=metrics,
+            response=response
         )
 
-    def end_trajectory(self, reward: int):
+    def annotate(self, **fields: Any):
+        """
+        Sets top-level fields of the current trajectory once it is under way,
+        e.g. the agent's stop reason and usage.
+        """
+        if not self.current_trajectory["id"]:
+            logging.warning("Cannot annotate: No trajectory has been started.")
+            return
+        self.current_trajectory.update(fields)
+        self._annotations.update(fields)
+
+    def end_trajectory(self, reward: Optional[int], details: Optional[Dict[str, Any]] = None):
         """
         Adds the final reward and marks the trajectory as complete.
+
+        Args:
+            reward: 1, 0 or -1, or None to save the trajectory with a pending reward
+                that is labeled later through a `RewardLabelStore`.
+            details: Optional explanation of the reward (e.g. the observer's report).
         """
         if not self.current_trajectory["id"]:
             logging.warning("Cannot end trajectory: No trajectory has been started.")
             return
         
         self.current_trajectory["reward"] = reward
+        self.current_trajectory["reward_status"] = REWARD_PENDING if reward is None else REWARD_LABELED
         self.current_trajectory["end_time"] = datetime.datetime.utcnow().isoformat()
-        logging.info(f"Ending trajectory {self.current_trajectory['id']} with reward: {reward}")
+        fields = dict(self._annotations)
+        fields.update({k: self.current_trajectory[k] for k in ("reward", "reward_status", "end_time")})
+        if details is not None:
+            self.current_trajectory["reward_details"] = details
+            fields["reward_details"] = details
+        if self.wal is not None:
+            self.wal.end(self.current_trajectory["id"], fields)
+        if reward is None:
+            logging.info(f"Ending trajectory {self.current_trajectory['id']} with a pending reward")
+        else:
+            logging.info(f"Ending trajectory {self.current_trajectory['id']} with reward: {reward}")
 
 
-    def save_trajectory(self):
+    def _serialize_current(self) -> str:
+        """Builds the JSON line of the current trajectory from the already-serialized steps."""
+        header = {k: v for k, v in self.current_trajectory.items() if k != "steps"}
+        head = json.dumps(header)
+        return head[:-1] + ', "steps": [' + ", ".join(self._step_json) + ']}'
+
+    def save_record(self, trajectory: Dict[str, Any], serialized: Optional[str] = None) -> bool:
         """
-        Saves the completed trajectory to the specified JSON file.
-        Each trajectory is saved as a new line in the JSONL format.
+        Writes one finished trajectory to the segment log or the JSONL file.
+
+        Returns:
+            True if the trajectory was written (or queued to the log).
         """
-        if not self.current_trajectory.get("reward"):
-            logging.warning("Cannot save: Trajectory is not yet complete (reward is missing).")
-            return
-            
+        line = serialized if serialized is not None else json.dumps(trajectory)
+        if self.log is not None:
+            try:
+                self.log.append(trajectory, serialized=line)
+                logging.info(f"Queued trajectory {trajectory['id']} for segment log {self.log.directory}")
+                return True
+            except IOError as e:
+                logging.error(f"Failed to write trajectory to {self.log.directory}: {e}")
+                return False
+
         try:
-            with open(self.save_path, 'a') as f:
-                f.write(json.dumps(self.current_trajectory) + '\n')
+            data = (line + '\n').encode('utf-8')
+            with self._save_lock, open(self.save_path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
             logging.info(f"Successfully saved trajectory to {self.save_path}")
         except IOError as e:
             logging.error(f"Failed to save trajectory to {self.save_path}: {e}")
+            return False
+
+        if self.index is not None:
+            try:
+                self.index.add_jsonl(trajectory, self.save_path, offset, offset + len(data))
+            except Exception as e:  # The record is saved; `sync_jsonl` can index it later.
+                logging.error(f"Failed to index trajectory {trajectory['id']}: {e}")
+        return True
+
+    def save_trajectory(self):
+        """
+        Saves the completed trajectory to the specified JSON file.
+        Each trajectory is saved as a new line in the JSONL format.
+        """
+        if self.current_trajectory.get("end_time") is None:
+            logging.warning("Cannot save: Trajectory is not yet complete (end_trajectory was not called).")
+            return
+
+        if len(self._step_json) != len(self.current_trajectory["steps"]):
+            self._step_json = [json.dumps(step) for step in self.current_trajectory["steps"]]
+        if self.save_record(self.current_trajectory, self._serialize_current()) and self.wal is not None:
+            if self.log is None:
+                self.wal.commit(self.current_trajectory["id"])
+            else:
+                # Only buffered so far; the log's durable listener deletes the WAL.
+                self.wal.abandon(self.current_trajectory["id"])
+
+    def iter_saved(self) -> Iterator[Dict[str, Any]]:
+        """
+        Reads back the saved trajectories (from the segment log if set, else `save_path`)
+        with observations rehydrated from the blob store and later reward labels applied.
+        """
+        if self.log is not None:
+            records = self.log.iter_trajectories()
+        else:
+            records = self._iter_jsonl()
+        for record in records:
+            if self.labels is not None:
+                record = self.labels.apply(record)
+            yield self.blobs.rehydrate(record) if self.blobs is not None else record
+
+    def _iter_jsonl(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.save_path):
+            return
+        with open(self.save_path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def recover_from_wal(self, min_age_seconds: float = 0.0) -> Dict[str, int]:
+        """
+        Finalizes ended trajectories left in the WAL by a crashed run and quarantines
+        the rest. Call once on startup.
+
+        Returns:
+            Counts of finalized and quarantined trajectories.
+        """
+        if self.wal is None:
+            return {"finalized": 0, "quarantined": 0}
+        counts = self.wal.recover(self.save_record, min_age_seconds=min_age_seconds, commit=self.log is None)
+        if self.log is not None:
+            self.log.sync()  # Makes the recovered trajectories durable, which deletes their WALs.
+        return counts
 
 if __name__ == '__main__':
     # Example usage
@@ -0,0 +1,209 @@
+"""
+Write-ahead log for in-flight trajectories.
+
+`TrajectoryStore` only writes a trajectory once the episode has a reward, so a
+crash or a kill mid-episode used to lose every (paid) LLM step. With a WAL,
+each step is appended to a small per-trajectory file as it happens. The file
+is deleted once the trajectory has been durably saved (for a segment log, once
+the batch holding it has been fsynced, see `commit_when_durable`); whatever is left over on
+startup is either finalized into the store (the episode had ended) or moved
+to a quarantine directory for inspection.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, IO, List, Optional
+
+WAL_SUFFIX = ".wal"
+
+
+class TrajectoryWAL:
+    """
+    One append-only JSONL file per in-flight trajectory under `directory`.
+
+    Entries are `{"type": "start", ...}`, `{"type": "step", "step": {...}}` and
+    `{"type": "end", ...}`. Appends are a single buffered write plus flush;
+    fsync is optional since the WAL mainly guards against process crashes.
+    """
+
+    def __init__(self, directory: str = 'data/wal', fsync: bool = False):
+        """
+        Args:
+            directory: Where WAL files live. Quarantined files go to `<directory>/quarantine`.
+            fsync: fsync after every entry (survives power loss, costs a disk flush per step).
+        """
+        self.directory = directory
+        self.quarantine_dir = os.path.join(directory, "quarantine")
+        self.fsync = fsync
+        self._files: Dict[str, IO[str]] = {}
+        self._lock = threading.Lock()
+        self._bound_logs: "weakref.WeakSet" = weakref.WeakSet()  # Not ids: those are reused after GC.
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, trajectory_id: str) -> str:
+        return os.path.join(self.directory, f"{trajectory_id}{WAL_SUFFIX}")
+
+    def _write(self, trajectory_id: str, line: str) -> None:
+        with self._lock:
+            f = self._files.get(trajectory_id)
+            if f is None:
+                f = open(self._path(trajectory_id), "a", encoding="utf-8")
+                self._files[trajectory_id] = f
+        f.write(line + "\n")
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def begin(self, trajectory_id: str, header: Dict[str, Any]) -> None:
+        """Starts the WAL of a trajectory with its top-level fields (id, start_time, ...)."""
+        self._write(trajectory_id, json.dumps({"type": "start", "trajectory": header}))
+
+    def append_step(self, trajectory_id: str, step_json: str) -> None:
+        """Appends one already-serialized step."""
+        self._write(trajectory_id, '{"type": "step", "step": ' + step_json + '}')
+
+    def end(self, trajectory_id: str, fields: Dict[str, Any]) -> None:
+        """Records the end of an episode (reward, end_time, ...)."""
+        self._write(trajectory_id, json.dumps({"type": "end", "fields": fields}))
+
+    def _close(self, trajectory_id: str) -> None:
+        with self._lock:
+            f = self._files.pop(trajectory_id, None)
+        if f is not None:
+            f.close()
+
+    def commit(self, trajectory_id: str) -> None:
+        """Deletes the WAL of a trajectory that has been durably saved."""
+        self._close(trajectory_id)
+        try:
+            os.remove(self._path(trajectory_id))
+        except FileNotFoundError:
+            pass
+
+    def commit_when_durable(self, log) -> None:
+        """
+        Commits trajectories as a `SegmentedTrajectoryLog` makes them durable.
+
+        `log.append` only buffers a trajectory, so its WAL must outlive the append
+        until the batch is written and fsynced. Safe to call more than once per log.
+        """
+        with self._lock:
+            if log in self._bound_logs:
+                return
+            self._bound_logs.add(log)
+        log.add_durable_listener(lambda records: [self.commit(r["id"]) for r in records if r.get("id")])
+
+    def abandon(self, trajectory_id: str) -> None:
+        """Closes the WAL of a trajectory without deleting it, leaving it for recovery."""
+        self._close(trajectory_id)
+
+    @staticmethod
+    def replay(path: str) -> Dict[str, Any]:
+        """
+        Rebuilds a trajectory from a WAL file.
+
+        A torn last line (crash mid-write) is ignored.
+
+        Returns:
+            {"trajectory": dict or None, "ended": bool, "torn": bool}
+        """
+        trajectory: Optional[Dict[str, Any]] = None
+        ended = False
+        torn = False
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if i >= len(lines) - 2:
+                    torn = True
+                    break
+                raise
+            if entry["type"] == "start":
+                trajectory = dict(entry["trajectory"], steps=[])
+            elif entry["type"] == "step" and trajectory is not None:
+                trajectory["steps"].append(entry["step"])
+            elif entry["type"] == "end" and trajectory is not None:
+                trajectory.update(entry["fields"])
+                ended = True
+        return {"trajectory": trajectory, "ended": ended, "torn": torn}
+
+    def pending(self, min_age_seconds: float = 0.0) -> List[str]:
+        """Lists WAL files not modified for `min_age_seconds` (0 lists all)."""
+        now = time.time()
+        paths = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(WAL_SUFFIX) or not os.path.isfile(path):
+                continue
+            if min_age_seconds and now - os.path.getmtime(path) < min_age_seconds:
+                continue
+            paths.append(path)
+        return paths
+
+    def _quarantine(self, path: str, trajectory: Optional[Dict[str, Any]], reason: str) -> None:
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        base = os.path.basename(path)[:-len(WAL_SUFFIX)]
+        if trajectory is not None:
+            trajectory = dict(trajectory, status="incomplete", recovery_reason=reason)
+            with open(os.path.join(self.quarantine_dir, f"{base}.json"), "w", encoding="utf-8") as f:
+                json.dump(trajectory, f)
+            os.remove(path)
+        else:
+            shutil.move(path, os.path.join(self.quarantine_dir, os.path.basename(path)))
+        logging.warning(f"Quarantined trajectory WAL {base}: {reason}")
+
+    def recover(self, save_fn: Callable[[Dict[str, Any]], bool], min_age_seconds: float = 0.0,
+                commit: bool = True) -> Dict[str, int]:
+        """
+        Finalizes or quarantines the WAL files left behind by earlier runs.
+
+        Ended trajectories are passed to `save_fn` and their WAL is deleted once it
+        returns True. Trajectories that never ended, and unreadable files, are moved
+        to the quarantine directory. Call this on startup, before new episodes begin
+        (or use `min_age_seconds` to skip WALs that may still be live).
+
+        Args:
+            save_fn: Saves one recovered trajectory; returns True on success.
+            min_age_seconds: Skip WAL files modified more recently than this.
+            commit: Delete a WAL as soon as `save_fn` succeeds. Pass False when
+                `save_fn` only queues the trajectory (a segment log); the WAL is then
+                deleted once it is durable, see `commit_when_durable`.
+
+        Returns:
+            Counts of finalized and quarantined trajectories.
+        """
+        counts = {"finalized": 0, "quarantined": 0}
+        for path in self.pending(min_age_seconds):
+            try:
+                replayed = self.replay(path)
+            except (OSError, ValueError, KeyError) as e:
+                self._quarantine(path, None, f"unreadable WAL: {e}")
+                counts["quarantined"] += 1
+                continue
+            trajectory = replayed["trajectory"]
+            if trajectory is None:
+                self._quarantine(path, None, "WAL has no start entry")
+                counts["quarantined"] += 1
+            elif replayed["ended"]:
+                if save_fn(trajectory):
+                    if commit:
+                        os.remove(path)
+                    counts["finalized"] += 1
+                    logging.info(f"Recovered trajectory {trajectory.get('id')} from WAL.")
+                else:
+                    self._quarantine(path, trajectory, "ended but could not be saved")
+                    counts["quarantined"] += 1
+            else:
+                self._quarantine(path, trajectory, "episode did not finish")
+                counts["quarantined"] += 1
+        if counts["finalized"] or counts["quarantined"]:
+            logging.info(f"WAL recovery: {counts['finalized']} finalized, {counts['quarantined']} quarantined.")
+        return counts
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict
 
 class BaseEnvironment(ABC):
     """
@@ -33,3 +34,10 @@ class BaseEnvironment(ABC):
         This could involve deleting a fault, restoring state, etc.
         """
         pass
+
+    def get_metadata(self) -> Dict[str, Any]:
+        """
+        Describes the current episode's setup (e.g. the fault scenario) for the
+        trajectory record. Environments without such details return an empty dict.
+        """
+        return {}
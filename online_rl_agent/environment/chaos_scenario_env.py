@@ -0,0 +1,219 @@
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+from .base import BaseEnvironment
+from online_rl_agent.chaos.injector import apply_chaos_manifest, delete_chaos_manifest, inject_batch
+from online_rl_agent.chaos.readiness import FaultInjectionError, fault_target, pod_baseline, wait_for_fault
+from online_rl_agent.chaos.curriculum import CurriculumScheduler
+from online_rl_agent.chaos.scenarios import SCENARIOS, ChaosScenario, get_scenario
+from online_rl_agent.sandbox.snapshot import NamespaceSnapshot
+
+
+class ScenarioChaosEnvironment(BaseEnvironment):
+    """
+    A Kubernetes environment whose fault is drawn from the chaos scenario catalog.
+
+    Each `setup()` picks a scenario (fixed or random), samples its parameters,
+    renders the experiment in memory and creates it through the API. The
+    scenario and parameters are reported by `get_metadata()` so they end up in
+    the trajectory.
+    """
+
+    def __init__(
+        self,
+        scenario: Union[str, ChaosScenario, None] = None,
+        params: Optional[Dict[str, Any]] = None,
+        kubeconfig: str = None,
+        randomize: bool = True,
+        scenarios: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+        readiness_timeout: float = 60.0,
+        reset_state: bool = True,
+        reset_namespaces: Optional[List[str]] = None,
+        reset_timeout: float = 120.0,
+        scheduler: Optional[CurriculumScheduler] = None,
+    ):
+        """
+        Initializes the environment.
+
+        Args:
+            scenario: Scenario name or object. None picks one at random from `scenarios` each episode.
+            params: Fixed parameter overrides applied to every episode.
+            kubeconfig: Optional path to a kubeconfig file.
+            randomize: Sample the parameters not in `params` (otherwise use the scenario defaults).
+            scenarios: Names to choose from when `scenario` is None; defaults to the whole catalog.
+            seed: Seed for scenario and parameter sampling.
+            readiness_timeout: How long `setup` waits for the fault to take effect.
+            reset_state: Snapshot the namespaces before the first episode (unless a
+                `state_snapshot` is set) and restore whatever changed in `cleanup`.
+            reset_namespaces: Namespaces to snapshot; defaults to the namespace of the first fault.
+            reset_timeout: How long `cleanup` may take to restore and verify the snapshot.
+            scheduler: Optional shared curriculum that picks the scenario when `scenario` is None,
+                instead of a uniform draw from `scenarios`.
+        """
+        if isinstance(scenario, str):
+            scenario = get_scenario(scenario)
+        self.scenario = scenario
+        self.params = params or {}
+        self.kubeconfig = kubeconfig
+        self.randomize = randomize
+        self.scenarios = [get_scenario(name) for name in (scenarios or sorted(SCENARIOS))]
+        self._rng = random.Random(seed)
+        self.readiness_timeout = readiness_timeout
+        self.fault_ready_seconds: Optional[float] = None
+        self._baseline: Optional[Dict[str, int]] = None
+        self.current_scenario: Optional[ChaosScenario] = None
+        self.current_params: Dict[str, Any] = {}
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.reset_state = reset_state
+        self.reset_namespaces = reset_namespaces
+        self.reset_timeout = reset_timeout
+        self.state_snapshot: Optional[NamespaceSnapshot] = None
+        self.scheduler = scheduler
+
+    def take_state_snapshot(self) -> NamespaceSnapshot:
+        """
+        Snapshots the namespaces `cleanup` restores: `reset_namespaces`, or those the
+        candidate scenarios target with their default parameters. Call while the cluster
+        is known-good; a runner that reuses the cluster across environments passes the
+        result in as `state_snapshot`. A fault in another namespace extends it in `prepare`.
+        """
+        namespaces = set(self.reset_namespaces or [])
+        if not namespaces:
+            for scenario in [self.scenario] if self.scenario is not None else self.scenarios:
+                fixed = {k: v for k, v in self.params.items() if k in scenario.params}
+                namespaces.add(fault_target(scenario.render(scenario.resolve_params(fixed)))[0])
+        return NamespaceSnapshot.take(sorted(namespaces), kubeconfig=self.kubeconfig)
+
+    def _next_scenario(self) -> ChaosScenario:
+        if self.scenario is not None:
+            return self.scenario
+        if self.scheduler is None:
+            return self._rng.choice(self.scenarios)
+        name = self.scheduler.next_scenario()
+        if name is None:
+            raise FaultInjectionError("Every scenario has used up its curriculum quota.")
+        return get_scenario(name)
+
+    def prepare(self) -> Dict[str, Any]:
+        """
+        Chooses the next scenario and parameters and renders the manifest without applying it.
+
+        Raises:
+            FaultInjectionError: If the curriculum has no scenario left to schedule.
+        """
+        self.current_scenario = None
+        scenario = self._next_scenario()
+        fixed = {k: v for k, v in self.params.items() if k in scenario.params}
+        if self.randomize:
+            params = scenario.sample_params(self._rng, fixed=fixed)
+        else:
+            params = scenario.resolve_params(fixed)
+        self.current_scenario = scenario
+        self.current_params = params
+        self.manifest = scenario.render(params)
+        self.fault_ready_seconds = None
+        if self.reset_state:
+            namespace = fault_target(self.manifest)[0]
+            if self.state_snapshot is None or namespace not in self.state_snapshot.namespaces:
+                namespaces = sorted(set(self.reset_namespaces or []) | {namespace}
+                                    | set(self.state_snapshot.namespaces if self.state_snapshot else []))
+                self.state_snapshot = NamespaceSnapshot.take(namespaces, kubeconfig=self.kubeconfig)
+        try:
+            self._baseline = pod_baseline(self.manifest, kubeconfig=self.kubeconfig)
+        except Exception as e:
+            logging.warning(f"Could not record target pods before injection: {e}")
+            self._baseline = None
+        return self.manifest
+
+    def wait_until_ready(self) -> float:
+        """
+        Blocks until the prepared fault has taken effect.
+
+        Raises:
+            FaultInjectionError: If it does not within `readiness_timeout`.
+        """
+        self.fault_ready_seconds = wait_for_fault(
+            self.manifest, kubeconfig=self.kubeconfig, timeout=self.readiness_timeout, baseline=self._baseline
+        )
+        return self.fault_ready_seconds
+
+    def setup(self):
+        """
+        Injects a freshly sampled fault and waits until it has taken effect.
+
+        Raises:
+            FaultInjectionError: If the experiment could not be created or did not
+                take effect within `readiness_timeout`.
+        """
+        manifest = self.prepare()
+        logging.info(f"Injecting chaos scenario '{self.current_scenario.name}' with {self.current_params}")
+        if not apply_chaos_manifest(manifest, kubeconfig=self.kubeconfig):
+            raise FaultInjectionError(f"Failed to inject chaos scenario '{self.current_scenario.name}'.")
+        self.wait_until_ready()
+
+    @classmethod
+    def setup_many(cls, envs: List["ScenarioChaosEnvironment"], max_workers: int = 16) -> List[bool]:
+        """
+        Injects the next fault of every environment in one parallel batch, e.g. to
+        start an episode on many clusters at once, then waits for all of them to
+        take effect.
+
+        Returns:
+            One flag per environment: True if its fault was applied and confirmed.
+        """
+        targets = [(env.kubeconfig, env.prepare()) for env in envs]
+        applied = inject_batch(targets, max_workers=max_workers)
+
+        def confirm(item) -> bool:
+            env, ok = item
+            if not ok:
+                return False
+            try:
+                env.wait_until_ready()
+                return True
+            except FaultInjectionError as e:
+                logging.error(f"Fault on {env.kubeconfig} did not take effect: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(envs) or 1)) as executor:
+            return list(executor.map(confirm, zip(envs, applied)))
+
+    def get_task(self) -> str:
+        """
+        Returns what the user reports for the current scenario.
+        """
+        scenario = self.current_scenario or self.scenario
+        if scenario is None:
+            return "My service is down, please investigate and find the root cause."
+        return scenario.task
+
+    def get_metadata(self) -> Dict[str, Any]:
+        """
+        Reports the injected scenario, its parameters and the experiment name.
+        """
+        if self.current_scenario is None:
+            return {}
+        return {
+            "scenario": self.current_scenario.name,
+            "scenario_params": dict(self.current_params),
+            "chaos_experiment": self.manifest["metadata"]["name"],
+            "fault_ready_seconds": self.fault_ready_seconds,
+        }
+
+    def cleanup(self):
+        """
+        Deletes the current experiment, then undoes any other change to the
+        snapshotted namespaces.
+
+        Raises:
+            StateResetError: If the namespaces could not be restored and verified.
+        """
+        if self.manifest is None:
+            return
+        logging.info(f"Deleting chaos experiment {self.manifest['metadata']['name']}...")
+        delete_chaos_manifest(self.manifest, kubeconfig=self.kubeconfig)
+        if self.state_snapshot is not None:
+            self.state_snapshot.restore(timeout=self.reset_timeout)
@@ -1,33 +1,75 @@
 import os
 import logging
+import yaml
 from .base import BaseEnvironment
 from online_rl_agent.chaos.injector import apply_chaos_experiment, delete_chaos_experiment
+from online_rl_agent.chaos.readiness import FaultInjectionError, fault_target, pod_baseline, wait_for_fault
+from online_rl_agent.sandbox.snapshot import NamespaceSnapshot
 
 class KubernetesChaosEnvironment(BaseEnvironment):
     """
     A specific implementation of the environment for a Kubernetes cluster
     where faults are injected using Chaos Mesh.
     """
-    def __init__(self, chaos_yaml_path: str, kubeconfig: str = None):
+    def __init__(self, chaos_yaml_path: str, kubeconfig: str = None, readiness_timeout: float = 60.0,
+                 reset_state: bool = True, reset_namespaces: list = None, reset_timeout: float = 120.0):
         """
         Initializes the Kubernetes environment.
 
         Args:
             chaos_yaml_path: The path to the Chaos Mesh experiment YAML.
             kubeconfig: Optional path to a kubeconfig file.
+            readiness_timeout: How long `setup` waits for the fault to take effect.
+            reset_state: Snapshot the namespaces before the first episode (unless a
+                `state_snapshot` is set) and restore whatever changed in `cleanup`.
+            reset_namespaces: Namespaces to snapshot; defaults to the fault's namespace.
+            reset_timeout: How long `cleanup` may take to restore and verify the snapshot.
         """
         self.chaos_yaml_path = chaos_yaml_path
         self.kubeconfig = kubeconfig
+        self.readiness_timeout = readiness_timeout
+        self.fault_ready_seconds = None
+        self.reset_state = reset_state
+        self.reset_namespaces = reset_namespaces
+        self.reset_timeout = reset_timeout
+        self.state_snapshot = None
         if not os.path.exists(self.chaos_yaml_path):
             raise FileNotFoundError(f"Chaos experiment YAML not found at: {self.chaos_yaml_path}")
+        with open(self.chaos_yaml_path) as f:
+            self.manifest = yaml.safe_load(f)
         logging.info(f"KubernetesChaosEnvironment initialized with chaos template: {self.chaos_yaml_path}")
 
+    def take_state_snapshot(self) -> NamespaceSnapshot:
+        """
+        Snapshots the namespaces `cleanup` restores. Call while the cluster is known-good;
+        a runner that reuses the cluster across environments passes the result in as
+        `state_snapshot` instead of letting each environment take its own.
+        """
+        namespaces = self.reset_namespaces or [fault_target(self.manifest)[0]]
+        return NamespaceSnapshot.take(namespaces, kubeconfig=self.kubeconfig)
+
     def setup(self):
         """
-        Applies the chaos experiment to the cluster.
+        Applies the chaos experiment and waits until the fault has taken effect.
+
+        Raises:
+            FaultInjectionError: If the experiment could not be applied or did not
+                take effect within `readiness_timeout`.
         """
         logging.info("Setting up Kubernetes environment by applying chaos experiment...")
-        apply_chaos_experiment(self.chaos_yaml_path, kubeconfig=self.kubeconfig)
+        self.fault_ready_seconds = None
+        if self.reset_state and self.state_snapshot is None:
+            self.state_snapshot = self.take_state_snapshot()
+        try:
+            baseline = pod_baseline(self.manifest, kubeconfig=self.kubeconfig)
+        except Exception as e:
+            logging.warning(f"Could not record target pods before injection: {e}")
+            baseline = None
+        if not apply_chaos_experiment(self.chaos_yaml_path, kubeconfig=self.kubeconfig):
+            raise FaultInjectionError(f"Failed to apply chaos experiment {self.chaos_yaml_path}.")
+        self.fault_ready_seconds = wait_for_fault(
+            self.manifest, kubeconfig=self.kubeconfig, timeout=self.readiness_timeout, baseline=baseline
+        )
 
     def get_task(self) -> str:
         """
@@ -35,9 +77,24 @@ class KubernetesChaosEnvironment(BaseEnvironment):
         """
         return "My service is down, please investigate and find the root cause."
 
+    def get_metadata(self) -> dict:
+        """
+        Names the fault scenario after the chaos template file (e.g. "pod-failure").
+        """
+        return {
+            "scenario": os.path.splitext(os.path.basename(self.chaos_yaml_path))[0],
+            "fault_ready_seconds": self.fault_ready_seconds,
+        }
+
     def cleanup(self):
         """
-        Deletes the chaos experiment from the cluster.
+        Deletes the chaos experiment from the cluster, then undoes any other change
+        to the snapshotted namespaces.
+
+        Raises:
+            StateResetError: If the namespaces could not be restored and verified.
         """
         logging.info("Cleaning up Kubernetes environment by deleting chaos experiment...")
         delete_chaos_experiment(self.chaos_yaml_path, kubeconfig=self.kubeconfig)
+        if self.state_snapshot is not None:
+            self.state_snapshot.restore(timeout=self.reset_timeout)
@@ -0,0 +1,415 @@
+import logging
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from online_rl_agent.agent.agent import DevOpsAgent
+from online_rl_agent.agent.budget import SpendWindow
+from online_rl_agent.chaos.curriculum import CurriculumScheduler
+from online_rl_agent.chaos.readiness import FaultInjectionError
+from online_rl_agent.data.trajectory_store import TrajectoryStore
+from online_rl_agent.environment.base import BaseEnvironment
+from online_rl_agent.sandbox.base import Sandbox
+from online_rl_agent.sandbox.pool import SandboxPool
+from online_rl_agent.user_agent.observer import HealthObserver
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of floats (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class ConcurrentEpisodeRunner:
+    """
+    Runs many episodes at once, one per sandbox.
+
+    Each worker thread owns one sandbox and the environment and agent bound to
+    its kubeconfig, and keeps pulling episodes until the requested number has
+    been started. With a `SandboxPool`, workers instead lease a pre-warmed
+    sandbox per episode, so episode start no longer waits on cluster creation.
+    Environments that reset state share one snapshot per sandbox, so each pooled
+    episode restores the sandbox's known-good state rather than re-snapshotting it.
+    Nothing here waits on a terminal, so the runner can be driven headlessly as
+    long as `reward_fn` does not block; with an `observer_factory` the reward
+    comes from cluster health and no human is involved. With neither, episodes
+    are saved with a pending reward for later batch labeling
+    (`online_rl_agent.user_agent.labeling`).
+    """
+
+    def __init__(
+        self,
+        sandbox_factory: Optional[Callable[[int], Sandbox]],
+        env_factory: Callable[[str], BaseEnvironment],
+        agent_factory: Callable[[str], DevOpsAgent],
+        reward_fn: Optional[Callable[[str], Optional[int]]],
+        concurrency: int = 4,
+        episode_timeout: float = 600.0,
+        fault_settle_seconds: float = 0.0,
+        max_steps: int = 10,
+        save_path: str = 'data/trajectories.jsonl',
+        sandbox_pool: Optional[SandboxPool] = None,
+        lease_timeout: Optional[float] = None,
+        trajectory_log=None,
+        trajectory_wal=None,
+        trajectory_index=None,
+        observation_blobs=None,
+        observer_factory: Optional[Callable[[BaseEnvironment], HealthObserver]] = None,
+        scenario_scheduler: Optional[CurriculumScheduler] = None,
+        spend_window: Optional[SpendWindow] = None,
+    ):
+        """
+        Initializes the runner.
+
+        Args:
+            sandbox_factory: Builds the sandbox for a worker, given the worker index.
+            env_factory: Builds an environment for a sandbox, given its kubeconfig path.
+            agent_factory: Builds an agent for a sandbox, given its kubeconfig path.
+            reward_fn: Maps the agent's final answer to a reward, or None to leave it pending.
+                Called from worker threads. When neither it nor `observer_factory` is given,
+                every episode is saved with a pending reward.
+            concurrency: Maximum number of episodes (and sandboxes) in flight.
+            episode_timeout: Wall-clock budget per episode, in seconds.
+            fault_settle_seconds: Extra time to wait after `env.setup()` has confirmed the fault,
+                e.g. to let symptoms propagate. `setup` itself waits for the fault to take effect.
+            max_steps: Step limit passed to `DevOpsAgent.run`.
+            save_path: The file path where trajectories will be saved.
+            sandbox_pool: Optional started pool to lease sandboxes from instead of `sandbox_factory`.
+            lease_timeout: Maximum time a worker waits for a pool lease.
+            trajectory_log: Optional shared `SegmentedTrajectoryLog` used instead of `save_path`.
+            trajectory_wal: Optional shared `TrajectoryWAL`. Steps are logged as they happen and
+                leftovers from a previous crashed run are recovered when `run` starts.
+            trajectory_index: Optional `TrajectoryIndex` kept up to date with saved trajectories.
+            observation_blobs: Optional shared `ObservationBlobStore` that deduplicates tool observations.
+            observer_factory: Builds a `HealthObserver` for an environment. When given, each
+                episode's reward is computed from workload health instead of `reward_fn`.
+            scenario_scheduler: The `CurriculumScheduler` shared by the environments, if any. Each
+                episode's outcome is reported to it, and no episode is started once its quotas are used up.
+            spend_window: The `SpendWindow` shared by the agents' budgets, if any. While it is
+                spent, workers wait for it to free up before starting another episode.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        if sandbox_factory is None and sandbox_pool is None:
+            raise ValueError("Either sandbox_factory or sandbox_pool must be provided.")
+        self.sandbox_factory = sandbox_factory
+        self.env_factory = env_factory
+        self.agent_factory = agent_factory
+        self.reward_fn = reward_fn
+        self.concurrency = concurrency
+        self.episode_timeout = episode_timeout
+        self.fault_settle_seconds = fault_settle_seconds
+        self.max_steps = max_steps
+        self.save_path = save_path
+        self.sandbox_pool = sandbox_pool
+        self.lease_timeout = lease_timeout
+        self.trajectory_log = trajectory_log
+        self.trajectory_wal = trajectory_wal
+        self.trajectory_index = trajectory_index
+        self.observation_blobs = observation_blobs
+        self.observer_factory = observer_factory
+        self.scenario_scheduler = scenario_scheduler
+        self.spend_window = spend_window
+
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._results: List[Dict[str, Any]] = []
+        self._stop_event = threading.Event()
+        # Known-good state per sandbox, shared by every environment that runs on it.
+        self._snapshots: "weakref.WeakKeyDictionary[Sandbox, Any]" = weakref.WeakKeyDictionary()
+
+    def stop(self):
+        """Asks the workers to stop picking up new episodes."""
+        self._stop_event.set()
+
+    def snapshot_sandbox(self, sandbox: Sandbox) -> None:
+        """
+        Records the known-good state of a freshly started sandbox, if its environments
+        reset to one. Pass it to the `SandboxPool` as `prepare` so it runs once per
+        sandbox at warm-up; pooled episodes on that sandbox then all restore this state
+        instead of whatever the previous episode left behind.
+        """
+        env = self.env_factory(sandbox.get_access_config()['kubeconfig'])
+        if getattr(env, "reset_state", False):
+            snapshot = env.take_state_snapshot()
+            with self._lock:
+                self._snapshots[sandbox] = snapshot
+
+    def _attach_snapshot(self, sandbox: Sandbox, env: BaseEnvironment) -> None:
+        """Hands the sandbox's snapshot to a new environment, taking it on first use."""
+        if not getattr(env, "reset_state", False):
+            return
+        with self._lock:
+            snapshot = self._snapshots.get(sandbox)
+        if snapshot is None:
+            snapshot = env.take_state_snapshot()
+            with self._lock:
+                self._snapshots[sandbox] = snapshot
+        env.state_snapshot = snapshot
+
+    def _claim_episode(self) -> bool:
+        with self._lock:
+            if self._stop_event.is_set() or self._remaining <= 0:
+                return False
+            if self.scenario_scheduler is not None and self.scenario_scheduler.exhausted():
+                logger.info("Every scenario quota is used up; not starting more episodes.")
+                return False
+            self._remaining -= 1
+        return self._wait_for_spend_window()
+
+    def _wait_for_spend_window(self) -> bool:
+        """Blocks while the shared spend window is used up. Returns False if the run is stopped meanwhile."""
+        if self.spend_window is None:
+            return True
+        while True:
+            wait = self.spend_window.seconds_until_available()
+            if wait <= 0:
+                return True
+            logger.info(f"Spend window used up; waiting {wait:.0f}s before starting an episode.")
+            if self._stop_event.wait(wait):
+                return False
+
+    def _run_episode(self, worker_id: int, env: BaseEnvironment, agent: DevOpsAgent) -> Dict[str, Any]:
+        """
+        Runs one episode on an already started sandbox.
+
+        The timeout is cooperative: the settle wait and the agent loop both check
+        the episode deadline, so a timed-out episode still cleans up its fault.
+        """
+        trajectory_id = f"traj_{uuid.uuid4()}"
+        started = time.monotonic()
+        deadline = started + self.episode_timeout
+        result = {
+            "trajectory_id": trajectory_id,
+            "worker_id": worker_id,
+            "status": "ok",
+            "reward": None,
+            "duration": 0.0,
+            "error": None,
+            "scenario": None,
+            "stop_reason": None,
+        }
+        store = TrajectoryStore(save_path=self.save_path, log=self.trajectory_log, wal=self.trajectory_wal,
+                                index=self.trajectory_index, blobs=self.observation_blobs)
+        observer = self.observer_factory(env) if self.observer_factory else None
+        try:
+            if observer is not None:
+                observer.capture_baseline()
+            try:
+                env.setup()  # Returns once the fault is confirmed; no fixed settle time.
+            except FaultInjectionError as e:
+                result["status"] = "injection_failed"
+                result["error"] = str(e)
+                logger.warning(f"[worker {worker_id}] Fault injection failed, skipping the agent: {e}")
+                return result
+            settle = min(self.fault_settle_seconds, max(0.0, deadline - time.monotonic()))
+            if self._stop_event.wait(settle):
+                result["status"] = "cancelled"
+                return result
+            if observer is not None:
+                observer.capture_faulted()
+
+            user_task = env.get_task()
+            metadata = dict(env.get_metadata(), model=getattr(agent, "model", None), task=user_task)
+            result["scenario"] = metadata.get("scenario")
+            store.start_new_trajectory(trajectory_id, metadata)
+            final_answer = agent.run(
+                user_task,
+                max_steps=self.max_steps,
+                trajectory_store=store,
+                deadline=deadline,
+            )
+            result["stop_reason"] = getattr(agent, "stop_reason", None)
+            if time.monotonic() >= deadline:
+                result["status"] = "timeout"
+                logger.warning(f"[worker {worker_id}] Episode {trajectory_id} hit the {self.episode_timeout}s timeout.")
+
+            if observer is not None:
+                reward = observer.evaluate(stop_event=self._stop_event)
+                result["reward_reason"] = observer.last_report.get("reason")
+                store.end_trajectory(reward, details=observer.last_report)
+            else:
+                reward = self.reward_fn(final_answer) if self.reward_fn is not None else None
+                store.end_trajectory(reward)
+            result["reward"] = reward
+            result["reward_pending"] = reward is None
+            store.save_trajectory()
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+            logger.error(f"[worker {worker_id}] Episode {trajectory_id} failed: {e}", exc_info=True)
+        finally:
+            if result["scenario"] is None:  # Failed before the trajectory started.
+                result["scenario"] = env.get_metadata().get("scenario")
+            try:
+                env.cleanup()
+            except Exception as e:
+                # E.g. the namespace could not be reset; a pooled sandbox is then recycled.
+                result["cleanup_failed"] = True
+                logger.error(f"[worker {worker_id}] Environment cleanup failed: {e}", exc_info=True)
+            if self.trajectory_wal is not None:
+                # No-op once saved; otherwise the WAL stays on disk for recovery.
+                self.trajectory_wal.abandon(trajectory_id)
+            result["duration"] = time.monotonic() - started
+        return result
+
+    def _record(self, worker_id: int, result: Dict[str, Any]):
+        with self._lock:
+            self._results.append(result)
+        if self.scenario_scheduler is not None:
+            self.scenario_scheduler.record(result["scenario"], result["reward"],
+                                           completed=result["status"] in ("ok", "timeout"))
+        logger.info(
+            f"[worker {worker_id}] Episode {result['trajectory_id']} finished: "
+            f"status={result['status']} reward={result['reward']} duration={result['duration']:.1f}s"
+        )
+
+    def _worker(self, worker_id: int):
+        if self.sandbox_pool is not None:
+            self._pooled_worker(worker_id)
+            return
+
+        sandbox = self.sandbox_factory(worker_id)
+        agent = None
+        try:
+            sandbox.start()
+            kubeconfig = sandbox.get_access_config()['kubeconfig']
+            env = self.env_factory(kubeconfig)
+            agent = self.agent_factory(kubeconfig)
+            logger.info(f"[worker {worker_id}] Sandbox ready. Kubeconfig: {kubeconfig}")
+
+            while self._claim_episode():
+                self._record(worker_id, self._run_episode(worker_id, env, agent))
+        except Exception as e:
+            logger.error(f"[worker {worker_id}] Sandbox failed, worker exiting: {e}", exc_info=True)
+        finally:
+            if agent is not None:
+                agent.close()
+            try:
+                sandbox.stop()
+            except Exception as e:
+                logger.error(f"[worker {worker_id}] Sandbox teardown failed: {e}", exc_info=True)
+
+    def _pooled_worker(self, worker_id: int):
+        while self._claim_episode():
+            try:
+                sandbox = self.sandbox_pool.lease(timeout=self.lease_timeout)
+            except TimeoutError as e:
+                logger.error(f"[worker {worker_id}] {e} Worker exiting.")
+                return
+            healthy = True
+            agent = None
+            try:
+                kubeconfig = sandbox.get_access_config()['kubeconfig']
+                env = self.env_factory(kubeconfig)
+                self._attach_snapshot(sandbox, env)
+                agent = self.agent_factory(kubeconfig)
+                result = self._run_episode(worker_id, env, agent)
+                if getattr(env, "state_snapshot", None) is not None:
+                    with self._lock:  # Keep it if the environment widened it to a new namespace.
+                        self._snapshots[sandbox] = env.state_snapshot
+                healthy = result["status"] != "error" and not result.get("cleanup_failed")
+                self._record(worker_id, result)
+            except Exception as e:
+                healthy = False
+                logger.error(f"[worker {worker_id}] Failed to prepare episode on leased sandbox: {e}", exc_info=True)
+            finally:
+                if agent is not None:
+                    agent.close()  # One agent per pooled episode: do not leak its tool threads.
+                self.sandbox_pool.release(sandbox, healthy=healthy)
+
+    def run(self, num_episodes: int) -> Dict[str, Any]:
+        """
+        Runs `num_episodes` episodes with at most `concurrency` in flight.
+
+        Returns:
+            The throughput report (see `build_report`).
+        """
+        if self.trajectory_wal is not None:
+            TrajectoryStore(
+                save_path=self.save_path, log=self.trajectory_log, wal=self.trajectory_wal,
+                index=self.trajectory_index, blobs=self.observation_blobs
+            ).recover_from_wal()
+        self._remaining = num_episodes
+        self._results = []
+        self._stop_event.clear()
+        workers = min(self.concurrency, num_episodes)
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="episode-worker") as executor:
+            futures = [executor.submit(self._worker, i) for i in range(workers)]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                logger.warning("Interrupted. Waiting for in-flight episodes to clean up...")
+                self.stop()
+                raise
+
+        if self.trajectory_log is not None:
+            self.trajectory_log.sync()  # Also deletes the WALs of the last batch.
+        report = self.build_report(self._results, time.monotonic() - started)
+        self.log_report(report)
+        return report
+
+    @staticmethod
+    def build_report(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+        """
+        Aggregates episode results into a throughput report.
+
+        Args:
+            results: Per-episode result dicts produced by the workers.
+            wall_seconds: Wall-clock time of the whole run.
+
+        Returns:
+            A dict with counts per status, episodes/hour and duration percentiles.
+        """
+        durations = [r["duration"] for r in results]
+        status_counts: Dict[str, int] = {}
+        for r in results:
+            status_counts[r["status"]] = status_counts.get(r["status"], 0) + 1
+        rewards = [r["reward"] for r in results if r["reward"] is not None]
+        pending = sum(1 for r in results if r.get("reward_pending"))
+        stop_reasons: Dict[str, int] = {}
+        for r in results:
+            if r.get("stop_reason"):
+                stop_reasons[r["stop_reason"]] = stop_reasons.get(r["stop_reason"], 0) + 1
+        hours = wall_seconds / 3600.0
+        return {
+            "episodes": len(results),
+            "status_counts": status_counts,
+            "wall_seconds": wall_seconds,
+            "episodes_per_hour": len(results) / hours if hours > 0 else 0.0,
+            "mean_reward": sum(rewards) / len(rewards) if rewards else None,
+            "pending_rewards": pending,
+            "stop_reasons": stop_reasons,
+            "duration_p50": _percentile(durations, 50),
+            "duration_p90": _percentile(durations, 90),
+            "duration_max": max(durations) if durations else 0.0,
+            "results": results,
+        }
+
+    @staticmethod
+    def log_report(report: Dict[str, Any]):
+        logger.info("--- Throughput Report ---")
+        logger.info(f"Episodes: {report['episodes']} {report['status_counts']}")
+        logger.info(f"Wall time: {report['wall_seconds']:.1f}s, throughput: {report['episodes_per_hour']:.1f} episodes/hour")
+        logger.info(
+            f"Episode duration p50={report['duration_p50']:.1f}s "
+            f"p90={report['duration_p90']:.1f}s max={report['duration_max']:.1f}s"
+        )
+        if report['stop_reasons']:
+            logger.info(f"Agent stop reasons: {report['stop_reasons']}")
+        if report['mean_reward'] is not None:
+            logger.info(f"Mean reward: {report['mean_reward']:.3f}")
+        if report['pending_rewards']:
+            logger.info(f"{report['pending_rewards']} episodes saved with a pending reward; label them with "
+                        f"`python -m online_rl_agent.user_agent.labeling`.")
@@ -0,0 +1,143 @@
+import json
+import threading
+
+from online_rl_agent.chaos.readiness import FaultInjectionError
+from online_rl_agent.environment.base import BaseEnvironment
+from online_rl_agent.runner.concurrent_runner import ConcurrentEpisodeRunner
+from online_rl_agent.sandbox.base import Sandbox
+from online_rl_agent.sandbox.pool import SandboxPool
+
+
+class FakeSandbox(Sandbox):
+    def __init__(self, worker_id):
+        self.kubeconfig = f"/tmp/kubeconfig-{worker_id}"
+        self.started = self.stopped = False
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.stopped = True
+
+    def get_access_config(self):
+        return {"kubeconfig": self.kubeconfig}
+
+
+class FakeEnv(BaseEnvironment):
+    """Fails fault injection on every `fail_every`-th setup across all workers."""
+    lock = threading.Lock()
+    setups = 0
+
+    def __init__(self, fail_every=0):
+        self.fail_every = fail_every
+        self.cleanups = 0
+
+    def setup(self):
+        with FakeEnv.lock:
+            FakeEnv.setups += 1
+            failed = self.fail_every and FakeEnv.setups % self.fail_every == 0
+        if failed:
+            raise FaultInjectionError("no target pods")
+
+    def get_task(self):
+        return "Checkout is failing."
+
+    def cleanup(self):
+        self.cleanups += 1
+
+    def get_metadata(self):
+        return {"scenario": "pod-kill"}
+
+
+class FakeAgent:
+    model = "fake"
+    stop_reason = None
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+    def run(self, task, max_steps=10, trajectory_store=None, deadline=None):
+        trajectory_store.add_final_answer("restart the cart pod")
+        self.stop_reason = "final_answer"
+        return "restart the cart pod"
+
+
+def _runner(tmp_path, sandboxes, envs, fail_every=0, concurrency=3, agents=None):
+    def sandbox_factory(worker_id):
+        sandboxes.append(FakeSandbox(worker_id))
+        return sandboxes[-1]
+
+    def env_factory(kubeconfig):
+        envs.append(FakeEnv(fail_every))
+        return envs[-1]
+
+    def agent_factory(kubeconfig):
+        agent = FakeAgent()
+        if agents is not None:
+            agents.append(agent)
+        return agent
+
+    return ConcurrentEpisodeRunner(sandbox_factory, env_factory, agent_factory,
+                                   reward_fn=lambda answer: 1, concurrency=concurrency,
+                                   save_path=str(tmp_path / "trajectories.jsonl"))
+
+
+def test_runs_every_episode_and_stops_every_sandbox(tmp_path):
+    FakeEnv.setups = 0
+    sandboxes, envs, agents = [], [], []
+    report = _runner(tmp_path, sandboxes, envs, agents=agents).run(7)
+    assert report["episodes"] == 7 and report["status_counts"] == {"ok": 7}
+    assert report["mean_reward"] == 1 and report["stop_reasons"] == {"final_answer": 7}
+    assert len(sandboxes) == 3 and all(s.started and s.stopped for s in sandboxes)
+    assert sum(env.cleanups for env in envs) == 7
+    assert len(agents) == 3 and all(agent.closed for agent in agents)
+    with open(tmp_path / "trajectories.jsonl") as f:
+        saved = [json.loads(line) for line in f]
+    assert len({t["id"] for t in saved}) == 7
+
+
+def test_failed_injection_skips_the_agent_but_cleans_up(tmp_path):
+    FakeEnv.setups = 0
+    sandboxes, envs = [], []
+    report = _runner(tmp_path, sandboxes, envs, fail_every=2, concurrency=1).run(4)
+    assert report["status_counts"] == {"ok": 2, "injection_failed": 2}
+    assert envs[0].cleanups == 4
+    with open(tmp_path / "trajectories.jsonl") as f:
+        assert len(f.readlines()) == 2
+
+
+class ResettingEnv(FakeEnv):
+    reset_state = True
+
+    def __init__(self, sandbox_states):
+        super().__init__()
+        self.kubeconfig = None
+        self.state_snapshot = None
+        self.sandbox_states = sandbox_states
+
+    def take_state_snapshot(self):
+        return self.sandbox_states[self.kubeconfig].pop(0)  # What the sandbox looks like right now.
+
+
+def test_pooled_episodes_share_the_snapshot_taken_at_warm_up(tmp_path):
+    # Each sandbox is "dirtier" every time it is looked at; only the first look is known-good.
+    states = {f"/tmp/kubeconfig-{i}": [f"clean-{i}", f"dirty-{i}"] for i in range(2)}
+    envs = []
+
+    def env_factory(kubeconfig):
+        envs.append(ResettingEnv(states))
+        envs[-1].kubeconfig = kubeconfig
+        return envs[-1]
+
+    pool = SandboxPool(FakeSandbox, size=2, prepare=lambda sandbox: runner.snapshot_sandbox(sandbox))
+    runner = ConcurrentEpisodeRunner(None, env_factory, lambda kubeconfig: FakeAgent(), reward_fn=lambda a: 1,
+                                     concurrency=2, save_path=str(tmp_path / "t.jsonl"), sandbox_pool=pool)
+    pool.start(wait=True)
+    try:
+        assert runner.run(6)["status_counts"] == {"ok": 6}
+    finally:
+        pool.stop()
+    episode_envs = envs[2:]  # The first two only took the warm-up snapshots.
+    assert len(episode_envs) == 6
+    assert all(env.state_snapshot == f"clean-{env.kubeconfig[-1]}" for env in episode_envs)
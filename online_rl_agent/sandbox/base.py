@@ -24,6 +24,13 @@ class Sandbox(ABC):
         """
         pass
 
+    def is_healthy(self) -> bool:
+        """
+        Returns True if the sandbox is usable for another episode.
+        Implementations should keep this cheap; pools call it frequently.
+        """
+        return True
+
 
 
 
@@ -4,6 +4,8 @@ import logging
 import time
 from typing import Dict, Any, Optional
 from .base import Sandbox
+from online_rl_agent.tools.informer_cache import stop_informer_cache
+from online_rl_agent.tools.k8s_api_tools import close_api_client
 
 class KindSandbox(Sandbox):
     def __init__(self, cluster_name: str = "kind-sandbox", kubeconfig_path: Optional[str] = None):
@@ -77,6 +79,9 @@ class KindSandbox(Sandbox):
 
     def stop(self) -> None:
         self.logger.info(f"Stopping Kind cluster '{self.cluster_name}'...")
+        # Watches on a deleted cluster would retry forever; the next cluster may reuse the path.
+        stop_informer_cache(self.kubeconfig_path)
+        close_api_client(self.kubeconfig_path)
         try:
             subprocess.run(["kind", "delete", "cluster", "--name", self.cluster_name], check=True)
             # Clean up kubeconfig file
@@ -87,6 +92,19 @@ class KindSandbox(Sandbox):
             self.logger.error(f"Failed to delete cluster: {e}")
             raise
 
+    def is_healthy(self) -> bool:
+        """Returns True if the API server answers and every node reports Ready."""
+        try:
+            result = subprocess.run(
+                ["kubectl", "--kubeconfig", self.kubeconfig_path, "get", "nodes", "--no-headers"],
+                check=True, capture_output=True, text=True, timeout=10
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError) as e:
+            self.logger.warning(f"Health check failed for cluster '{self.cluster_name}': {e}")
+            return False
+        nodes = [line.split() for line in result.stdout.splitlines() if line.strip()]
+        return bool(nodes) and all(len(fields) > 1 and fields[1] == "Ready" for fields in nodes)
+
     def get_access_config(self) -> Dict[str, Any]:
         return {
             "type": "k8s",
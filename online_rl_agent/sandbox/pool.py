@@ -0,0 +1,293 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+from .base import Sandbox
+
+
+class SandboxPool:
+    """
+    Keeps a fixed number of started sandboxes ready ahead of demand.
+
+    Sandboxes are created in parallel by `sandbox_factory`, handed out with
+    `lease()` and returned with `release()`. A background thread health-checks
+    idle sandboxes, recycles broken or worn-out ones and tops the pool back up,
+    so callers never wait on cluster creation unless the pool is exhausted.
+    """
+
+    def __init__(
+        self,
+        sandbox_factory: Callable[[int], Sandbox],
+        size: int,
+        creation_parallelism: Optional[int] = None,
+        health_check_interval: float = 30.0,
+        max_leases_per_sandbox: int = 0,
+        check_on_lease: bool = True,
+        prepare: Optional[Callable[[Sandbox], None]] = None,
+    ):
+        """
+        Initializes the pool. No sandbox is created until `start()`.
+
+        Args:
+            sandbox_factory: Builds a new (not yet started) sandbox from a unique index.
+            size: Number of sandboxes the pool keeps, leased or idle.
+            creation_parallelism: How many sandboxes may be created at once. Defaults to `size`.
+            health_check_interval: Seconds between background health checks of idle sandboxes.
+            max_leases_per_sandbox: Recycle a sandbox after this many leases (0 means never).
+            check_on_lease: Health-check a sandbox before handing it out.
+            prepare: Called once with each newly started sandbox before it is first leased,
+                e.g. to record its known-good state. If it raises, the sandbox counts as
+                failed to create.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.sandbox_factory = sandbox_factory
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.max_leases_per_sandbox = max_leases_per_sandbox
+        self.check_on_lease = check_on_lease
+        self.prepare = prepare
+        self.logger = logging.getLogger(__name__)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=creation_parallelism or size, thread_name_prefix="sandbox-create"
+        )
+        self._idle: "queue.Queue[Sandbox]" = queue.Queue()
+        self._leased: Set[int] = set()
+        self._lease_counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._next_index = 0
+        self._members = 0  # idle + leased + being created
+        self._stop_event = threading.Event()
+        self._maintainer: Optional[threading.Thread] = None
+        self._stats = {"created": 0, "create_failures": 0, "recycled": 0, "leases": 0, "create_seconds": 0.0}
+
+    # --- Lifecycle ---
+
+    def start(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Starts filling the pool and the background maintainer.
+
+        Args:
+            wait: Block until every sandbox has been created (or failed).
+            timeout: Maximum time to wait when `wait` is True.
+        """
+        self._stop_event.clear()
+        futures = self._top_up()
+        self._maintainer = threading.Thread(target=self._maintain, name="sandbox-pool-maintainer", daemon=True)
+        self._maintainer.start()
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for future in futures:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                future.result(timeout=remaining)
+
+    def stop(self) -> None:
+        """Stops the maintainer and tears down every sandbox the pool still owns."""
+        self._stop_event.set()
+        if self._maintainer:
+            self._maintainer.join()
+        self._executor.shutdown(wait=True)
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        with ThreadPoolExecutor(max_workers=max(1, len(idle))) as teardown:
+            list(teardown.map(self._destroy, idle))
+        if self._leased:
+            self.logger.warning(f"{len(self._leased)} sandbox(es) still leased at shutdown; the caller must stop them.")
+
+    def __enter__(self) -> "SandboxPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # --- Lease API ---
+
+    def lease(self, timeout: Optional[float] = None) -> Sandbox:
+        """
+        Takes a ready sandbox out of the pool.
+
+        Args:
+            timeout: Maximum time to wait for a sandbox to become available.
+
+        Returns:
+            A started sandbox. It must be handed back with `release()`.
+
+        Raises:
+            TimeoutError: If no healthy sandbox became available in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("Timed out waiting for a sandbox lease.")
+            try:
+                sandbox = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError("Timed out waiting for a sandbox lease.")
+
+            if self.check_on_lease and not sandbox.is_healthy():
+                self._recycle(sandbox)
+                continue
+
+            with self._lock:
+                self._leased.add(id(sandbox))
+                self._lease_counts[id(sandbox)] = self._lease_counts.get(id(sandbox), 0) + 1
+                self._stats["leases"] += 1
+            return sandbox
+
+    def release(self, sandbox: Sandbox, healthy: bool = True) -> None:
+        """
+        Returns a leased sandbox to the pool.
+
+        Args:
+            sandbox: The sandbox obtained from `lease()`.
+            healthy: Pass False if the episode left the sandbox broken; it is then recycled.
+        """
+        with self._lock:
+            if id(sandbox) not in self._leased:
+                raise ValueError("Sandbox was not leased from this pool.")
+            self._leased.discard(id(sandbox))
+            worn_out = (
+                self.max_leases_per_sandbox > 0
+                and self._lease_counts.get(id(sandbox), 0) >= self.max_leases_per_sandbox
+            )
+        if not healthy or worn_out or self._stop_event.is_set():
+            self._recycle(sandbox)
+        else:
+            self._idle.put(sandbox)
+
+    @contextmanager
+    def leased(self, timeout: Optional[float] = None) -> Iterator[Sandbox]:
+        """Context manager around `lease()`/`release()`; an exception marks the sandbox unhealthy."""
+        sandbox = self.lease(timeout=timeout)
+        healthy = True
+        try:
+            yield sandbox
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self.release(sandbox, healthy=healthy)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns pool counters (creations, recycles, leases, mean creation time) and current occupancy."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["leased"] = len(self._leased)
+            stats["members"] = self._members
+        stats["idle"] = self._idle.qsize()
+        stats["mean_create_seconds"] = stats["create_seconds"] / stats["created"] if stats["created"] else 0.0
+        return stats
+
+    # --- Internals ---
+
+    def _top_up(self) -> list:
+        """Schedules creation of enough sandboxes to bring the pool back to `size`."""
+        futures = []
+        with self._lock:
+            missing = self.size - self._members
+            self._members += max(0, missing)
+            indexes = list(range(self._next_index, self._next_index + max(0, missing)))
+            self._next_index += max(0, missing)
+        for index in indexes:
+            try:
+                futures.append(self._executor.submit(self._create, index))
+            except RuntimeError:
+                # The pool is shutting down; the executor no longer accepts work.
+                with self._lock:
+                    self._members -= 1
+        return futures
+
+    def _create(self, index: int) -> None:
+        started = time.monotonic()
+        sandbox = self.sandbox_factory(index)
+        try:
+            sandbox.start()
+            if self.prepare is not None:
+                self.prepare(sandbox)
+        except Exception as e:
+            self.logger.error(f"Failed to create sandbox #{index}: {e}", exc_info=True)
+            with self._lock:
+                self._members -= 1
+                self._stats["create_failures"] += 1
+            # Best effort: do not leak a half-created cluster.
+            self._safe_stop(sandbox)
+            return
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._stats["created"] += 1
+            self._stats["create_seconds"] += elapsed
+        self.logger.info(f"Sandbox #{index} ready in {elapsed:.1f}s.")
+        if self._stop_event.is_set():
+            self._destroy(sandbox)
+        else:
+            self._idle.put(sandbox)
+
+    def _destroy(self, sandbox: Sandbox) -> None:
+        self._safe_stop(sandbox)
+        with self._lock:
+            self._members -= 1
+            self._lease_counts.pop(id(sandbox), None)
+
+    def _safe_stop(self, sandbox: Sandbox) -> None:
+        try:
+            sandbox.stop()
+        except Exception as e:
+            self.logger.error(f"Failed to stop sandbox: {e}", exc_info=True)
+
+    def _recycle(self, sandbox: Sandbox) -> None:
+        """Tears a sandbox down in the background and schedules a replacement."""
+        with self._lock:
+            self._stats["recycled"] += 1
+        self.logger.info("Recycling sandbox.")
+        if self._stop_event.is_set():
+            self._destroy(sandbox)
+            return
+
+        def replace():
+            self._destroy(sandbox)
+            if not self._stop_event.is_set():
+                self._top_up()
+
+        try:
+            self._executor.submit(replace)
+        except RuntimeError:
+            self._destroy(sandbox)
+
+    def _maintain(self) -> None:
+        """Periodically health-checks idle sandboxes and refills the pool."""
+        while not self._stop_event.wait(self.health_check_interval):
+            self._check_idle()
+            if not self._stop_event.is_set():
+                self._top_up()
+
+    def _check_idle(self) -> None:
+        """
+        Health-checks the idle sandboxes one at a time, so the others stay
+        leasable while a (slow) check runs.
+        """
+        checked: Set[int] = set()
+        while not self._stop_event.is_set():
+            try:
+                sandbox = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if id(sandbox) in checked:
+                # Every idle sandbox has been checked once.
+                self._idle.put(sandbox)
+                return
+            checked.add(id(sandbox))
+            if self._stop_event.is_set() or sandbox.is_healthy():
+                self._idle.put(sandbox)
+            else:
+                self._recycle(sandbox)
@@ -0,0 +1,302 @@
+"""
+Namespace snapshots and diff-based reset between episodes.
+
+Deleting the chaos experiment undoes the fault, but not what the agent (or
+the fault) changed along the way: a scaled-down Deployment, an edited
+ConfigMap, a deleted Service. Recreating the cluster undoes everything but
+takes minutes. A `NamespaceSnapshot` records the user-managed resources of
+a few namespaces once, while the cluster is in its known-good state; after
+each episode `restore()` lists the same resources, recreates what is missing,
+deletes what was added, replaces what changed, and verifies that the
+namespaces match the snapshot again and that workloads are ready. An episode
+that touched nothing costs one list call per resource kind.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from kubernetes import client as k8s_client
+from kubernetes.client.rest import ApiException
+
+from online_rl_agent.tools.k8s_api_tools import REQUEST_TIMEOUT, get_api_client
+
+# Kind -> (API class, method suffix). Controller-owned objects (ReplicaSets,
+# their Pods, Endpoints) are left to their controllers.
+RESOURCE_KINDS: Dict[str, Tuple[type, str]] = {
+    "Deployment": (k8s_client.AppsV1Api, "deployment"),
+    "StatefulSet": (k8s_client.AppsV1Api, "stateful_set"),
+    "DaemonSet": (k8s_client.AppsV1Api, "daemon_set"),
+    "Service": (k8s_client.CoreV1Api, "service"),
+    "ConfigMap": (k8s_client.CoreV1Api, "config_map"),
+    "Secret": (k8s_client.CoreV1Api, "secret"),
+    "ServiceAccount": (k8s_client.CoreV1Api, "service_account"),
+    "Pod": (k8s_client.CoreV1Api, "pod"),
+}
+
+# Metadata the API server maintains; it differs between otherwise identical objects.
+_SERVER_METADATA = ("uid", "resourceVersion", "generation", "creationTimestamp", "managedFields",
+                    "selfLink", "deletionTimestamp", "deletionGracePeriodSeconds")
+_SERVER_ANNOTATIONS = ("deployment.kubernetes.io/revision",)
+
+Key = Tuple[str, str, str]  # (kind, namespace, name)
+
+
+class StateResetError(RuntimeError):
+    """Raised when a namespace could not be brought back to its snapshot."""
+
+
+def _managed(kind: str, obj: Dict[str, Any]) -> bool:
+    """False for objects created and owned by the cluster itself."""
+    metadata = obj.get("metadata") or {}
+    if metadata.get("ownerReferences"):
+        return False
+    if kind == "ConfigMap" and metadata.get("name") == "kube-root-ca.crt":
+        return False
+    if kind == "Secret" and obj.get("type") == "kubernetes.io/service-account-token":
+        return False
+    return True
+
+
+def _normalize(kind: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strips status, server-maintained metadata and fields allocated on creation
+    (Service IPs and node ports, a Pod's node), so that snapshots compare by
+    desired state and a recreated object matches its snapshot.
+    """
+    obj = dict(obj)
+    obj.pop("status", None)
+    metadata = {k: v for k, v in (obj.get("metadata") or {}).items() if k not in _SERVER_METADATA}
+    annotations = {k: v for k, v in (metadata.get("annotations") or {}).items() if k not in _SERVER_ANNOTATIONS}
+    if annotations:
+        metadata["annotations"] = annotations
+    else:
+        metadata.pop("annotations", None)
+    obj["metadata"] = metadata
+    spec = dict(obj.get("spec") or {})
+    if kind == "Service":
+        if spec.get("clusterIP") != "None":  # Keep headless Services headless.
+            spec.pop("clusterIP", None)
+            spec.pop("clusterIPs", None)
+        spec.pop("healthCheckNodePort", None)
+        spec["ports"] = [{k: v for k, v in port.items() if k != "nodePort"} for port in spec.get("ports") or []]
+        obj["spec"] = spec
+    elif kind == "Pod":
+        spec.pop("nodeName", None)
+        obj["spec"] = spec
+    return obj
+
+
+class NamespaceSnapshot:
+    """
+    Desired state of the user-managed resources in a set of namespaces.
+
+    Take it with `NamespaceSnapshot.take(...)` before the first episode and
+    call `restore()` after every episode.
+    """
+
+    def __init__(self, resources: Dict[Key, Dict[str, Any]], namespaces: List[str],
+                 kubeconfig: Optional[str] = None, kinds: Optional[List[str]] = None):
+        """
+        Args:
+            resources: Normalized objects by (kind, namespace, name).
+            namespaces: Namespaces the snapshot covers.
+            kubeconfig: Optional path to a kubeconfig file.
+            kinds: Resource kinds covered; defaults to all of `RESOURCE_KINDS`.
+        """
+        self.resources = resources
+        self.namespaces = list(namespaces)
+        self.kubeconfig = kubeconfig
+        self.kinds = list(kinds or RESOURCE_KINDS)
+        self.last_report: Dict[str, Any] = {}
+
+    # --- Capture ---
+
+    @staticmethod
+    def _list(namespaces: List[str], kubeconfig: Optional[str], kinds: List[str]) -> Dict[Key, Dict[str, Any]]:
+        api_client = get_api_client(kubeconfig)
+        resources: Dict[Key, Dict[str, Any]] = {}
+        for kind in kinds:
+            api_class, suffix = RESOURCE_KINDS[kind]
+            list_fn = getattr(api_class(api_client), f"list_namespaced_{suffix}")
+            for namespace in namespaces:
+                for item in list_fn(namespace, _request_timeout=REQUEST_TIMEOUT).items:
+                    obj = api_client.sanitize_for_serialization(item)
+                    # Items of a list response carry neither apiVersion nor kind.
+                    obj.setdefault("apiVersion", "apps/v1" if api_class is k8s_client.AppsV1Api else "v1")
+                    obj.setdefault("kind", kind)
+                    if _managed(kind, obj):
+                        resources[(kind, namespace, obj["metadata"]["name"])] = _normalize(kind, obj)
+        return resources
+
+    @classmethod
+    def take(cls, namespaces: List[str], kubeconfig: Optional[str] = None,
+             kinds: Optional[List[str]] = None) -> "NamespaceSnapshot":
+        """Lists the namespaces' resources and returns them as a snapshot."""
+        started = time.monotonic()
+        kinds = list(kinds or RESOURCE_KINDS)
+        resources = cls._list(namespaces, kubeconfig, kinds)
+        logging.info(f"Snapshotted {len(resources)} resources in {namespaces} "
+                     f"in {time.monotonic() - started:.2f}s.")
+        return cls(resources, namespaces, kubeconfig=kubeconfig, kinds=kinds)
+
+    # --- Diff ---
+
+    def diff(self, current: Optional[Dict[Key, Dict[str, Any]]] = None) -> Dict[str, List[Key]]:
+        """
+        Compares the cluster (or `current`) with the snapshot.
+
+        Returns:
+            {"missing": [...], "added": [...], "changed": [...]} resource keys.
+        """
+        if current is None:
+            current = self._list(self.namespaces, self.kubeconfig, self.kinds)
+        return {
+            "missing": sorted(set(self.resources) - set(current)),
+            "added": sorted(set(current) - set(self.resources)),
+            "changed": sorted(key for key in set(self.resources) & set(current)
+                              if self.resources[key] != current[key]),
+        }
+
+    # --- Restore ---
+
+    def _call(self, action: str, kind: str, *args, **kwargs):
+        api_class, suffix = RESOURCE_KINDS[kind]
+        return getattr(api_class(get_api_client(self.kubeconfig)), f"{action}_namespaced_{suffix}")(
+            *args, _request_timeout=REQUEST_TIMEOUT, **kwargs)
+
+    def _delete(self, key: Key) -> None:
+        kind, namespace, name = key
+        try:
+            self._call("delete", kind, name, namespace, propagation_policy="Background", grace_period_seconds=0)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+    def _create(self, key: Key) -> None:
+        kind, namespace, _ = key
+        self._call("create", kind, namespace, self.resources[key])
+
+    def _replace(self, key: Key) -> None:
+        kind, namespace, name = key
+        if kind == "Pod":  # Pod specs are mostly immutable.
+            self._delete(key)
+            self._wait_gone(key)
+            self._create(key)
+            return
+        live = self._call("read", kind, name, namespace)
+        body = dict(self.resources[key])
+        # Unset Service IPs and node ports are kept from the live object by the API server.
+        body["metadata"] = dict(body["metadata"], resourceVersion=live.metadata.resource_version)
+        try:
+            self._call("replace", kind, name, namespace, body)
+        except ApiException as e:
+            if e.status != 422:  # Immutable field changed (e.g. a selector): recreate instead.
+                raise
+            self._delete(key)
+            self._wait_gone(key)
+            self._create(key)
+
+    def _wait_gone(self, key: Key, timeout: float = 30.0) -> None:
+        kind, namespace, name = key
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                self._call("read", kind, name, namespace)
+            except ApiException as e:
+                if e.status == 404:
+                    return
+                raise
+            time.sleep(0.5)
+        raise StateResetError(f"{kind} {namespace}/{name} was not deleted within {timeout}s.")
+
+    def _workloads_ready(self) -> List[str]:
+        """Names of snapshotted workloads that are not rolled out and ready yet."""
+        apps = k8s_client.AppsV1Api(get_api_client(self.kubeconfig))
+        waiting = []
+        for kind, namespace, name in self.resources:
+            if kind == "Deployment":
+                status = apps.read_namespaced_deployment_status(name, namespace, _request_timeout=REQUEST_TIMEOUT)
+                want = status.spec.replicas if status.spec.replicas is not None else 1
+                s = status.status
+                if ((s.observed_generation or 0) < (status.metadata.generation or 0)
+                        or (s.updated_replicas or 0) < want or (s.ready_replicas or 0) < want
+                        or (s.replicas or 0) > want):
+                    waiting.append(f"{kind}/{namespace}/{name}")
+            elif kind == "StatefulSet":
+                status = apps.read_namespaced_stateful_set_status(name, namespace, _request_timeout=REQUEST_TIMEOUT)
+                want = status.spec.replicas if status.spec.replicas is not None else 1
+                if (status.status.ready_replicas or 0) < want:
+                    waiting.append(f"{kind}/{namespace}/{name}")
+        return waiting
+
+    def restore(self, timeout: float = 120.0, wait_ready: bool = True) -> Dict[str, Any]:
+        """
+        Brings the namespaces back to the snapshot by undoing only what differs.
+
+        Args:
+            timeout: Budget for restoring and for workloads to become ready again.
+            wait_ready: Also wait for snapshotted Deployments/StatefulSets to be rolled out and ready.
+
+        Returns:
+            Report with the restored keys per category, the seconds taken and `verified`.
+
+        Raises:
+            StateResetError: If the namespaces still differ from the snapshot, or
+                workloads are not ready, when the timeout expires.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        diff = self.diff()
+        for key in diff["added"]:
+            self._delete(key)
+        for key in diff["missing"]:
+            self._create(key)
+        for key in diff["changed"]:
+            self._replace(key)
+
+        touched = sum(len(keys) for keys in diff.values())
+        remaining = self.diff() if touched else diff
+        while touched and any(remaining.values()) and time.monotonic() < deadline:
+            # Added objects with finalizers can take a moment to disappear.
+            time.sleep(0.5)
+            remaining = self.diff()
+        waiting: List[str] = []
+        if wait_ready and not any(remaining.values()):
+            waiting = self._workloads_ready()
+            while waiting and time.monotonic() < deadline:
+                time.sleep(1.0)
+                waiting = self._workloads_ready()
+
+        self.last_report = {
+            "missing": ["/".join(k) for k in diff["missing"]],
+            "added": ["/".join(k) for k in diff["added"]],
+            "changed": ["/".join(k) for k in diff["changed"]],
+            "seconds": round(time.monotonic() - started, 2),
+            "verified": not any(remaining.values()) and not waiting,
+        }
+        if any(remaining.values()):
+            raise StateResetError(f"Namespaces {self.namespaces} still differ from the snapshot: "
+                                  f"{ {k: ['/'.join(x) for x in v] for k, v in remaining.items() if v} }")
+        if waiting:
+            raise StateResetError(f"Workloads not ready after reset: {', '.join(waiting)}")
+        if touched:
+            logging.info(f"Reset {touched} resources in {self.namespaces} in {self.last_report['seconds']:.1f}s.")
+        return self.last_report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Show how namespaces differ from a fresh snapshot, or time a reset.")
+    parser.add_argument("--kubeconfig", default=None)
+    parser.add_argument("--namespace", action="append", default=[], help="Namespace to cover; repeatable.")
+    parser.add_argument("--wait", type=float, default=30.0,
+                        help="Seconds to wait between the snapshot and the reset, to make changes by hand.")
+    args = parser.parse_args()
+
+    snapshot = NamespaceSnapshot.take(args.namespace or ["default"], kubeconfig=args.kubeconfig)
+    print(f"Snapshot of {len(snapshot.resources)} resources. Change something within {args.wait:.0f}s...")
+    time.sleep(args.wait)
+    print(json.dumps({k: ["/".join(x) for x in v] for k, v in snapshot.diff().items()}, indent=2))
+    print(json.dumps(snapshot.restore(), indent=2))
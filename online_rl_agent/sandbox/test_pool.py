@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from online_rl_agent.sandbox.base import Sandbox
+from online_rl_agent.sandbox.pool import SandboxPool
+
+
+class FakeSandbox(Sandbox):
+    def __init__(self, index, check_seconds=0.0):
+        self.index = index
+        self.check_seconds = check_seconds
+        self.healthy = True
+        self.started = self.stopped = False
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.stopped = True
+
+    def get_access_config(self):
+        return {"kubeconfig": f"/tmp/kubeconfig-{self.index}"}
+
+    def is_healthy(self):
+        time.sleep(self.check_seconds)
+        return self.healthy
+
+
+def _pool(size, created, **kwargs):
+    def factory(index):
+        created.append(FakeSandbox(index))
+        return created[-1]
+    return SandboxPool(factory, size, health_check_interval=3600, **kwargs)
+
+
+def test_lease_and_release_reuse_the_sandbox():
+    created = []
+    with _pool(1, created) as pool:
+        with pool.leased(timeout=1) as sandbox:
+            assert sandbox.started and pool.stats()["leased"] == 1
+        assert pool.lease(timeout=1) is sandbox
+        pool.release(sandbox)
+        assert pool.stats()["created"] == 1 and pool.stats()["leases"] == 2
+    assert sandbox.stopped
+
+
+def test_unhealthy_release_is_recycled_and_replaced():
+    created = []
+    with _pool(1, created) as pool:
+        sandbox = pool.lease(timeout=1)
+        pool.release(sandbox, healthy=False)
+        replacement = pool.lease(timeout=5)
+        assert replacement is not sandbox and sandbox.stopped
+        assert pool.stats()["recycled"] == 1
+        pool.release(replacement)
+
+
+def test_worn_out_sandbox_is_recycled():
+    created = []
+    with _pool(1, created, max_leases_per_sandbox=1) as pool:
+        sandbox = pool.lease(timeout=1)
+        pool.release(sandbox)
+        assert pool.lease(timeout=5) is not sandbox
+        assert sandbox.stopped
+
+
+def test_lease_times_out_when_everything_is_leased():
+    created = []
+    with _pool(1, created) as pool:
+        sandbox = pool.lease(timeout=1)
+        with pytest.raises(TimeoutError):
+            pool.lease(timeout=0.05)
+        pool.release(sandbox)
+
+
+def test_health_sweep_leaves_other_sandboxes_leasable():
+    created = []
+    with _pool(2, created, check_on_lease=False) as pool:
+        for sandbox in created:
+            sandbox.check_seconds = 0.3
+        sweep = threading.Thread(target=pool._check_idle)
+        sweep.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        leased = pool.lease(timeout=1)
+        assert time.monotonic() - started < 0.2
+        sweep.join()
+        pool.release(leased)
+
+
+def test_health_sweep_recycles_broken_sandboxes():
+    created = []
+    with _pool(2, created) as pool:
+        created[0].healthy = False
+        pool._check_idle()
+        assert pool.stats()["recycled"] == 1
+        deadline = time.monotonic() + 5
+        while len(created) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert created[0].stopped and len(created) == 3
@@ -0,0 +1,49 @@
+from online_rl_agent.sandbox.snapshot import NamespaceSnapshot, _managed, _normalize
+
+
+def _deployment(replicas=2, **metadata):
+    return {"apiVersion": "apps/v1", "kind": "Deployment",
+            "metadata": dict({"name": "cart", "namespace": "shop"}, **metadata),
+            "spec": {"replicas": replicas}, "status": {"readyReplicas": replicas}}
+
+
+def test_normalize_drops_server_metadata_and_status():
+    live = _deployment(uid="abc", resourceVersion="42", managedFields=[{}], labels={"app": "cart"},
+                       annotations={"deployment.kubernetes.io/revision": "3"})
+    assert _normalize("Deployment", live) == {
+        "apiVersion": "apps/v1", "kind": "Deployment",
+        "metadata": {"name": "cart", "namespace": "shop", "labels": {"app": "cart"}},
+        "spec": {"replicas": 2},
+    }
+    assert "status" in live  # The input is left alone.
+
+
+def test_normalize_drops_allocated_service_and_pod_fields():
+    service = {"metadata": {"name": "cart"},
+               "spec": {"clusterIP": "10.0.0.7", "clusterIPs": ["10.0.0.7"], "healthCheckNodePort": 31000,
+                        "ports": [{"port": 80, "nodePort": 30080}]}}
+    assert _normalize("Service", service)["spec"] == {"ports": [{"port": 80}]}
+    headless = {"metadata": {"name": "db"}, "spec": {"clusterIP": "None", "ports": []}}
+    assert _normalize("Service", headless)["spec"]["clusterIP"] == "None"
+    pod = {"metadata": {"name": "debug"}, "spec": {"nodeName": "kind-worker", "containers": []}}
+    assert _normalize("Pod", pod)["spec"] == {"containers": []}
+
+
+def test_cluster_owned_objects_are_not_managed():
+    assert not _managed("Pod", {"metadata": {"name": "cart-1", "ownerReferences": [{"kind": "ReplicaSet"}]}})
+    assert not _managed("ConfigMap", {"metadata": {"name": "kube-root-ca.crt"}})
+    assert not _managed("Secret", {"metadata": {"name": "t"}, "type": "kubernetes.io/service-account-token"})
+    assert _managed("ConfigMap", {"metadata": {"name": "cart-config"}})
+
+
+def test_diff_reports_missing_added_and_changed():
+    cart, config = ("Deployment", "shop", "cart"), ("ConfigMap", "shop", "cart-config")
+    snapshot = NamespaceSnapshot({cart: _normalize("Deployment", _deployment()), config: {"data": {"a": "1"}}},
+                                 ["shop"])
+    debug = ("Pod", "shop", "debug")
+    current = {cart: _normalize("Deployment", _deployment(replicas=0)), debug: {"spec": {}}}
+    assert snapshot.diff(current) == {"missing": [config], "added": [debug], "changed": [cart]}
+    # A recreated object differs only in server-maintained fields.
+    recreated = {cart: _normalize("Deployment", _deployment(uid="new", resourceVersion="1")),
+                 config: {"data": {"a": "1"}}}
+    assert snapshot.diff(recreated) == {"missing": [], "added": [], "changed": []}
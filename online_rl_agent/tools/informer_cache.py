@@ -0,0 +1,278 @@
+"""
+Watch-backed local cache of pods and events for the read-only agent tools.
+
+Agents call `get_pods` / `describe_pod` on the same namespace over and over
+within one episode, and many episodes may share one kind control plane. An
+`InformerCache` lists each namespace once, then keeps its copy fresh from
+watch streams, so reads are answered from memory. Namespaces are synced
+lazily: the first read of a namespace is a miss that falls back to the API
+and starts its watchers. At most `max_namespaces` namespaces are watched per
+cluster; the least recently read one is dropped to make room. Caches are
+shared per kubeconfig and must be stopped with `stop_informer_cache` when
+their cluster goes away (sandboxes do this in `stop`).
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from online_rl_agent.tools.k8s_api_tools import core_v1
+
+# How long a single watch request stays open before it is re-established.
+WATCH_TIMEOUT_SECONDS = 300
+
+# Back-off after a watch or list failure before retrying.
+RETRY_DELAY_SECONDS = 2.0
+
+# Namespaces watched at once per cluster before the least recently read one is dropped.
+DEFAULT_MAX_NAMESPACES = 16
+
+
+class _NamespaceInformer:
+    """List-then-watch loop for one resource kind in one namespace."""
+
+    def __init__(self, name: str, list_func: Callable, namespace: str, stop_event: threading.Event,
+                 on_change: Callable[[], None]):
+        self.name = name
+        self.list_func = list_func
+        self.namespace = namespace
+        self.stop_event = stop_event
+        self.on_change = on_change
+        self.items: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"informer-{name}-{namespace}", daemon=True)
+
+    def snapshot(self) -> List[Any]:
+        with self.lock:
+            return list(self.items.values())
+
+    def _relist(self) -> str:
+        result = self.list_func(self.namespace)
+        with self.lock:
+            self.items = {obj.metadata.uid: obj for obj in result.items}
+        self.synced.set()
+        self.on_change()
+        return result.metadata.resource_version
+
+    def _run(self):
+        resource_version = None
+        while not self.stop_event.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._relist()
+                w = watch.Watch()
+                for event in w.stream(self.list_func, self.namespace, resource_version=resource_version,
+                                      timeout_seconds=WATCH_TIMEOUT_SECONDS):
+                    if self.stop_event.is_set():
+                        w.stop()
+                        break
+                    obj = event["object"]
+                    with self.lock:
+                        if event["type"] == "DELETED":
+                            self.items.pop(obj.metadata.uid, None)
+                        elif event["type"] in ("ADDED", "MODIFIED"):
+                            self.items[obj.metadata.uid] = obj
+                    resource_version = obj.metadata.resource_version
+                    self.on_change()
+            except ApiException as e:
+                if e.status == 410:
+                    # Our resourceVersion is too old; start over from a fresh list.
+                    resource_version = None
+                    continue
+                logging.warning(f"{self.name} informer for '{self.namespace}' failed: {e.status} {e.reason}")
+                self._fail()
+                resource_version = None
+            except Exception as e:
+                logging.warning(f"{self.name} informer for '{self.namespace}' failed: {e}")
+                self._fail()
+                resource_version = None
+
+    def _fail(self):
+        # Until the relist succeeds, reads must go to the API server.
+        self.synced.clear()
+        self.stop_event.wait(RETRY_DELAY_SECONDS)
+
+
+class InformerCache:
+    """
+    In-memory view of the pods and events of a cluster, kept fresh by watches.
+
+    Reads return None on a miss (namespace not synced yet, or its watch is
+    down), in which case the caller should query the API server directly.
+    """
+
+    def __init__(self, kubeconfig: str = None, sync_timeout: float = 0.0,
+                 max_namespaces: int = DEFAULT_MAX_NAMESPACES):
+        """
+        Initializes the cache. Watches are started lazily per namespace.
+
+        Args:
+            kubeconfig: Optional path to a kubeconfig file.
+            sync_timeout: How long a read waits for a newly watched namespace to sync
+                before counting as a miss. 0 returns immediately.
+            max_namespaces: Upper bound on watched namespaces; the least recently
+                read one is stopped when a new one is needed.
+        """
+        self.kubeconfig = kubeconfig
+        self.sync_timeout = sync_timeout
+        self.max_namespaces = max(1, max_namespaces)
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        # Insertion order is kept as recency order: a read moves its namespace to the end.
+        self._namespaces: Dict[str, Dict[str, _NamespaceInformer]] = {}
+        self._namespace_stops: Dict[str, threading.Event] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def _invalidate(self):
+        with self._lock:
+            self._stats["invalidations"] += 1
+
+    def _informers(self, namespace: str) -> Optional[Dict[str, _NamespaceInformer]]:
+        """
+        Returns the namespace's informers, starting them if needed; None once the
+        cache is stopped or when no API client can be built (a miss, so the caller
+        queries the API server itself and reports the error as text).
+        """
+        with self._lock:
+            if self._stop_event.is_set():
+                return None
+            informers = self._namespaces.pop(namespace, None)
+            if informers is not None:
+                self._namespaces[namespace] = informers
+                return informers
+        # Building the client reads the kubeconfig; keep that off the lock.
+        try:
+            api = core_v1(self.kubeconfig)
+        except Exception as e:
+            logging.warning(f"Cannot watch namespace '{namespace}' ({self.kubeconfig or '<default>'}): {e}")
+            return None
+        evicted = None
+        with self._lock:
+            if self._stop_event.is_set():
+                return None
+            informers = self._namespaces.pop(namespace, None)
+            if informers is not None:
+                # Another reader started the watches meanwhile.
+                self._namespaces[namespace] = informers
+                return informers
+            if len(self._namespaces) >= self.max_namespaces:
+                evicted = next(iter(self._namespaces))
+                del self._namespaces[evicted]
+                self._namespace_stops.pop(evicted).set()
+                self._stats["evictions"] += 1
+            stop_event = threading.Event()
+            informers = {
+                "pods": _NamespaceInformer("pods", api.list_namespaced_pod, namespace, stop_event, self._invalidate),
+                "events": _NamespaceInformer("events", api.list_namespaced_event, namespace, stop_event, self._invalidate),
+            }
+            self._namespaces[namespace] = informers
+            self._namespace_stops[namespace] = stop_event
+        if evicted is not None:
+            logging.info(f"Stopped watches for namespace '{evicted}' (more than {self.max_namespaces} namespaces).")
+        for informer in informers.values():
+            informer.thread.start()
+        logging.info(f"Started pod/event watches for namespace '{namespace}'.")
+        return informers
+
+    def _synced(self, informers: List[_NamespaceInformer]) -> bool:
+        deadline = time.monotonic() + self.sync_timeout
+        for informer in informers:
+            if not informer.synced.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def _count(self, hit: bool):
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+
+    def list_pods(self, namespace: str) -> Optional[List[Any]]:
+        """Returns the cached pods of a namespace, or None on a miss."""
+        informers = self._informers(namespace)
+        if informers is None or not self._synced([informers["pods"]]):
+            self._count(False)
+            return None
+        self._count(True)
+        return informers["pods"].snapshot()
+
+    def get_pod(self, namespace: str, pod_name: str) -> Optional[Any]:
+        """
+        Returns the cached pod, or None on a miss.
+
+        A pod absent from a synced namespace is also reported as a miss, so the
+        caller gets the API server's own NotFound error text.
+        """
+        informers = self._informers(namespace)
+        if informers is None or not self._synced([informers["pods"], informers["events"]]):
+            self._count(False)
+            return None
+        pod = next((p for p in informers["pods"].snapshot() if p.metadata.name == pod_name), None)
+        self._count(pod is not None)
+        return pod
+
+    def list_pod_events(self, namespace: str, pod_name: str) -> List[Any]:
+        """Returns the cached events of a pod. Call after `get_pod` returned a pod."""
+        informers = self._informers(namespace)
+        events = informers["events"].snapshot() if informers is not None else []
+        return [
+            e for e in events
+            if e.involved_object is not None
+            and e.involved_object.kind == "Pod"
+            and e.involved_object.name == pod_name
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/invalidation counters and the hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["namespaces"] = sorted(self._namespaces)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def stop(self):
+        """
+        Stops all watch threads and drops the cached objects; later reads are misses.
+        Open watches end within WATCH_TIMEOUT_SECONDS (at once if the cluster is gone).
+        """
+        with self._lock:
+            self._stop_event.set()
+            for stop_event in self._namespace_stops.values():
+                stop_event.set()
+            self._namespaces.clear()
+            self._namespace_stops.clear()
+
+
+_caches: Dict[Optional[str], InformerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_informer_cache(kubeconfig: str = None) -> InformerCache:
+    """Returns the shared cache for a cluster so concurrent agents reuse one set of watches."""
+    with _caches_lock:
+        cache = _caches.get(kubeconfig)
+        if cache is None:
+            cache = InformerCache(kubeconfig)
+            _caches[kubeconfig] = cache
+        return cache
+
+
+def stop_informer_cache(kubeconfig: str = None) -> None:
+    """Stops and forgets the shared cache of one cluster, e.g. when its sandbox is torn down."""
+    with _caches_lock:
+        cache = _caches.pop(kubeconfig, None)
+    if cache is not None:
+        cache.stop()
+        logging.info(f"Stopped informer cache for kubeconfig: {kubeconfig or '<default>'}")
+
+
+def stop_informer_caches():
+    """Stops every shared cache."""
+    with _caches_lock:
+        caches = list(_caches.values())
+        _caches.clear()
+    for cache in caches:
+        cache.stop()
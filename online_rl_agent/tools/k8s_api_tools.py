@@ -0,0 +1,195 @@
+"""
+Kubernetes API backed versions of the agent's read-only tools.
+
+`k8s_tools` forks a `kubectl` process per call, which re-reads the kubeconfig
+and redoes the TLS handshake every time. The functions here have the same
+signatures and return the same kubectl-style text, but share one long-lived,
+connection-pooled `ApiClient` per kubeconfig. Errors are returned as text, as
+kubectl would print them, so a failing or vanished API server never aborts an
+episode; `close_api_client` drops the client of a cluster that is torn down.
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+import urllib3
+from kubernetes import client as k8s_client
+from kubernetes import config as k8s_config
+from kubernetes.client.rest import ApiException
+from kubernetes.config.config_exception import ConfigException
+
+from online_rl_agent.tools.k8s_format import (
+    format_api_error,
+    format_connection_error,
+    format_pod_description,
+    format_pod_table,
+    no_resources_message,
+)
+
+# Upper bound on concurrent HTTP connections per cluster. Parallel tool calls
+# and many agents sharing a kubeconfig all draw from the same pool.
+DEFAULT_CONNECTION_POOL_SIZE = 16
+
+# Server-side timeout for API reads, in seconds.
+REQUEST_TIMEOUT = 30
+
+# Failures below the HTTP layer: refused or reset connections, timeouts, DNS (MaxRetryError, ProtocolError, ...).
+CONNECTION_ERRORS = (urllib3.exceptions.HTTPError, OSError)
+
+_clients: Dict[Optional[str], k8s_client.ApiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_api_client(kubeconfig: str = None, pool_size: int = DEFAULT_CONNECTION_POOL_SIZE) -> k8s_client.ApiClient:
+    """
+    Returns the shared API client for a kubeconfig, creating it on first use.
+
+    Args:
+        kubeconfig: Optional path to a kubeconfig file. None uses the default loading rules.
+        pool_size: Connection pool size used when the client is first created.
+
+    Returns:
+        A thread-safe `ApiClient` whose connections are reused across calls.
+    """
+    with _clients_lock:
+        api_client = _clients.get(kubeconfig)
+        if api_client is None:
+            configuration = k8s_client.Configuration()
+            k8s_config.load_kube_config(config_file=kubeconfig, client_configuration=configuration)
+            configuration.connection_pool_maxsize = pool_size
+            api_client = k8s_client.ApiClient(configuration)
+            _clients[kubeconfig] = api_client
+            logging.info(f"Created pooled Kubernetes API client for kubeconfig: {kubeconfig or '<default>'}")
+        return api_client
+
+
+def core_v1(kubeconfig: str = None) -> k8s_client.CoreV1Api:
+    """Returns a CoreV1Api bound to the shared client for `kubeconfig`."""
+    return k8s_client.CoreV1Api(get_api_client(kubeconfig))
+
+
+def close_api_client(kubeconfig: str = None) -> None:
+    """Closes and forgets the pooled client of one kubeconfig, e.g. when its sandbox is torn down."""
+    with _clients_lock:
+        api_client = _clients.pop(kubeconfig, None)
+    if api_client is not None:
+        api_client.close()
+        logging.info(f"Closed pooled Kubernetes API client for kubeconfig: {kubeconfig or '<default>'}")
+
+
+def _host(kubeconfig: Optional[str]) -> Optional[str]:
+    with _clients_lock:
+        api_client = _clients.get(kubeconfig)
+    return api_client.configuration.host if api_client is not None else None
+
+
+def _error_text(error: Exception, kubeconfig: Optional[str], what: str) -> str:
+    """Logs a failed read and returns what kubectl would print for it."""
+    if isinstance(error, ApiException):
+        logging.error(f"{what} failed: {error.status} {error.reason}")
+        return format_api_error(error)
+    if isinstance(error, ConfigException):
+        logging.error(f"{what} failed: invalid kubeconfig {kubeconfig}: {error}")
+        return f"error: {error}\n"
+    logging.error(f"{what} failed: cannot reach the API server: {error}")
+    return format_connection_error(error, _host(kubeconfig))
+
+
+def close_api_clients():
+    """Closes every pooled client; called when a run shuts down."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for api_client in clients:
+        api_client.close()
+
+
+def list_pod_events(api: k8s_client.CoreV1Api, pod_name: str, namespace: str) -> list:
+    """Lists the events whose involved object is the given pod."""
+    return api.list_namespaced_event(
+        namespace,
+        field_selector=f"involvedObject.kind=Pod,involvedObject.name={pod_name}",
+        _request_timeout=REQUEST_TIMEOUT,
+    ).items
+
+
+def get_pods(namespace: str = "default", kubeconfig: str = None, cache=None) -> str:
+    """
+    Gets the list of pods in a specified namespace.
+
+    Args:
+        namespace: The Kubernetes namespace to query.
+        kubeconfig: Optional path to a kubeconfig file.
+        cache: Optional `InformerCache` consulted before the API server.
+
+    Returns:
+        A string formatted like the kubectl output for getting pods.
+    """
+    pods = cache.list_pods(namespace) if cache is not None else None
+    if pods is not None:
+        return format_pod_table(pods) if pods else no_resources_message(namespace)
+    try:
+        pods = core_v1(kubeconfig).list_namespaced_pod(namespace, _request_timeout=REQUEST_TIMEOUT).items
+    except (ApiException, ConfigException) + CONNECTION_ERRORS as e:
+        return _error_text(e, kubeconfig, f"Listing pods in '{namespace}'")
+    if not pods:
+        return no_resources_message(namespace)
+    return format_pod_table(pods)
+
+
+def describe_pod(pod_name: str, namespace: str = "default", kubeconfig: str = None, cache=None) -> str:
+    """
+    Describes a specific pod in a specified namespace.
+
+    Args:
+        pod_name: The name of the pod to describe.
+        namespace: The Kubernetes namespace where the pod resides.
+        kubeconfig: Optional path to a kubeconfig file.
+        cache: Optional `InformerCache` consulted before the API server.
+
+    Returns:
+        A string formatted like the kubectl output for describing the pod.
+    """
+    if not pod_name:
+        return "Error: pod_name cannot be empty."
+    pod = cache.get_pod(namespace, pod_name) if cache is not None else None
+    if pod is not None:
+        return format_pod_description(pod, cache.list_pod_events(namespace, pod_name))
+    try:
+        api = core_v1(kubeconfig)
+        pod = api.read_namespaced_pod(pod_name, namespace, _request_timeout=REQUEST_TIMEOUT)
+        events = list_pod_events(api, pod_name, namespace)
+    except (ApiException, ConfigException) + CONNECTION_ERRORS as e:
+        return _error_text(e, kubeconfig, f"Describing pod '{pod_name}'")
+    return format_pod_description(pod, events)
+
+
+def get_pod_logs(pod_name: str, namespace: str = "default", tail: int = 50, kubeconfig: str = None) -> str:
+    """
+    Gets the logs of a specific pod in a specified namespace.
+
+    Args:
+        pod_name: The name of the pod to get logs from.
+        namespace: The Kubernetes namespace where the pod resides.
+        tail: The number of recent lines to display.
+        kubeconfig: Optional path to a kubeconfig file.
+
+    Returns:
+        A string containing the pod's logs.
+    """
+    if not pod_name:
+        return "Error: pod_name cannot be empty."
+    try:
+        # Without _preload_content=False the client deserializes logs that happen to be valid JSON.
+        response = core_v1(kubeconfig).read_namespaced_pod_log(
+            pod_name, namespace, tail_lines=int(tail), _request_timeout=REQUEST_TIMEOUT, _preload_content=False
+        )
+        return response.data.decode("utf-8", errors="replace")
+    except (ApiException, ConfigException) + CONNECTION_ERRORS as e:
+        return _error_text(e, kubeconfig, f"Fetching logs for pod '{pod_name}'")
+
+
+if __name__ == '__main__':
+    # Example usage for manual testing; compare with `python -m online_rl_agent.tools.k8s_tools`.
+    print("--- Getting all pods in default namespace ---")
+    print(get_pods())
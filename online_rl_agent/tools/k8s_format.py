@@ -0,0 +1,387 @@
+"""
+Renders Kubernetes API objects as the text `kubectl` would print.
+
+The agent's prompts and the stored trajectories are built around kubectl's
+human-readable output, so API-backed tools must keep producing the same shape
+of text. Only the parts the agent actually reads are reproduced.
+"""
+import datetime
+import json
+from typing import Any, List, Optional, Sequence
+
+
+def human_duration(seconds: float) -> str:
+    """Formats a duration the way kubectl prints ages (e.g. '45s', '3m12s', '5h45m', '12d')."""
+    if seconds < -1:
+        return "<invalid>"
+    if seconds < 0:
+        return "0s"
+    seconds = int(seconds)
+    if seconds < 60 * 2:
+        return f"{seconds}s"
+    minutes = seconds // 60
+    if minutes < 10:
+        rem = seconds % 60
+        return f"{minutes}m" if rem == 0 else f"{minutes}m{rem}s"
+    if minutes < 60 * 3:
+        return f"{minutes}m"
+    hours = minutes // 60
+    if hours < 8:
+        rem = minutes % 60
+        return f"{hours}h" if rem == 0 else f"{hours}h{rem}m"
+    if hours < 48:
+        return f"{hours}h"
+    days = hours // 24
+    if hours < 24 * 8:
+        rem = hours % 24
+        return f"{days}d" if rem == 0 else f"{days}d{rem}h"
+    if hours < 24 * 365 * 2:
+        return f"{days}d"
+    years = days // 365
+    if hours < 24 * 365 * 8:
+        rem = days % 365
+        return f"{years}y" if rem == 0 else f"{years}y{rem}d"
+    return f"{years}y"
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _age(ts: Optional[datetime.datetime], now: datetime.datetime) -> str:
+    if ts is None:
+        return "<unknown>"
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return human_duration((now - ts).total_seconds())
+
+
+def _timestamp(ts: Optional[datetime.datetime]) -> str:
+    if ts is None:
+        return "<unknown>"
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return ts.astimezone().strftime("%a, %d %b %Y %H:%M:%S %z")
+
+
+def format_table(headers: Sequence[str], rows: List[Sequence[str]], padding: int = 3) -> str:
+    """Left-aligned columns separated by `padding` spaces, like kubectl's tabwriter."""
+    widths = [len(h) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], len(cell))
+    lines = []
+    for row in [list(headers)] + [list(r) for r in rows]:
+        cells = [cell.ljust(widths[i]) for i, cell in enumerate(row[:-1])] + [row[-1]]
+        lines.append((" " * padding).join(cells).rstrip())
+    return "\n".join(lines) + "\n"
+
+
+# --- get pods ---
+
+def _pod_status(pod: Any) -> str:
+    """Mirrors kubectl's STATUS column: waiting/terminated reasons win over the phase."""
+    reason = pod.status.reason or pod.status.phase or "Unknown"
+    init_statuses = pod.status.init_container_statuses or []
+    for i, cs in enumerate(init_statuses):
+        state = cs.state
+        if state.terminated and state.terminated.exit_code == 0:
+            continue
+        if state.terminated:
+            reason = f"Init:{state.terminated.reason or 'Error'}"
+        elif state.waiting and state.waiting.reason and state.waiting.reason != "PodInitializing":
+            reason = f"Init:{state.waiting.reason}"
+        else:
+            reason = f"Init:{i}/{len(pod.spec.init_containers or [])}"
+        return reason
+
+    for cs in reversed(pod.status.container_statuses or []):
+        state = cs.state
+        if state.waiting and state.waiting.reason:
+            reason = state.waiting.reason
+        elif state.terminated and state.terminated.reason:
+            reason = state.terminated.reason
+        elif state.terminated:
+            reason = f"ExitCode:{state.terminated.exit_code}"
+
+    if pod.metadata.deletion_timestamp is not None:
+        reason = "Terminating"
+    return reason
+
+
+def _pod_restarts(pod: Any, now: datetime.datetime) -> str:
+    restarts = 0
+    last_restart = None
+    for cs in pod.status.container_statuses or []:
+        restarts += cs.restart_count or 0
+        terminated = cs.last_state.terminated if cs.last_state else None
+        if terminated and terminated.finished_at and (last_restart is None or terminated.finished_at > last_restart):
+            last_restart = terminated.finished_at
+    if restarts and last_restart is not None:
+        return f"{restarts} ({_age(last_restart, now)} ago)"
+    return str(restarts)
+
+
+def format_pod_table(pods: List[Any], now: Optional[datetime.datetime] = None) -> str:
+    """Renders V1Pod objects like `kubectl get pods`."""
+    if not pods:
+        return ""
+    now = now or _now()
+    rows = []
+    for pod in sorted(pods, key=lambda p: p.metadata.name):
+        statuses = pod.status.container_statuses or []
+        ready = sum(1 for cs in statuses if cs.ready)
+        total = len(pod.spec.containers or [])
+        rows.append([
+            pod.metadata.name,
+            f"{ready}/{total}",
+            _pod_status(pod),
+            _pod_restarts(pod, now),
+            _age(pod.metadata.creation_timestamp, now),
+        ])
+    return format_table(["NAME", "READY", "STATUS", "RESTARTS", "AGE"], rows)
+
+
+def no_resources_message(namespace: str) -> str:
+    """The message kubectl prints (on stderr) when a namespace has no pods."""
+    return f"No resources found in {namespace} namespace.\n"
+
+
+# --- describe pod ---
+
+def _kv_block(pairs: List[Any], indent: int = 0) -> List[str]:
+    """Aligns `Key:  value` pairs; a value may be a list of lines for multi-line values."""
+    if not pairs:
+        return []
+    width = max(len(k) for k, _ in pairs) + 3
+    pad = " " * indent
+    lines = []
+    for key, value in pairs:
+        values = value if isinstance(value, list) else [value]
+        values = values or ["<none>"]
+        lines.append(f"{pad}{(key + ':').ljust(width)}{values[0]}".rstrip())
+        for extra in values[1:]:
+            lines.append(f"{pad}{' ' * width}{extra}")
+    return lines
+
+
+def _map_lines(mapping: Optional[dict]) -> List[str]:
+    if not mapping:
+        return ["<none>"]
+    return [f"{k}={v}" for k, v in sorted(mapping.items())]
+
+
+def _state_pairs(label: str, state: Any) -> List[Any]:
+    if state is None:
+        return []
+    if state.running:
+        return [(label, "Running"), ("  Started", _timestamp(state.running.started_at))]
+    if state.waiting:
+        pairs = [(label, "Waiting")]
+        if state.waiting.reason:
+            pairs.append(("  Reason", state.waiting.reason))
+        if state.waiting.message:
+            pairs.append(("  Message", state.waiting.message))
+        return pairs
+    if state.terminated:
+        t = state.terminated
+        pairs = [(label, "Terminated")]
+        if t.reason:
+            pairs.append(("  Reason", t.reason))
+        if t.message:
+            pairs.append(("  Message", t.message))
+        pairs.append(("  Exit Code", str(t.exit_code)))
+        pairs.append(("  Started", _timestamp(t.started_at)))
+        pairs.append(("  Finished", _timestamp(t.finished_at)))
+        return pairs
+    return [(label, "Waiting")]
+
+
+def _resource_lines(title: str, resources: Optional[dict], indent: int) -> List[str]:
+    if not resources:
+        return []
+    pad = " " * indent
+    width = max(len(k) for k in resources) + 3
+    lines = [f"{pad}{title}:"]
+    for name, quantity in sorted(resources.items()):
+        lines.append(f"{pad}  {(name + ':').ljust(width)}{quantity}")
+    return lines
+
+
+def _container_lines(container: Any, status: Any) -> List[str]:
+    lines = [f"  {container.name}:"]
+    ports = container.ports or []
+    pairs = []
+    if status is not None and status.container_id:
+        pairs.append(("Container ID", status.container_id))
+    pairs.append(("Image", container.image))
+    if status is not None and status.image_id:
+        pairs.append(("Image ID", status.image_id))
+    if ports:
+        pairs.append(("Port", [f"{p.container_port}/{p.protocol or 'TCP'}" for p in ports]))
+        pairs.append(("Host Port", [f"{p.host_port or 0}/{p.protocol or 'TCP'}" for p in ports]))
+    else:
+        pairs.append(("Port", "<none>"))
+        pairs.append(("Host Port", "<none>"))
+    if container.command:
+        pairs.append(("Command", list(container.command)))
+    if container.args:
+        pairs.append(("Args", list(container.args)))
+    if status is not None:
+        pairs.extend(_state_pairs("State", status.state))
+        if status.last_state and (status.last_state.running or status.last_state.waiting or status.last_state.terminated):
+            pairs.extend(_state_pairs("Last State", status.last_state))
+        pairs.append(("Ready", str(bool(status.ready))))
+        pairs.append(("Restart Count", str(status.restart_count or 0)))
+    lines.extend(_kv_block(pairs, 4))
+
+    if container.resources:
+        lines.extend(_resource_lines("Limits", container.resources.limits, 4))
+        lines.extend(_resource_lines("Requests", container.resources.requests, 4))
+
+    env = container.env or []
+    if env:
+        lines.append("    Environment:")
+        env_pairs = []
+        for var in env:
+            if var.value is not None:
+                env_pairs.append((var.name, var.value))
+            else:
+                env_pairs.append((var.name, "<set from a reference>"))
+        lines.extend(_kv_block(env_pairs, 6))
+    else:
+        lines.append("    Environment:  <none>")
+
+    mounts = container.volume_mounts or []
+    if mounts:
+        lines.append("    Mounts:")
+        for m in mounts:
+            mode = "ro" if m.read_only else "rw"
+            lines.append(f"      {m.mount_path} from {m.name} ({mode})")
+    else:
+        lines.append("    Mounts:  <none>")
+    return lines
+
+
+def _event_rows(events: List[Any], now: datetime.datetime) -> List[List[str]]:
+    def last_seen(e):
+        return e.last_timestamp or e.event_time or e.first_timestamp or e.metadata.creation_timestamp
+
+    rows = []
+    for e in sorted(events, key=lambda ev: last_seen(ev) or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)):
+        last = last_seen(e)
+        count = e.count or 1
+        age = _age(last, now)
+        if count > 1 and e.first_timestamp is not None:
+            age = f"{age} (x{count} over {_age(e.first_timestamp, now)})"
+        source = ""
+        if e.source is not None and e.source.component:
+            source = e.source.component
+        elif getattr(e, "reporting_component", None):
+            source = e.reporting_component
+        rows.append([e.type or "", e.reason or "", age, source, (e.message or "").strip()])
+    return rows
+
+
+def format_events(events: List[Any], now: Optional[datetime.datetime] = None) -> str:
+    """Renders the `Events:` section of `kubectl describe`."""
+    if not events:
+        return "Events:  <none>\n"
+    now = now or _now()
+    rows = [["----", "------", "----", "----", "-------"]] + _event_rows(events, now)
+    table = format_table(["Type", "Reason", "Age", "From", "Message"], rows, padding=2)
+    return "Events:\n" + "".join(f"  {line}\n" for line in table.splitlines())
+
+
+def format_pod_description(pod: Any, events: List[Any], now: Optional[datetime.datetime] = None) -> str:
+    """Renders a V1Pod and its events like `kubectl describe pod`."""
+    now = now or _now()
+    meta, spec, status = pod.metadata, pod.spec, pod.status
+    node = spec.node_name or "<none>"
+    if spec.node_name and status.host_ip:
+        node = f"{spec.node_name}/{status.host_ip}"
+
+    lines = _kv_block([
+        ("Name", meta.name),
+        ("Namespace", meta.namespace),
+        ("Priority", str(spec.priority or 0)),
+        ("Service Account", spec.service_account_name or "default"),
+        ("Node", node),
+        ("Start Time", _timestamp(status.start_time)),
+        ("Labels", _map_lines(meta.labels)),
+        ("Annotations", _map_lines(meta.annotations)),
+        ("Status", "Terminating" if meta.deletion_timestamp else (status.phase or "Unknown")),
+    ] + ([("Reason", status.reason)] if status.reason else [])
+      + ([("Message", status.message)] if status.message else [])
+      + [("IP", status.pod_ip or "")])
+    # The generated client names this field `pod_i_ps` in older releases.
+    pod_ips = getattr(status, "pod_ips", None) or getattr(status, "pod_i_ps", None) or []
+    if pod_ips:
+        lines.append("IPs:")
+        lines.extend(_kv_block([("IP", ip.ip) for ip in pod_ips], 2))
+    else:
+        lines.append("IPs:              <none>")
+    owners = meta.owner_references or []
+    controller = next((o for o in owners if o.controller), None)
+    if controller is not None:
+        lines.extend(_kv_block([("Controlled By", f"{controller.kind}/{controller.name}")]))
+
+    statuses = {cs.name: cs for cs in status.container_statuses or []}
+    if spec.init_containers:
+        init_statuses = {cs.name: cs for cs in status.init_container_statuses or []}
+        lines.append("Init Containers:")
+        for c in spec.init_containers:
+            lines.extend(_container_lines(c, init_statuses.get(c.name)))
+    lines.append("Containers:")
+    for c in spec.containers or []:
+        lines.extend(_container_lines(c, statuses.get(c.name)))
+
+    conditions = status.conditions or []
+    if conditions:
+        lines.append("Conditions:")
+        table = format_table(["Type", "Status"], [[c.type, c.status + " "] for c in conditions])
+        lines.extend(f"  {line}" for line in table.splitlines())
+
+    tolerations = []
+    for t in spec.tolerations or []:
+        text = t.key or ""
+        if t.effect:
+            text += f":{t.effect}"
+        text += f" op={t.operator or 'Equal'}"
+        if t.value:
+            text += f" value={t.value}"
+        if t.toleration_seconds is not None:
+            text += f" for {t.toleration_seconds}s"
+        tolerations.append(text)
+    lines.extend(_kv_block([
+        ("QoS Class", status.qos_class or "<none>"),
+        ("Node-Selectors", _map_lines(spec.node_selector)),
+        ("Tolerations", tolerations or ["<none>"]),
+    ]))
+    return "\n".join(lines) + "\n" + format_events(events, now)
+
+
+# --- errors ---
+
+def format_api_error(error: Any) -> str:
+    """Turns an ApiException into kubectl's `Error from server (Reason): message` line."""
+    reason = getattr(error, "reason", None) or "Unknown"
+    message = str(error)
+    body = getattr(error, "body", None)
+    if body:
+        try:
+            payload = json.loads(body)
+            reason = payload.get("reason") or reason
+            message = payload.get("message") or message
+        except (TypeError, ValueError):
+            message = body if isinstance(body, str) else message
+    return f"Error from server ({reason}): {message}\n"
+
+
+def format_connection_error(error: Any, host: Optional[str] = None) -> str:
+    """Turns a transport failure (refused, timed out, reset) into the line kubectl prints for it."""
+    reason = getattr(error, "reason", None) or error
+    server = (host or "").split("://", 1)[-1]
+    if server and "refused" in str(reason).lower():
+        return f"The connection to the server {server} was refused - did you specify the right host or port?\n"
+    return f"Unable to connect to the server: {reason}\n"
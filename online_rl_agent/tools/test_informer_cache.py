@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from online_rl_agent.tools import informer_cache
+
+
+class FakeCoreV1:
+    """Lists one object per namespace and kind; watches fail, so informers relist."""
+
+    def __init__(self):
+        self.listed = []
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        return self._list(namespace, "pod", kwargs)
+
+    def list_namespaced_event(self, namespace, **kwargs):
+        return self._list(namespace, "event", kwargs)
+
+    def _list(self, namespace, kind, kwargs):
+        if kwargs.get("watch"):
+            raise ConnectionError("watch not supported by the fake")
+        self.listed.append((namespace, kind))
+        item = SimpleNamespace(metadata=SimpleNamespace(uid=f"{namespace}-{kind}", name=f"{namespace}-{kind}",
+                                                        resource_version="1"))
+        return SimpleNamespace(items=[item], metadata=SimpleNamespace(resource_version="1"))
+
+
+def _cache(monkeypatch, max_namespaces):
+    monkeypatch.setattr(informer_cache, "core_v1", lambda kubeconfig: FakeCoreV1())
+    monkeypatch.setattr(informer_cache, "RETRY_DELAY_SECONDS", 0.01)
+    return informer_cache.InformerCache("/tmp/kc", sync_timeout=2.0, max_namespaces=max_namespaces)
+
+
+def test_least_recently_read_namespace_is_evicted(monkeypatch):
+    cache = _cache(monkeypatch, max_namespaces=2)
+    try:
+        assert cache.list_pods("a") is not None
+        assert cache.list_pods("b") is not None
+        cache.list_pods("a")  # "b" is now the least recently read.
+        stopped = cache._namespace_stops["b"]
+        cache.list_pods("c")
+        assert cache.stats()["namespaces"] == ["a", "c"]
+        assert cache.stats()["evictions"] == 1
+        assert stopped.is_set()
+    finally:
+        cache.stop()
+
+
+def test_stopped_cache_only_misses(monkeypatch):
+    cache = _cache(monkeypatch, max_namespaces=4)
+    cache.list_pods("a")
+    stops = list(cache._namespace_stops.values())
+    cache.stop()
+    assert all(e.is_set() for e in stops)
+    assert cache.list_pods("a") is None and cache.get_pod("a", "a-pod") is None
+    assert cache.stats()["namespaces"] == []
+
+
+def test_stop_informer_cache_evicts_one_cluster(monkeypatch):
+    monkeypatch.setattr(informer_cache, "_caches", {})
+    first = informer_cache.get_informer_cache("/tmp/kc-1")
+    second = informer_cache.get_informer_cache("/tmp/kc-2")
+    informer_cache.stop_informer_cache("/tmp/kc-1")
+    assert first._stop_event.is_set() and not second._stop_event.is_set()
+    assert informer_cache.get_informer_cache("/tmp/kc-1") is not first
+    informer_cache.stop_informer_caches()
+    assert second._stop_event.is_set()
+
+
+def test_bad_kubeconfig_is_a_miss_and_the_tool_reports_it(tmp_path):
+    from online_rl_agent.tools import k8s_api_tools
+
+    missing = str(tmp_path / "missing-kubeconfig")
+    cache = informer_cache.InformerCache(missing)
+    assert cache.list_pods("default") is None
+    assert cache.get_pod("default", "cart-1") is None
+    assert k8s_api_tools.get_pods("default", kubeconfig=missing, cache=cache).startswith("error: ")
+    assert k8s_api_tools.describe_pod("cart-1", kubeconfig=missing, cache=cache).startswith("error: ")
@@ -0,0 +1,77 @@
+import socket
+from types import SimpleNamespace
+
+from online_rl_agent.tools import k8s_api_tools
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- name: gone
+  cluster: {{server: "http://127.0.0.1:{port}"}}
+users:
+- name: agent
+  user: {{token: "t"}}
+contexts:
+- name: gone
+  context: {{cluster: gone, user: agent}}
+current-context: gone
+"""
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _kubeconfig(tmp_path) -> str:
+    port = _closed_port()
+    path = tmp_path / "kubeconfig"
+    path.write_text(KUBECONFIG.format(port=port))
+    return str(path)
+
+
+def test_unreachable_api_server_returns_kubectl_text(tmp_path):
+    kubeconfig = _kubeconfig(tmp_path)
+    try:
+        for output in (k8s_api_tools.get_pods("default", kubeconfig=kubeconfig),
+                       k8s_api_tools.describe_pod("adservice-1", kubeconfig=kubeconfig),
+                       k8s_api_tools.get_pod_logs("adservice-1", kubeconfig=kubeconfig)):
+            assert output.startswith("The connection to the server 127.0.0.1:")
+            assert "was refused" in output
+    finally:
+        k8s_api_tools.close_api_client(kubeconfig)
+
+
+def test_invalid_kubeconfig_returns_error_text(tmp_path):
+    path = tmp_path / "empty"
+    path.write_text("")
+    assert k8s_api_tools.get_pods("default", kubeconfig=str(path)).startswith("error: ")
+
+
+def test_close_api_client_evicts_one_kubeconfig(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first, second = _kubeconfig(tmp_path / "a"), _kubeconfig(tmp_path / "b")
+    client = k8s_api_tools.get_api_client(first)
+    k8s_api_tools.get_api_client(second)
+    k8s_api_tools.close_api_client(first)
+    assert first not in k8s_api_tools._clients and second in k8s_api_tools._clients
+    assert k8s_api_tools.get_api_client(first) is not client
+    k8s_api_tools.close_api_client(first)
+    k8s_api_tools.close_api_client(second)
+
+
+def test_pod_logs_are_returned_as_raw_text(monkeypatch):
+    seen = {}
+
+    class FakeCoreV1:
+        def read_namespaced_pod_log(self, pod_name, namespace, **kwargs):
+            seen.update(kwargs)
+            return SimpleNamespace(data='{"level": "error", "msg": "Verbindung fehlgeschlagen"}\n'.encode("utf-8"))
+
+    monkeypatch.setattr(k8s_api_tools, "core_v1", lambda kubeconfig: FakeCoreV1())
+    output = k8s_api_tools.get_pod_logs("cart-1", namespace="shop")
+    assert output == '{"level": "error", "msg": "Verbindung fehlgeschlagen"}\n'
+    assert seen["_preload_content"] is False
@@ -0,0 +1,151 @@
+"""
+Batch labeling of trajectories saved with a pending reward.
+
+Episodes run with `--reward pending` (or where the user deferred the
+question) finish without waiting for anyone. This tool shows their final
+answers afterwards, one after the other, and appends the rewards to a
+`RewardLabelStore`; a labeled reward can be changed by labeling again.
+
+    python -m online_rl_agent.user_agent.labeling --jsonl data/trajectories.jsonl
+    python -m online_rl_agent.user_agent.labeling --segments data/segments --list
+    python -m online_rl_agent.user_agent.labeling --jsonl data/trajectories.jsonl --set traj_123 1
+"""
+import getpass
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from online_rl_agent.data.reward_labels import VALID_REWARDS, RewardLabelStore, is_pending
+
+
+def final_answer_of(trajectory: Dict[str, Any]) -> Optional[str]:
+    """Returns the agent's final answer, or None if the episode ended without one."""
+    for step in reversed(trajectory.get("steps") or []):
+        action = step.get("action") or {}
+        if action.get("tool_name") == "final_answer":
+            return (action.get("tool_args") or {}).get("answer")
+    return None
+
+
+def iter_pending(trajectories: Iterable[Dict[str, Any]], labels: RewardLabelStore) -> Iterator[Dict[str, Any]]:
+    """Yields the trajectories that are still pending once the existing labels are applied."""
+    for trajectory in labels.iter_applied(trajectories):
+        if is_pending(trajectory):
+            yield trajectory
+
+
+def label_interactively(trajectories: Iterable[Dict[str, Any]], labels: RewardLabelStore,
+                        labeler: Optional[str] = None, index=None) -> Dict[str, int]:
+    """
+    Shows each trajectory's task and final answer and asks for a reward.
+
+    Accepts 1, 0 or -1; `s` skips the trajectory and `q` stops.
+
+    Args:
+        trajectories: Pending trajectories to label.
+        labels: Where the rewards are recorded.
+        labeler: Name stored with each label.
+        index: Optional `TrajectoryIndex` updated with each reward.
+
+    Returns:
+        Counts of labeled and skipped trajectories.
+    """
+    counts = {"labeled": 0, "skipped": 0}
+    for trajectory in trajectories:
+        print("\n" + "=" * 60)
+        print(f"Trajectory: {trajectory['id']}  (ended {trajectory.get('end_time')})")
+        if trajectory.get("scenario"):
+            print(f"Scenario:   {trajectory['scenario']} {trajectory.get('scenario_params') or ''}")
+        print(f"Task:       {trajectory.get('task', '')}")
+        print(f"Steps:      {len(trajectory.get('steps') or [])}")
+        print("--- Agent's Final Proposed Solution ---")
+        print(final_answer_of(trajectory) or "(no final answer)")
+        print("-" * 39)
+        while True:
+            answer = input("Reward? 1 solved, 0 not solved, -1 made it worse, s skip, q quit: ").strip().lower()
+            if answer in ("q", "s"):
+                break
+            try:
+                reward = int(answer)
+            except ValueError:
+                reward = None
+            if reward in VALID_REWARDS:
+                break
+            print(f"Invalid input. Please enter one of {', '.join(map(str, VALID_REWARDS))}, s or q.")
+        if answer == "q":
+            break
+        if answer == "s":
+            counts["skipped"] += 1
+            continue
+        labels.set(trajectory["id"], reward, labeler=labeler)
+        if index is not None:
+            index.set_reward(trajectory["id"], reward)
+        counts["labeled"] += 1
+    return counts
+
+
+def _read_source(jsonl_paths: List[str], segment_dirs: List[str], blob_dir: Optional[str]) -> Iterator[Dict[str, Any]]:
+    def records() -> Iterator[Dict[str, Any]]:
+        for path in jsonl_paths:
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        if segment_dirs:
+            from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+            for directory in segment_dirs:
+                yield from SegmentedTrajectoryLog(directory).iter_trajectories()
+
+    if blob_dir:
+        from online_rl_agent.data.blob_store import ObservationBlobStore
+        return ObservationBlobStore(blob_dir).iter_rehydrated(records())
+    return records()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Label trajectories saved with a pending reward.")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSONL trajectory file to read.")
+    parser.add_argument("--segments", action="append", default=[], help="Segment log directory to read.")
+    parser.add_argument("--blob-dir", help="Observation blob store, if the trajectories were deduplicated.")
+    parser.add_argument("--labels", default="data/reward_labels.jsonl", help="Reward label file.")
+    parser.add_argument("--index-db", help="Trajectory index to update with each reward.")
+    parser.add_argument("--labeler", default=None, help="Name stored with the labels (default: current user).")
+    parser.add_argument("--list", action="store_true", help="Only list pending trajectories.")
+    parser.add_argument("--set", nargs=2, metavar=("ID", "REWARD"),
+                        help="Label (or relabel) one trajectory without prompting.")
+    args = parser.parse_args()
+
+    label_store = RewardLabelStore(args.labels)
+    labeler_name = args.labeler or getpass.getuser()
+    trajectory_index = None
+    if args.index_db:
+        from online_rl_agent.data.trajectory_index import TrajectoryIndex
+        trajectory_index = TrajectoryIndex(args.index_db, labels=label_store)
+
+    try:
+        if args.set:
+            trajectory_id, value = args.set[0], int(args.set[1])
+            label_store.set(trajectory_id, value, labeler=labeler_name)
+            if trajectory_index is not None and not trajectory_index.set_reward(trajectory_id, value):
+                print(f"Note: {trajectory_id} is not in the index yet; it will be labeled when indexed.")
+            print(f"Labeled {trajectory_id} with reward {value}.")
+        else:
+            if not args.jsonl and not args.segments:
+                parser.error("Give at least one --jsonl or --segments source.")
+            pending = iter_pending(_read_source(args.jsonl, args.segments, args.blob_dir), label_store)
+            if args.list:
+                total = 0
+                for record in pending:
+                    total += 1
+                    print(f"{record['id']}  end={record.get('end_time')}  scenario={record.get('scenario')}  "
+                          f"steps={len(record.get('steps') or [])}")
+                print(f"{total} trajectories waiting for a reward.")
+            else:
+                result = label_interactively(pending, label_store, labeler=labeler_name, index=trajectory_index)
+                print(f"\nLabeled {result['labeled']}, skipped {result['skipped']}.")
+    finally:
+        if trajectory_index is not None:
+            trajectory_index.close()
@@ -0,0 +1,297 @@
+"""
+Programmatic reward from the health of the cluster.
+
+Implements the README's reward scheme without a human in the loop:
+
+     1  the faulted workload is healthy again, while the fault is still
+        injected, and stays healthy for the stabilization window;
+     0  it is not (the user's problem is not solved), or it only recovered
+        because the chaos experiment ended or was deleted;
+    -1  the agent made things worse: a workload that was healthy while the
+        fault was active (or before it) is now unhealthy.
+
+Faults the cluster heals by itself (a killed pod is replaced by its
+ReplicaSet, a killed container is restarted) say nothing about the agent, so
+their recovery is left pending (None) for labeling instead of rewarded. The
+cause of a recovery is recorded as `recovery_cause` in `last_report`.
+
+A workload is the set of pods sharing a value of `group_label` (e.g.
+`app=cartservice`). It is healthy when it has pods, all of them are ready,
+no container restarted during the window and, if a Service selects it, the
+Service has ready endpoints. Each observer only issues a few list calls per
+poll, so one per episode can run on every worker of the concurrent runner.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from kubernetes import client as k8s_client
+from kubernetes.client.rest import ApiException
+
+from online_rl_agent.chaos.injector import _resource
+from online_rl_agent.chaos.readiness import _conditions, fault_target
+from online_rl_agent.tools.k8s_api_tools import REQUEST_TIMEOUT, get_api_client
+
+# Chaos Mesh actions whose damage the cluster repairs without anyone's help.
+SELF_HEALING_ACTIONS = ("pod-kill", "container-kill")
+
+# Values of `recovery_cause` in the report.
+RECOVERED_BY_AGENT = "agent"
+RECOVERED_SELF_HEALING = "self_healing"
+RECOVERED_FAULT_ENDED = "fault_ended"
+
+
+def _pod_ready(pod) -> bool:
+    for condition in (pod.status.conditions or []) if pod.status else []:
+        if condition.type == "Ready":
+            return condition.status == "True"
+    return False
+
+
+class HealthObserver:
+    """
+    Computes the reward of one episode from namespace health snapshots.
+
+    Lifecycle: `capture_baseline()` before the fault is injected,
+    `capture_faulted()` once it has taken effect, then `evaluate()` after the
+    agent has finished.
+    """
+
+    def __init__(
+        self,
+        kubeconfig: str = None,
+        namespace: str = "default",
+        target_selector: Optional[str] = None,
+        group_label: str = "app",
+        stabilization_seconds: float = 30.0,
+        poll_interval: float = 2.0,
+        timeout: float = 120.0,
+        env=None,
+    ):
+        """
+        Args:
+            kubeconfig: Optional path to a kubeconfig file.
+            namespace: Namespace whose workloads are observed.
+            target_selector: Label selector of the faulted workload, e.g. "app=adservice".
+                When None, it is read from `env.manifest` at evaluation time.
+            group_label: Pod label that identifies a workload.
+            stabilization_seconds: How long the target must stay healthy to count as solved.
+            poll_interval: Seconds between health snapshots.
+            timeout: Maximum time `evaluate` waits for the window to be reached.
+            env: Optional environment whose current chaos manifest names the target.
+        """
+        self.kubeconfig = kubeconfig
+        self.namespace = namespace
+        self.target_selector = target_selector
+        self.group_label = group_label
+        self.stabilization_seconds = stabilization_seconds
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.env = env
+        self.baseline: Optional[Dict[str, Dict[str, Any]]] = None
+        self.faulted: Optional[Dict[str, Dict[str, Any]]] = None
+        self.last_report: Dict[str, Any] = {}
+
+    # --- Snapshots ---
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per-workload health: pod count, ready count, total restarts and
+        ready endpoint addresses (None when no Service selects the workload).
+        """
+        api = k8s_client.CoreV1Api(get_api_client(self.kubeconfig))
+        pods = api.list_namespaced_pod(self.namespace, _request_timeout=REQUEST_TIMEOUT).items
+        workloads: Dict[str, Dict[str, Any]] = {}
+        for pod in pods:
+            value = (pod.metadata.labels or {}).get(self.group_label)
+            if value is None or (pod.status and pod.status.phase in ("Succeeded", "Failed")):
+                continue
+            w = workloads.setdefault(value, {"pods": 0, "ready": 0, "restarts": 0, "endpoints": None})
+            w["pods"] += 1
+            w["ready"] += int(_pod_ready(pod))
+            w["restarts"] += sum(s.restart_count or 0 for s in (pod.status.container_statuses or []))
+
+        services = api.list_namespaced_service(self.namespace, _request_timeout=REQUEST_TIMEOUT).items
+        endpoints = {e.metadata.name: e for e in
+                     api.list_namespaced_endpoints(self.namespace, _request_timeout=REQUEST_TIMEOUT).items}
+        for service in services:
+            value = (service.spec.selector or {}).get(self.group_label)
+            if value is None:
+                continue
+            ep = endpoints.get(service.metadata.name)
+            ready = sum(len(subset.addresses or []) for subset in (ep.subsets or [])) if ep else 0
+            w = workloads.setdefault(value, {"pods": 0, "ready": 0, "restarts": 0, "endpoints": None})
+            w["endpoints"] = (w["endpoints"] or 0) + ready
+        return workloads
+
+    @staticmethod
+    def is_healthy(workload: Optional[Dict[str, Any]]) -> bool:
+        if not workload or workload["pods"] == 0:
+            return False
+        return workload["ready"] == workload["pods"] and (workload["endpoints"] is None or workload["endpoints"] > 0)
+
+    def capture_baseline(self) -> None:
+        """Records health before the fault is injected."""
+        self.baseline = self.snapshot()
+
+    def capture_faulted(self) -> None:
+        """Records health once the fault has taken effect (before the agent acts)."""
+        self.faulted = self.snapshot()
+
+    # --- Fault state ---
+
+    def _manifest(self) -> Optional[Dict[str, Any]]:
+        return getattr(self.env, "manifest", None) if self.env is not None else None
+
+    def fault_state(self) -> Optional[str]:
+        """
+        Returns "injected", "recovered" (the experiment's duration ended, or it was paused),
+        "deleted", or None when there is no experiment to check or its state is unknown.
+        """
+        manifest = self._manifest()
+        if not manifest:
+            return None
+        api = k8s_client.CustomObjectsApi(get_api_client(self.kubeconfig))
+        try:
+            obj = api.get_namespaced_custom_object(*_resource(manifest), manifest["metadata"]["name"],
+                                                   _request_timeout=REQUEST_TIMEOUT)
+        except ApiException as e:
+            if e.status == 404:
+                return "deleted"
+            logging.warning(f"Could not read chaos experiment {manifest['metadata']['name']}: {e.status} {e.reason}")
+            return None
+        conditions = _conditions(obj)
+        if conditions.get("AllRecovered") == "True" or conditions.get("Paused") == "True":
+            return "recovered"
+        if conditions.get("AllInjected") == "True":
+            return "injected"
+        return None
+
+    def _self_healing(self) -> bool:
+        manifest = self._manifest()
+        return bool(manifest) and (manifest.get("spec") or {}).get("action") in SELF_HEALING_ACTIONS
+
+    # --- Reward ---
+
+    def _target(self) -> Optional[str]:
+        selector = self.target_selector
+        if selector is None and self.env is not None and getattr(self.env, "manifest", None):
+            _, selector = fault_target(self.env.manifest)
+        if not selector:
+            return None
+        for part in selector.split(","):
+            key, _, value = part.partition("=")
+            if key == self.group_label:
+                return value
+        return None
+
+    def _damaged(self, snapshot: Dict[str, Dict[str, Any]], target: Optional[str]) -> list:
+        """Workloads other than the target that were healthy before and are not now."""
+        reference = self.faulted if self.faulted is not None else self.baseline
+        if reference is None:
+            return []
+        return sorted(name for name, w in reference.items()
+                      if name != target and self.is_healthy(w) and not self.is_healthy(snapshot.get(name)))
+
+    def evaluate(self, stop_event: Optional[threading.Event] = None) -> Optional[int]:
+        """
+        Polls until the target has been healthy for the stabilization window, collateral
+        damage is seen (-1), or the timeout expires (0).
+
+        A recovery is rewarded 1 only if it began while the fault was still injected.
+        If it began after the experiment ended or was deleted, the reward is 0; for a
+        self-healing fault it is None (pending). The details of the decision, including
+        `recovery_cause` and `fault_state_at_recovery`, are kept in `last_report`.
+        """
+        target = self._target()
+        self_healing = self._self_healing()
+        started = time.monotonic()
+        healthy_since: Optional[float] = None
+        healthy_restarts: Optional[int] = None
+        healthy_fault_state: Optional[str] = None
+        damaged_since: Optional[float] = None
+        snapshot: Dict[str, Dict[str, Any]] = {}
+        fault_state: Optional[str] = None
+        recovery_cause: Optional[str] = None
+        reward, reason = 0, "target did not recover within the timeout"
+
+        while True:
+            now = time.monotonic()
+            try:
+                snapshot = self.snapshot()
+            except Exception as e:
+                logging.warning(f"Health snapshot failed: {e}")
+                snapshot = {}
+            damaged = self._damaged(snapshot, target) if snapshot else []
+            # Damage only counts once it persists for the window; rolling restarts are transient.
+            damaged_since = (damaged_since or now) if damaged else None
+            if damaged and now - damaged_since >= self.stabilization_seconds:
+                reward, reason = -1, f"workloads broken by the agent: {', '.join(damaged)}"
+                break
+
+            t = snapshot.get(target) if target else None
+            if target and self.is_healthy(t) and not damaged:
+                if healthy_since is None or t["restarts"] != healthy_restarts:
+                    healthy_since, healthy_restarts = now, t["restarts"]
+                    # Whether the fault was still active when the target became healthy.
+                    healthy_fault_state = fault_state = self.fault_state()
+                elif now - healthy_since >= self.stabilization_seconds:
+                    window = f"{self.stabilization_seconds:.0f}s"
+                    if self_healing:
+                        recovery_cause = RECOVERED_SELF_HEALING
+                        reward, reason = None, f"{target} healthy for {window}, but the fault heals by itself"
+                    elif healthy_fault_state in ("recovered", "deleted"):
+                        recovery_cause = RECOVERED_FAULT_ENDED
+                        reward, reason = 0, (f"{target} healthy for {window} only after the chaos experiment "
+                                             f"was {healthy_fault_state}")
+                    else:
+                        recovery_cause = RECOVERED_BY_AGENT
+                        reward, reason = 1, f"{target} healthy for {window} while the fault was injected"
+                    break
+            else:
+                healthy_since = None
+            if target is None and now - started >= self.stabilization_seconds:
+                reason = "no target workload to observe"
+                break
+
+            if now - started >= self.timeout:
+                if damaged:
+                    reward, reason = -1, f"workloads broken by the agent: {', '.join(damaged)}"
+                break
+            if stop_event is not None and stop_event.wait(self.poll_interval):
+                reason = "cancelled"
+                break
+            if stop_event is None:
+                time.sleep(self.poll_interval)
+
+        self.last_report = {
+            "reward": reward,
+            "reason": reason,
+            "target": target,
+            "seconds": round(time.monotonic() - started, 2),
+            "final": snapshot.get(target) if target else None,
+            "recovery_cause": recovery_cause,
+            "fault_state_at_recovery": fault_state,
+        }
+        logging.info(f"Observer reward {reward}: {reason}")
+        return reward
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Print workload health, or evaluate a target's recovery.")
+    parser.add_argument("--kubeconfig", default=None)
+    parser.add_argument("--namespace", default="default")
+    parser.add_argument("--target", help="Label selector of the faulted workload, e.g. app=adservice.")
+    parser.add_argument("--stabilization-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    observer = HealthObserver(args.kubeconfig, args.namespace, target_selector=args.target,
+                              stabilization_seconds=args.stabilization_seconds)
+    print(json.dumps(observer.snapshot(), indent=2))
+    if args.target:
+        observer.capture_faulted()
+        print(f"Reward: {observer.evaluate()}  {observer.last_report}")
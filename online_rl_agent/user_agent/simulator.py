@@ -1,26 +1,35 @@
+from typing import Optional
+
+
 def get_user_task() -> str:
     """
     Returns a hardcoded user problem for the MVP.
     """
     return "My service is down, please investigate and find the root cause."
 
-def get_reward_from_user(final_answer: str) -> int:
+def get_reward_from_user(final_answer: str, allow_defer: bool = False) -> Optional[int]:
     """
     Shows the agent's final answer to the real user and asks for a reward.
 
     Args:
         final_answer: The solution proposed by the agent.
+        allow_defer: Let the user press Enter to label the episode later instead.
 
     Returns:
-        An integer reward (1 for success, 0 for failure).
+        An integer reward (1 for success, 0 for failure), or None if deferred.
     """
     print("\n--- Agent's Final Proposed Solution ---")
     print(final_answer)
     print("-----------------------------------------")
     
+    prompt = "Was the problem solved? Enter 1 for YES, 0 for NO"
+    prompt += " (or press Enter to label it later): " if allow_defer else ": "
     while True:
+        answer = input(prompt).strip()
+        if allow_defer and not answer:
+            return None
         try:
-            reward = int(input("Was the problem solved? Enter 1 for YES, 0 for NO: "))
+            reward = int(answer)
             if reward in [0, 1]:
                 return reward
             else:
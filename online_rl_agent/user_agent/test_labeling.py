@@ -0,0 +1,40 @@
+from online_rl_agent.data.reward_labels import REWARD_PENDING, RewardLabelStore
+from online_rl_agent.user_agent.labeling import final_answer_of, iter_pending, label_interactively
+
+
+def _pending(trajectory_id, answer="restart the cart pod"):
+    steps = [{"action": {"tool_name": "get_pods", "tool_args": {}}},
+             {"action": {"tool_name": "final_answer", "tool_args": {"answer": answer}}}]
+    return {"id": trajectory_id, "reward": None, "reward_status": REWARD_PENDING, "steps": steps}
+
+
+class _Index:
+    def __init__(self):
+        self.rewards = {}
+
+    def set_reward(self, trajectory_id, reward):
+        self.rewards[trajectory_id] = reward
+        return True
+
+
+def test_final_answer_of():
+    assert final_answer_of(_pending("t", answer="bad image")) == "bad image"
+    assert final_answer_of({"steps": [{"action": {"tool_name": "get_pods"}}]}) is None
+
+
+def test_labeled_trajectories_are_no_longer_pending(tmp_path):
+    labels = RewardLabelStore(str(tmp_path / "labels.jsonl"))
+    labels.set("traj-1", 1)
+    saved = [_pending("traj-1"), _pending("traj-2"), {"id": "traj-3", "reward": 0}]
+    assert [t["id"] for t in iter_pending(saved, labels)] == ["traj-2"]
+
+
+def test_interactive_labeling_skips_retries_and_quits(tmp_path, monkeypatch, capsys):
+    answers = iter(["s", "maybe", "1", "q"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    labels, index = RewardLabelStore(str(tmp_path / "labels.jsonl")), _Index()
+    counts = label_interactively([_pending(f"traj-{i}") for i in range(4)], labels, labeler="ana", index=index)
+    assert counts == {"labeled": 1, "skipped": 1}
+    assert labels.get("traj-1")["labeler"] == "ana" and index.rewards == {"traj-1": 1}
+    assert labels.get("traj-2") is None
+    assert "Invalid input" in capsys.readouterr().out
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from online_rl_agent.user_agent.observer import HealthObserver
+
+HEALTHY = {"adservice": {"pods": 1, "ready": 1, "restarts": 0, "endpoints": 1}}
+
+
+class ScriptedObserver(HealthObserver):
+    """Serves canned snapshots and experiment states instead of querying a cluster."""
+
+    def __init__(self, action, fault_states, **kwargs):
+        manifest = {"apiVersion": "chaos-mesh.org/v1alpha1", "kind": "PodChaos",
+                    "metadata": {"name": "f", "namespace": "default"},
+                    "spec": {"action": action, "selector": {"labelSelectors": {"app": "adservice"}}}}
+        super().__init__(env=SimpleNamespace(manifest=manifest), stabilization_seconds=0.02,
+                         poll_interval=0.01, timeout=1.0, **kwargs)
+        self.fault_states = list(fault_states)
+
+    def snapshot(self):
+        return HEALTHY
+
+    def fault_state(self):
+        return self.fault_states.pop(0) if len(self.fault_states) > 1 else self.fault_states[0]
+
+
+def test_recovery_while_injected_is_rewarded():
+    observer = ScriptedObserver("pod-failure", ["injected"])
+    assert observer.evaluate() == 1
+    assert observer.last_report["recovery_cause"] == "agent"
+
+
+def test_recovery_after_experiment_ended_is_not_rewarded():
+    for state in ("recovered", "deleted"):
+        observer = ScriptedObserver("pod-failure", [state])
+        assert observer.evaluate() == 0
+        assert observer.last_report["recovery_cause"] == "fault_ended"
+        assert observer.last_report["fault_state_at_recovery"] == state
+
+
+def test_self_healing_fault_is_left_pending():
+    observer = ScriptedObserver("pod-kill", ["injected"])
+    assert observer.evaluate() is None
+    assert observer.last_report["recovery_cause"] == "self_healing"
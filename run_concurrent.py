@@ -0,0 +1,300 @@
+import argparse
+import itertools
+import logging
+import os
+import sys
+import threading
+from typing import Optional
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from online_rl_agent.agent.agent import DevOpsAgent
+from online_rl_agent.agent.context_manager import TokenBudgetManager
+from online_rl_agent.agent.llm_cache import LLMResponseCache, MODES as LLM_CACHE_MODES
+from online_rl_agent.agent.metrics import AgentMetrics
+from online_rl_agent.agent.budget import EpisodeBudget, SpendWindow
+from online_rl_agent.agent.llm_client import get_llm_client
+from online_rl_agent.user_agent.simulator import get_reward_from_user
+from online_rl_agent.user_agent.observer import HealthObserver
+from online_rl_agent.environment.k8s_chaos_env import KubernetesChaosEnvironment
+from online_rl_agent.environment.chaos_scenario_env import ScenarioChaosEnvironment
+from online_rl_agent.chaos.scenarios import list_scenarios
+from online_rl_agent.chaos.curriculum import CurriculumScheduler
+from online_rl_agent.sandbox.kind_sandbox import KindSandbox
+from online_rl_agent.sandbox.pool import SandboxPool
+from online_rl_agent.runner.concurrent_runner import ConcurrentEpisodeRunner
+from online_rl_agent.data.segment_log import SegmentedTrajectoryLog
+from online_rl_agent.data.wal import TrajectoryWAL
+from online_rl_agent.data.trajectory_index import TrajectoryIndex
+from online_rl_agent.data.blob_store import ObservationBlobStore
+from online_rl_agent.tools.informer_cache import stop_informer_caches
+from online_rl_agent.tools.k8s_api_tools import close_api_clients
+
+# Try to import config
+try:
+    from online_rl_agent import config
+except ImportError:
+    print("="*50)
+    print("ERROR: Configuration file not found.")
+    print("Please copy 'online_rl_agent/config.py.example' to 'online_rl_agent/config.py'")
+    print("and fill in your DEEPSEEK_API_KEY.")
+    print("="*50)
+    exit(1)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("ConcurrentRunner")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run many episodes concurrently, one Kind sandbox per worker.")
+    parser.add_argument("--episodes", type=int, default=8, help="Total number of episodes to run.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum episodes (and clusters) in flight.")
+    parser.add_argument("--episode-timeout", type=float, default=600.0, help="Per-episode wall-clock budget in seconds.")
+    parser.add_argument("--settle-seconds", type=float, default=0.0,
+                        help="Extra wait after the fault is confirmed, before the agent starts.")
+    parser.add_argument("--readiness-timeout", type=float, default=60.0,
+                        help="Give up on an episode if its fault has not taken effect after this many seconds.")
+    parser.add_argument("--no-reset", action="store_true",
+                        help="Do not snapshot the namespace and undo the agent's changes after each episode.")
+    parser.add_argument("--reset-timeout", type=float, default=120.0,
+                        help="Maximum time to restore and verify the namespace after an episode.")
+    parser.add_argument("--max-steps", type=int, default=10, help="Agent step limit per episode.")
+    parser.add_argument("--scenario", default="pod-failure",
+                        choices=list_scenarios() + ["random", "curriculum", "template"],
+                        help="Chaos scenario from the catalog, 'random' to draw one per episode, 'curriculum' "
+                             "to favour scenarios with success rates near 0.5, "
+                             "or 'template' for the legacy pod-failure.yaml applied with kubectl.")
+    parser.add_argument("--scenario-quota", action="append", default=[], metavar="NAME=N",
+                        help="With --scenario curriculum: maximum episodes of a scenario in this run.")
+    parser.add_argument("--curriculum-window", type=int, default=50,
+                        help="Recent outcomes per scenario used for its success rate.")
+    parser.add_argument("--scenario-param", action="append", default=[], metavar="KEY=VALUE",
+                        help="Fix a scenario parameter, e.g. target_label=app=cartservice. Others are sampled.")
+    parser.add_argument("--scenario-seed", type=int, default=None, help="Seed for scenario and parameter sampling.")
+    parser.add_argument("--reward", choices=["observer", "human", "pending"], default="observer",
+                        help="Compute rewards from workload health, ask on the terminal, or save episodes "
+                             "with a pending reward to label later in batch.")
+    parser.add_argument("--stabilization-seconds", type=float, default=30.0,
+                        help="How long the faulted workload must stay healthy to earn reward 1.")
+    parser.add_argument("--observer-timeout", type=float, default=120.0,
+                        help="Maximum time the observer waits for the workload to recover.")
+    parser.add_argument("--llm-rpm", type=float, default=0,
+                        help="LLM requests per minute shared by all agents (0: unlimited).")
+    parser.add_argument("--llm-tpm", type=float, default=0,
+                        help="LLM tokens per minute shared by all agents (0: unlimited).")
+    parser.add_argument("--llm-max-in-flight", type=int, default=16,
+                        help="Maximum concurrent LLM requests (and pooled connections).")
+    parser.add_argument("--llm-max-retries", type=int, default=5,
+                        help="Retries of an LLM request on 429, 5xx and connection errors.")
+    parser.add_argument("--episode-token-budget", type=int, default=0,
+                        help="Prompt + completion tokens per episode; the agent must answer before it runs out (0: unlimited).")
+    parser.add_argument("--episode-cost-budget", type=float, default=0.0,
+                        help="Dollars per episode (0: unlimited).")
+    parser.add_argument("--episode-time-budget", type=float, default=0.0,
+                        help="Seconds of agent time per episode before a final answer is forced (0: unlimited).")
+    parser.add_argument("--window-token-budget", type=int, default=0,
+                        help="Tokens across all episodes per --budget-window (0: unlimited).")
+    parser.add_argument("--window-cost-budget", type=float, default=0.0,
+                        help="Dollars across all episodes per --budget-window (0: unlimited).")
+    parser.add_argument("--budget-window", type=float, default=3600.0,
+                        help="Length in seconds of the sliding window for the window budgets.")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve Prometheus metrics (LLM/tool latency, tokens, output bytes) on this port.")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Also write the Prometheus metrics to this file (textfile collector format).")
+    parser.add_argument("--cluster-prefix", default="rl-agent-sandbox", help="Kind cluster name prefix.")
+    parser.add_argument("--save-path", default="data/trajectories.jsonl", help="Trajectory output file.")
+    parser.add_argument("--segment-dir", default=None,
+                        help="Write trajectories to compressed, rotating segments in this directory instead of --save-path.")
+    parser.add_argument("--segment-compression", choices=["gzip", "zstd"], default="gzip")
+    parser.add_argument("--wal-dir", default="data/wal",
+                        help="Write-ahead log of in-flight trajectories, recovered on startup (empty string disables it).")
+    parser.add_argument("--index-db", default="data/trajectory_index.sqlite",
+                        help="SQLite index of saved trajectories for training-set queries (empty string disables it).")
+    parser.add_argument("--blob-dir", default=None,
+                        help="Store each distinct tool observation once in this directory, e.g. data/blobs "
+                             "(default: keep them inline). Readers must then rehydrate with the same directory.")
+    parser.add_argument("--tool-backend", choices=["kubectl", "api"], default="api",
+                        help="How agent tools talk to the cluster: a kubectl process per call, or a pooled API client.")
+    parser.add_argument("--informer-cache", action="store_true",
+                        help="Serve get_pods/describe_pod from a watch-backed per-cluster cache (api backend only).")
+    parser.add_argument("--prompt-token-budget", type=int, default=0,
+                        help="Keep each prompt under this many tokens by eliding/summarizing old observations (0 sends full history).")
+    parser.add_argument("--llm-cache-mode", choices=LLM_CACHE_MODES, default=None,
+                        help="Record LLM responses to disk (write-only), replay them offline, or pass through (default: no cache).")
+    parser.add_argument("--llm-cache-dir", default="data/llm_cache", help="Directory of the LLM response cache.")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Keep this many pre-warmed clusters and lease one per episode (0 disables the pool).")
+    parser.add_argument("--max-leases", type=int, default=0,
+                        help="Recycle a pooled cluster after this many episodes (0 means never).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Validate API key
+    if not hasattr(config, 'DEEPSEEK_API_KEY') or "YOUR_DEEPSEEK_API_KEY" in config.DEEPSEEK_API_KEY:
+        logger.error("DeepSeek API key is not configured correctly in online_rl_agent/config.py")
+        return
+
+    chaos_template_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        'online_rl_agent', 'chaos', 'templates', 'pod-failure.yaml'
+    )
+
+    scenario_params = dict(p.split("=", 1) for p in args.scenario_param)
+    env_counter = itertools.count()
+
+    def env_factory(kubeconfig: str):
+        if args.scenario == "template":
+            return KubernetesChaosEnvironment(chaos_yaml_path=chaos_template_path, kubeconfig=kubeconfig,
+                                              readiness_timeout=args.readiness_timeout,
+                                              reset_state=not args.no_reset, reset_timeout=args.reset_timeout)
+        return ScenarioChaosEnvironment(
+            scenario=None if args.scenario in ("random", "curriculum") else args.scenario,
+            params=scenario_params,
+            kubeconfig=kubeconfig,
+            seed=None if args.scenario_seed is None else args.scenario_seed + next(env_counter),
+            readiness_timeout=args.readiness_timeout,
+            reset_state=not args.no_reset,
+            reset_timeout=args.reset_timeout,
+            scheduler=scheduler,
+        )
+
+    # Rewards still come from a human here; prompts are serialized so that
+    # concurrent episodes do not interleave on the terminal.
+    reward_lock = threading.Lock()
+
+    def reward_fn(final_answer: str) -> Optional[int]:
+        with reward_lock:
+            return get_reward_from_user(final_answer, allow_defer=True)
+
+    def observer_factory(env) -> HealthObserver:
+        return HealthObserver(
+            kubeconfig=env.kubeconfig,
+            stabilization_seconds=args.stabilization_seconds,
+            timeout=args.observer_timeout,
+            env=env,
+        )
+
+    def sandbox_factory(index: int) -> KindSandbox:
+        return KindSandbox(cluster_name=f"{args.cluster_prefix}-{index}")
+
+    pool = None
+    if args.pool_size > 0:
+        # Each new sandbox is snapshotted once, before its first lease (see `ConcurrentEpisodeRunner`).
+        pool = SandboxPool(sandbox_factory, size=args.pool_size, max_leases_per_sandbox=args.max_leases,
+                           prepare=lambda sandbox: runner.snapshot_sandbox(sandbox))
+
+    trajectory_log = None
+    if args.segment_dir:
+        trajectory_log = SegmentedTrajectoryLog(args.segment_dir, compression=args.segment_compression)
+
+    trajectory_wal = TrajectoryWAL(args.wal_dir) if args.wal_dir else None
+
+    observation_blobs = ObservationBlobStore(args.blob_dir) if args.blob_dir else None
+
+    trajectory_index = None
+    if args.index_db:
+        trajectory_index = TrajectoryIndex(args.index_db, blobs=observation_blobs)
+        if trajectory_log:
+            trajectory_index.attach_log(trajectory_log)
+        elif os.path.exists(args.save_path):
+            trajectory_index.sync_jsonl(args.save_path)
+
+    scheduler = None
+    if args.scenario == "curriculum":
+        quotas = {name: int(n) for name, n in (q.split("=", 1) for q in args.scenario_quota)}
+        scheduler = CurriculumScheduler(quotas=quotas, window=args.curriculum_window, seed=args.scenario_seed)
+        if trajectory_index:
+            loaded = scheduler.load_history(reversed(trajectory_index.query(limit=10000)))
+            logger.info(f"Curriculum seeded with {loaded} past outcomes: {scheduler.stats()}")
+
+    agent_metrics = AgentMetrics()
+    if args.metrics_port:
+        agent_metrics.serve(args.metrics_port)
+    if args.metrics_file:
+        agent_metrics.export_periodically(args.metrics_file)
+
+    llm_client = get_llm_client(
+        requests_per_minute=args.llm_rpm or None,
+        tokens_per_minute=args.llm_tpm or None,
+        max_in_flight=args.llm_max_in_flight,
+        max_retries=args.llm_max_retries,
+        metrics=agent_metrics,
+    )
+    llm_cache = LLMResponseCache(args.llm_cache_dir, mode=args.llm_cache_mode) if args.llm_cache_mode else None
+
+    spend_window = None
+    if args.window_token_budget or args.window_cost_budget:
+        spend_window = SpendWindow(max_tokens=args.window_token_budget or None,
+                                   max_cost=args.window_cost_budget or None, window_seconds=args.budget_window)
+    use_budget = spend_window is not None or any(
+        (args.episode_token_budget, args.episode_cost_budget, args.episode_time_budget))
+
+    def episode_budget() -> Optional[EpisodeBudget]:
+        if not use_budget:
+            return None
+        return EpisodeBudget(max_tokens=args.episode_token_budget or None, max_cost=args.episode_cost_budget or None,
+                             max_seconds=args.episode_time_budget or None, window=spend_window)
+
+    runner = ConcurrentEpisodeRunner(
+        sandbox_factory=None if pool else sandbox_factory,
+        env_factory=env_factory,
+        agent_factory=lambda kubeconfig: DevOpsAgent(
+            api_key=config.DEEPSEEK_API_KEY,
+            model="deepseek-coder",
+            kubeconfig=kubeconfig,
+            tool_backend=args.tool_backend,
+            use_informer_cache=args.informer_cache,
+            context_manager=TokenBudgetManager(args.prompt_token_budget) if args.prompt_token_budget > 0 else None,
+            llm_cache=llm_cache,
+            metrics=agent_metrics,
+            budget=episode_budget(),
+            llm_client=llm_client,
+        ),
+        reward_fn=reward_fn if args.reward == "human" else None,
+        observer_factory=observer_factory if args.reward == "observer" else None,
+        concurrency=args.concurrency,
+        episode_timeout=args.episode_timeout,
+        fault_settle_seconds=args.settle_seconds,
+        max_steps=args.max_steps,
+        save_path=args.save_path,
+        sandbox_pool=pool,
+        trajectory_log=trajectory_log,
+        trajectory_wal=trajectory_wal,
+        trajectory_index=trajectory_index,
+        observation_blobs=observation_blobs,
+        scenario_scheduler=scheduler,
+        spend_window=spend_window,
+    )
+    try:
+        if pool:
+            logger.info(f"Pre-warming {args.pool_size} sandbox(es)...")
+            pool.start(wait=True)
+            logger.info(f"Sandbox pool ready: {pool.stats()}")
+        runner.run(args.episodes)
+    finally:
+        if trajectory_log:
+            trajectory_log.close()
+        if trajectory_index:
+            trajectory_index.close()
+        agent_metrics.stop()
+        if args.metrics_file:
+            agent_metrics.write(args.metrics_file)
+        logger.info(f"LLM client stats: {llm_client.stats()}")
+        if scheduler:
+            logger.info(f"Curriculum stats: {scheduler.stats()}")
+        if observation_blobs:
+            logger.info(f"Observation blob stats: {observation_blobs.stats()}")
+        if pool:
+            logger.info(f"Sandbox pool stats: {pool.stats()}")
+            pool.stop()
+        stop_informer_caches()
+        close_api_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 import logging
 import uuid
 import os
-import time
 import sys
 
 # Add project root to path
@@ -10,7 +9,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from online_rl_agent.agent.agent import DevOpsAgent
 from online_rl_agent.user_agent.simulator import get_reward_from_user
 from online_rl_agent.data.trajectory_store import TrajectoryStore
+from online_rl_agent.data.wal import TrajectoryWAL
 from online_rl_agent.environment.k8s_chaos_env import KubernetesChaosEnvironment
+from online_rl_agent.chaos.readiness import FaultInjectionError
 from online_rl_agent.sandbox.kind_sandbox import KindSandbox
 
 # Try to import config
@@ -49,7 +50,8 @@ def main():
             model="deepseek-coder",
             kubeconfig=kubeconfig_path
         )
-        store = TrajectoryStore(save_path='data/trajectories.jsonl')
+        store = TrajectoryStore(save_path='data/trajectories.jsonl', wal=TrajectoryWAL('data/wal'))
+        store.recover_from_wal()  # Finalize or quarantine episodes left by a crashed run.
         
         chaos_template_path = os.path.join(
             os.path.dirname(__file__), 
@@ -65,9 +67,8 @@ def main():
             
             try:
                 # 3. Setup environment (Chaos)
-                env.setup()
-                logger.info("Environment setup complete. Waiting for 15 seconds for fault to stabilize...")
-                time.sleep(15)
+                env.setup()  # Waits until the fault has actually taken effect.
+                logger.info(f"Environment setup complete. Fault confirmed after {env.fault_ready_seconds:.1f}s.")
 
                 # 4. Get task
                 user_task = env.get_task()
@@ -75,7 +76,7 @@ def main():
 
                 # 5. Start trajectory
                 trajectory_id = f"traj_{uuid.uuid4()}"
-                store.start_new_trajectory(trajectory_id)
+                store.start_new_trajectory(trajectory_id, dict(env.get_metadata(), model=agent.model, task=user_task))
 
                 # 6. Run agent
                 logger.info("Running DevOps Agent...")
@@ -91,6 +92,8 @@ def main():
                 
                 logger.info(f"Episode finished. Trajectory {trajectory_id} saved.")
 
+            except FaultInjectionError as e:
+                logger.error(f"Fault injection failed, skipping this episode: {e}")
             except Exception as e:
                 logger.error(f"An error occurred during the episode: {e}", exc_info=True)
             finally: